@@ -1,8 +1,19 @@
+import asyncio
+import concurrent.futures
+import os
+import time
 import typing
+from contextlib import asynccontextmanager
 from types import TracebackType
 
 import httpx
 
+from .breaker import CircuitBreakers
+from .cache import BaseCache
+from .checkpoint import Checkpoint
+from .config import BATCH_CONCURRENCY, CRAWL_QUEUE_SIZE
+from .crawler import Crawler, Result
+from .hooks import Hooks
 from .models import (
     Competition,
     Competitions,
@@ -12,15 +23,117 @@ from .models import (
     Staff,
     Team,
 )
-from .scraper import Engine
+from .monitor import LoopMonitor
+from .profiling import Profiler
+from .ratelimit import RateLimiter
+from .retry import RetryPolicy
+from .scraper import BaseSpider, Engine, Priority
 from .spiders import fbref, fotmob, official, transfermarkt
+from .tracing import traced
 
 U = typing.TypeVar("U")
+V = typing.TypeVar("V")
 
 
 class App:
-    def __init__(self, client: httpx.AsyncClient | None = None) -> None:
-        self._engine = Engine(client)
+    def __init__(
+        self,
+        client: httpx.AsyncClient | None = None,
+        *,
+        concurrency: dict[str, int] | None = None,
+        retries: dict[str, RetryPolicy] | None = None,
+        cache: BaseCache | None = None,
+        executor: concurrent.futures.Executor | None = None,
+        checkpoint: Checkpoint | None = None,
+        partial: bool = False,
+        transport: httpx.AsyncBaseTransport | None = None,
+        rate_limiter: RateLimiter | None = None,
+        breakers: CircuitBreakers | None = None,
+        timeouts: dict[str, float] | None = None,
+        hooks: list[Hooks] | None = None,
+        loop_monitor: LoopMonitor | None = None,
+    ) -> None:
+        """Parameters:
+
+        * client: custom httpx.AsyncClient
+        * concurrency: max concurrent requests per source, such as
+            {"fbref": 2, "fotmob": 8}, see config.CONCURRENCY
+        * retries: retry policy per source, such as
+            {"fbref": RetryPolicy(max_attempts=5)}, see config.RETRIES
+        * cache: responses cache, such as cache.DiskCache("~/.fusion-stat"),
+            ttl per source see config.CACHE_TTLS
+        * executor: thread or process pool to parse responses off the
+            event loop
+        * checkpoint: store of crawl state, a crawl with the same checkpoint
+            resumes without repeating finished requests
+        * partial: if True, a failed source is left out of the result
+            (see `missing` of the models) instead of failing the whole call,
+            the first source of each call (usually fotmob) is still required
+        * transport: transport of the default client, such as
+            archive.RecordTransport("crawl.archive") to record responses
+            and archive.ReplayTransport("crawl.archive") to serve them
+            offline
+        * rate_limiter: defaults to the process wide ratelimit.rate_limiter,
+            RateLimiter() without limits suits a replay
+        * breakers: circuit breaker per source, such as
+            breaker.CircuitBreakers(threshold=3, recovery=60), see
+            `circuit_states`
+        * timeouts: seconds per source, such as {"transfermarkt": 10},
+            a source that times out is left out of the result like in
+            partial mode, see config.TIMEOUTS
+        * hooks: callbacks with the timings of every request and parse,
+            see hooks.Hooks
+        * loop_monitor: report event loop stalls and the parse or model
+            method causing them to the hooks, such as monitor.LoopMonitor()
+
+        Every get_* method also accepts `timeout` (seconds) and `deadline`
+        (a time.monotonic() value) for the whole call, sources that have
+        not arrived by then are cancelled and left out of the result.
+        """
+        self._engine = Engine(
+            client,
+            concurrency=concurrency,
+            retries=retries,
+            cache=cache,
+            executor=executor,
+            checkpoint=checkpoint,
+            transport=transport,
+            rate_limiter=rate_limiter,
+            breakers=breakers,
+            timeouts=timeouts,
+            hooks=hooks,
+            loop_monitor=loop_monitor,
+        )
+        self._partial = partial
+
+    @property
+    def circuit_states(self) -> dict[str, str]:
+        """{source: "closed" | "open" | "half_open"}"""
+        return self._engine.downloader.breakers.states
+
+    @asynccontextmanager
+    async def profiling(
+        self,
+        path: str | os.PathLike[str],
+        *,
+        memory: bool = True,
+    ) -> typing.AsyncIterator[Profiler]:
+        """
+        Profile the calls made in the block and write the results to the
+        directory path when it exits, see profiling.Profiler.
+
+        Parameters:
+
+        * path: directory of the results
+        * memory: take tracemalloc snapshots before and after each call,
+            tracemalloc slows everything down noticeably
+        """
+        profiler = Profiler(path, memory=memory)
+        profiler.start()
+        try:
+            yield profiler
+        finally:
+            profiler.stop()
 
     async def close(self) -> None:
         await self._engine.close()
@@ -36,140 +149,341 @@ class App:
     ) -> None:
         await self.close()
 
-    async def get_competitions(self, season: int | None = None) -> Competitions:
-        spiders = (
-            fotmob.competitions.Spider(),
-            fbref.competitions.Spider(),
-            transfermarkt.competitions.Spider(),
+    async def _process(
+        self,
+        spiders: dict[str, BaseSpider | None],
+        *,
+        priority: Priority | None = None,
+        timeout: float | None = None,
+        deadline: float | None = None,
+    ) -> dict[str, typing.Any]:
+        """
+        Return {source: item}, spiders that are None (their params are not
+        given), spiders that failed in partial mode and spiders that timed
+        out get None. The first spider is the base of the fusion, so its
+        error is always raised. priority overrides the priority of the
+        spiders, such as Priority.LOW for backfills of old seasons.
+        """
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        names = []
+        tasks = []
+        for name, spider in spiders.items():
+            if spider is not None:
+                names.append(name)
+                tasks.append(spider)
+        items = await self._engine.process(
+            *tasks,
+            # 超时的来源总是被忽略，所以需要收集异常
+            return_exceptions=(
+                self._partial or timeout is not None or bool(self._engine.timeouts)
+            ),
+            priority=priority,
+            timeout=timeout,
         )
-        (
-            fotmob_competitions,
-            fbref_competitions,
-            transfermarkt_competitions,
-        ) = await self._engine.process(*spiders)
-        return Competitions(
-            fotmob=fotmob_competitions,
-            fbref=fbref_competitions,
-            transfermarkt=transfermarkt_competitions,
-            season=season,
+        results: dict[str, typing.Any] = dict.fromkeys(spiders)
+        for index, (name, item) in enumerate(zip(names, items)):
+            if isinstance(item, BaseException):
+                timed_out = isinstance(item, asyncio.TimeoutError)
+                if index == 0 or not (self._partial or timed_out):
+                    raise item
+            else:
+                results[name] = item
+        return results
+
+    @traced()
+    async def get_competitions(
+        self,
+        season: int | None = None,
+        *,
+        priority: Priority | None = None,
+        timeout: float | None = None,
+        deadline: float | None = None,
+    ) -> Competitions:
+        spiders: dict[str, BaseSpider | None] = {
+            "fotmob": fotmob.competitions.Spider(),
+            "fbref": fbref.competitions.Spider(),
+            "transfermarkt": transfermarkt.competitions.Spider(),
+        }
+        items = await self._process(
+            spiders, priority=priority, timeout=timeout, deadline=deadline
         )
+        return Competitions(**items, season=season)
 
+    @traced()
     async def get_competition(
         self,
         *,
         fotmob_id: str,
-        fbref_id: str,
+        fbref_id: str | None = None,
         fbref_path_name: str | None = None,
-        official_name: str,
-        transfermarkt_id: str,
-        transfermarkt_path_name: str,
+        official_name: str | None = None,
+        transfermarkt_id: str | None = None,
+        transfermarkt_path_name: str | None = None,
         season: int | None = None,
+        priority: Priority | None = None,
+        timeout: float | None = None,
+        deadline: float | None = None,
     ) -> Competition:
-        spiders = (
-            fotmob.competition.Spider(id=fotmob_id, season=season),
-            fbref.competition.Spider(
+        spiders: dict[str, BaseSpider | None] = {
+            "fotmob": fotmob.competition.Spider(id=fotmob_id, season=season),
+            "fbref": None,
+            "official": None,
+            "transfermarkt": None,
+        }
+        if fbref_id is not None:
+            spiders["fbref"] = fbref.competition.Spider(
                 id=fbref_id, path_name=fbref_path_name, season=season
-            ),
-            official.competition.Spider(name=official_name, season=season),
-            transfermarkt.competition.Spider(
+            )
+        if official_name is not None:
+            spiders["official"] = official.competition.Spider(
+                name=official_name, season=season
+            )
+        if transfermarkt_id is not None and transfermarkt_path_name is not None:
+            spiders["transfermarkt"] = transfermarkt.competition.Spider(
                 id=transfermarkt_id, path_name=transfermarkt_path_name
-            ),
-        )
-        (
-            fotmob_competition,
-            fbref_competition,
-            official_competition,
-            transfermarkt_competition,
-        ) = await self._engine.process(*spiders)
-        return Competition(
-            fotmob=fotmob_competition,
-            fbref=fbref_competition,
-            official=official_competition,
-            transfermarkt=transfermarkt_competition,
+            )
+        items = await self._process(
+            spiders, priority=priority, timeout=timeout, deadline=deadline
         )
+        return Competition(**items)
 
+    @traced()
     async def get_team(
         self,
         *,
         fotmob_id: str,
-        fbref_id: str,
+        fbref_id: str | None = None,
         fbref_path_name: str | None = None,
-        transfermarkt_id: str,
-        transfermarkt_path_name: str,
+        transfermarkt_id: str | None = None,
+        transfermarkt_path_name: str | None = None,
+        priority: Priority | None = None,
+        timeout: float | None = None,
+        deadline: float | None = None,
     ) -> Team:
-        spiders = (
-            fotmob.team.Spider(id=fotmob_id),
-            fbref.team.Spider(id=fbref_id, path_name=fbref_path_name),
-            transfermarkt.team.Spider(
+        spiders: dict[str, BaseSpider | None] = {
+            "fotmob": fotmob.team.Spider(id=fotmob_id),
+            "fbref": None,
+            "transfermarkt": None,
+            "transfermarkt_staffs": None,
+        }
+        if fbref_id is not None:
+            spiders["fbref"] = fbref.team.Spider(
+                id=fbref_id, path_name=fbref_path_name
+            )
+        if transfermarkt_id is not None and transfermarkt_path_name is not None:
+            spiders["transfermarkt"] = transfermarkt.team.Spider(
                 id=transfermarkt_id, path_name=transfermarkt_path_name
-            ),
-            transfermarkt.staffs.Spider(id=transfermarkt_id),
-        )
-        (
-            fotmob_team,
-            fbref_team,
-            transfermarkt_team,
-            transfermarkt_staffs,
-        ) = await self._engine.process(*spiders)
-        return Team(
-            fotmob=fotmob_team,
-            fbref=fbref_team,
-            transfermarkt=transfermarkt_team,
-            transfermarkt_staffs=transfermarkt_staffs,
+            )
+            spiders["transfermarkt_staffs"] = transfermarkt.staffs.Spider(
+                id=transfermarkt_id
+            )
+        items = await self._process(
+            spiders, priority=priority, timeout=timeout, deadline=deadline
         )
+        return Team(**items)
 
+    @traced()
     async def get_player(
         self,
         *,
         fotmob_id: str,
-        fbref_id: str,
+        fbref_id: str | None = None,
         fbref_path_name: str | None = None,
-        transfermarkt_id: str,
-        transfermarkt_path_name: str,
+        transfermarkt_id: str | None = None,
+        transfermarkt_path_name: str | None = None,
+        priority: Priority | None = None,
+        timeout: float | None = None,
+        deadline: float | None = None,
     ) -> Player:
-        spiders = (
-            fotmob.player.Spider(id=fotmob_id),
-            fbref.player.Spider(id=fbref_id, path_name=fbref_path_name),
-            transfermarkt.player.Spider(
+        spiders: dict[str, BaseSpider | None] = {
+            "fotmob": fotmob.player.Spider(id=fotmob_id),
+            "fbref": None,
+            "transfermarkt": None,
+        }
+        if fbref_id is not None:
+            spiders["fbref"] = fbref.player.Spider(
+                id=fbref_id, path_name=fbref_path_name
+            )
+        if transfermarkt_id is not None and transfermarkt_path_name is not None:
+            spiders["transfermarkt"] = transfermarkt.player.Spider(
                 id=transfermarkt_id, path_name=transfermarkt_path_name
-            ),
-        )
-        (
-            fotmob_player,
-            fbref_player,
-            transfermarkt_player,
-        ) = await self._engine.process(*spiders)
-        return Player(
-            fotmob=fotmob_player,
-            fbref=fbref_player,
-            transfermarkt=transfermarkt_player,
+            )
+        items = await self._process(
+            spiders, priority=priority, timeout=timeout, deadline=deadline
         )
+        return Player(**items)
 
+    @traced()
     async def get_staff(
         self,
         *,
         transfermarkt_id: str,
         transfermarkt_path_name: str,
+        priority: Priority | None = None,
+        timeout: float | None = None,
+        deadline: float | None = None,
     ) -> Staff:
-        spiders = (
-            transfermarkt.staff.Spider(
+        spiders: dict[str, BaseSpider | None] = {
+            "transfermarkt": transfermarkt.staff.Spider(
                 id=transfermarkt_id,
                 path_name=transfermarkt_path_name,
             ),
+        }
+        items = await self._process(
+            spiders, priority=priority, timeout=timeout, deadline=deadline
         )
-        (transfermarkt_staff,) = await self._engine.process(*spiders)
-        return Staff(transfermarkt=transfermarkt_staff)
+        return Staff(**items)
 
-    async def get_matches(self, *, date: str) -> Matches:
+    @traced()
+    async def get_matches(
+        self,
+        *,
+        date: str,
+        priority: Priority | None = None,
+        timeout: float | None = None,
+        deadline: float | None = None,
+    ) -> Matches:
         """Parameters:
 
         * date: "%Y-%m-%d", such as "2023-09-03"
         """
-        spiders = (fotmob.matches.Spider(date=date),)
-        (fotmob_matches,) = await self._engine.process(*spiders)
-        return Matches(fotmob=fotmob_matches)
-
-    async def get_match(self, *, fotmob_id: str) -> Match:
-        spiders = (fotmob.match.Spider(id=fotmob_id),)
-        (fotmob_match,) = await self._engine.process(*spiders)
-        return Match(fotmob=fotmob_match)
+        spiders: dict[str, BaseSpider | None] = {
+            "fotmob": fotmob.matches.Spider(date=date),
+        }
+        items = await self._process(
+            spiders, priority=priority, timeout=timeout, deadline=deadline
+        )
+        return Matches(**items)
+
+    @traced()
+    async def get_match(
+        self,
+        *,
+        fotmob_id: str,
+        priority: Priority | None = None,
+        timeout: float | None = None,
+        deadline: float | None = None,
+    ) -> Match:
+        spiders: dict[str, BaseSpider | None] = {
+            "fotmob": fotmob.match.Spider(id=fotmob_id),
+        }
+        items = await self._process(
+            spiders, priority=priority, timeout=timeout, deadline=deadline
+        )
+        return Match(**items)
+
+    async def _batch(
+        self,
+        method: typing.Callable[..., typing.Awaitable[V]],
+        params: typing.Iterable[dict[str, typing.Any]],
+        concurrency: int,
+    ) -> typing.AsyncGenerator[V, None]:
+        """
+        Call method with each params, at most `concurrency` calls are in
+        flight and results are yielded in completion order. Params are
+        consumed lazily, so generators such as
+        Competition.get_teams_params() can be passed directly.
+        """
+        params_iter = iter(params)
+        pending: set[asyncio.Future[V]] = set()
+        done: set[asyncio.Future[V]] = set()
+        try:
+            while True:
+                while len(pending) < concurrency:
+                    if (kwargs := next(params_iter, None)) is None:
+                        break
+                    pending.add(asyncio.ensure_future(method(**kwargs)))
+                if not pending:
+                    break
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            # 等待取消完成，并取回其他已完成任务的异常
+            await asyncio.gather(*pending, *done, return_exceptions=True)
+
+    def get_competitions_many(
+        self,
+        params: typing.Iterable[dict[str, typing.Any]],
+        *,
+        concurrency: int = BATCH_CONCURRENCY,
+    ) -> typing.AsyncGenerator[Competition, None]:
+        """Parameters:
+
+        * params: such as Competitions.get_params()
+        * concurrency: max number of competitions in flight
+        """
+        return self._batch(self.get_competition, params, concurrency)
+
+    def get_teams(
+        self,
+        params: typing.Iterable[dict[str, typing.Any]],
+        *,
+        concurrency: int = BATCH_CONCURRENCY,
+    ) -> typing.AsyncGenerator[Team, None]:
+        """Parameters:
+
+        * params: such as Competition.get_teams_params()
+        * concurrency: max number of teams in flight
+        """
+        return self._batch(self.get_team, params, concurrency)
+
+    def get_players(
+        self,
+        params: typing.Iterable[dict[str, typing.Any]],
+        *,
+        concurrency: int = BATCH_CONCURRENCY,
+    ) -> typing.AsyncGenerator[Player, None]:
+        """Parameters:
+
+        * params: such as Team.get_players_params()
+        * concurrency: max number of players in flight
+        """
+        return self._batch(self.get_player, params, concurrency)
+
+    def get_staffs(
+        self,
+        params: typing.Iterable[dict[str, typing.Any]],
+        *,
+        concurrency: int = BATCH_CONCURRENCY,
+    ) -> typing.AsyncGenerator[Staff, None]:
+        """Parameters:
+
+        * params: such as Team.get_staffs_params()
+        * concurrency: max number of staffs in flight
+        """
+        return self._batch(self.get_staff, params, concurrency)
+
+    def crawl_competition(
+        self,
+        params: typing.Iterable[dict[str, typing.Any]] | None = None,
+        *,
+        queue_size: int = CRAWL_QUEUE_SIZE,
+        workers: int = BATCH_CONCURRENCY,
+    ) -> typing.AsyncGenerator[Result, None]:
+        """
+        Crawl competitions, then their teams, then the players and staffs of
+        each team, yield Competition, Team, Player and Staff in completion
+        order. With a checkpoint, results yielded by a previous run are
+        not yielded again.
+
+        Parameters:
+
+        * params: competitions params, such as Competitions.get_params(),
+            None resumes the pending jobs of the checkpoint
+        * queue_size: max number of jobs waiting between two stages
+        * workers: number of concurrent jobs of each stage
+        """
+        crawler = Crawler(
+            self,
+            queue_size=queue_size,
+            workers=workers,
+            checkpoint=self._engine.checkpoint,
+        )
+        return crawler.crawl(params)
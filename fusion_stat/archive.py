@@ -0,0 +1,100 @@
+"""
+Record every response of a crawl to an archive file and replay it later
+without network access, such as re-running the fusion over yesterday's
+crawl or benchmarking without being bound by the network.
+"""
+
+import asyncio
+import os
+import struct
+import threading
+import typing
+import zlib
+from pathlib import Path
+
+import httpx
+
+from .cache import Entry
+from .scraper import fingerprint
+
+# 每条记录: 4 字节长度 + zlib(key + "\n" + Entry.dumps())
+_LENGTH = struct.Struct(">I")
+
+
+class NotArchived(httpx.TransportError):
+    """The request is not in the archive, it is not retried."""
+
+
+class Archive:
+    """
+    An append only file of (fingerprint, Entry) records, a request recorded
+    more than once is replayed with its last response. A truncated last
+    record (such as an interrupted recording) is ignored.
+    """
+
+    def __init__(self, path: str | os.PathLike[str]) -> None:
+        self.path = Path(path).expanduser()
+        self._lock = threading.Lock()
+
+    def add(self, key: str, entry: Entry) -> None:
+        data = zlib.compress(key.encode() + b"\n" + entry.dumps())
+        with self._lock, open(self.path, "ab") as f:
+            f.write(_LENGTH.pack(len(data)) + data)
+
+    def __iter__(self) -> typing.Iterator[tuple[str, Entry]]:
+        if not self.path.exists():
+            return
+        with open(self.path, "rb") as f:
+            while len(header := f.read(_LENGTH.size)) == _LENGTH.size:
+                (length,) = _LENGTH.unpack(header)
+                if len(data := f.read(length)) < length:
+                    break
+                key, entry = zlib.decompress(data).split(b"\n", 1)
+                yield key.decode(), Entry.loads(entry)
+
+    def load(self) -> dict[str, Entry]:
+        return dict(self)
+
+
+class RecordTransport(httpx.AsyncBaseTransport):
+    """
+    Send requests with transport and record the responses, the archive is
+    written from a worker thread.
+    """
+
+    def __init__(
+        self,
+        archive: Archive | str | os.PathLike[str],
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        self.archive = archive if isinstance(archive, Archive) else Archive(archive)
+        self.transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        response = await self.transport.handle_async_request(request)
+        try:
+            await response.aread()
+        finally:
+            await response.aclose()
+        entry = Entry.from_response(response)
+        # 压缩和写文件不阻塞事件循环
+        await asyncio.to_thread(self.archive.add, fingerprint(request), entry)
+        return entry.to_response(request)
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """Serve responses from the archive, never touch the network."""
+
+    def __init__(self, archive: Archive | str | os.PathLike[str]) -> None:
+        self.archive = archive if isinstance(archive, Archive) else Archive(archive)
+        self._entries: dict[str, Entry] | None = None
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self._entries is None:
+            self._entries = self.archive.load()
+        if (entry := self._entries.get(fingerprint(request))) is None:
+            raise NotArchived(f"{request.url} is not archived", request=request)
+        return entry.to_response(request)
@@ -0,0 +1,395 @@
+"""
+Parse benchmarks of the spiders over the payloads of tests/data:
+
+    python -m fusion_stat.bench --baseline bench.json --save
+    python -m fusion_stat.bench --baseline bench.json
+
+The second run exits with 1 when a spider is slower or uses more memory than
+the baseline by more than the tolerance, both exit with 1 when a case fails.
+The payloads are only in a checkout of the repository, pass --data otherwise.
+"""
+
+import argparse
+import dataclasses
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+import typing
+from contextlib import contextmanager
+from pathlib import Path
+
+import httpx
+from pydantic import BaseModel
+
+from .scraper import BaseSpider
+from .spiders import fbref, fotmob, official, transfermarkt
+
+DATA = Path(__file__).resolve().parent.parent / "tests" / "data"
+
+
+@dataclasses.dataclass
+class Case:
+    name: str
+    file: str
+    spider: typing.Callable[[], BaseSpider]
+
+
+# fbref.matches 的 parse 尚未实现，不在其中
+CASES = (
+    Case("fbref.competitions", "fbref/comps_.html", fbref.competitions.Spider),
+    Case(
+        "fbref.competition",
+        "fbref/comps_9_Premier-League-Stats.html",
+        lambda: fbref.competition.Spider(id="9", path_name="Premier-League"),
+    ),
+    Case(
+        "fbref.team",
+        "fbref/squads_18bb7c10_Arsenal-Stats.html",
+        lambda: fbref.team.Spider(id="18bb7c10", path_name="Arsenal"),
+    ),
+    Case(
+        "fbref.player",
+        "fbref/players_bc7dc64d_Bukayo-Saka.html",
+        lambda: fbref.player.Spider(id="bc7dc64d", path_name="Bukayo-Saka"),
+    ),
+    Case(
+        "fbref.match",
+        "fbref/matches_74125d47.html",
+        lambda: fbref.match.Spider(id="74125d47"),
+    ),
+    Case("fotmob.competitions", "fotmob/allLeagues.json", fotmob.competitions.Spider),
+    Case(
+        "fotmob.competition",
+        "fotmob/leagues?id=47.json",
+        lambda: fotmob.competition.Spider(id="47"),
+    ),
+    Case(
+        "fotmob.team",
+        "fotmob/teams?id=9825.json",
+        lambda: fotmob.team.Spider(id="9825"),
+    ),
+    Case(
+        "fotmob.player",
+        "fotmob/playerData?id=961995.json",
+        lambda: fotmob.player.Spider(id="961995"),
+    ),
+    Case(
+        "fotmob.matches",
+        "fotmob/matches?date=20230903.json",
+        lambda: fotmob.matches.Spider(date="2023-09-03"),
+    ),
+    Case(
+        "fotmob.match",
+        "fotmob/matchDetails?matchId=4193490.json",
+        lambda: fotmob.match.Spider(id="4193490"),
+    ),
+    Case(
+        "transfermarkt.competitions",
+        "transfermarkt/wettbewerbe_europa.html",
+        transfermarkt.competitions.Spider,
+    ),
+    Case(
+        "transfermarkt.competition",
+        "transfermarkt/premier-league_startseite_wettbewerb_GB1.html",
+        lambda: transfermarkt.competition.Spider(
+            id="GB1", path_name="premier-league"
+        ),
+    ),
+    Case(
+        "transfermarkt.team",
+        "transfermarkt/arsenal-fc_startseite_verein_11.html",
+        lambda: transfermarkt.team.Spider(id="11", path_name="arsenal-fc"),
+    ),
+    Case(
+        "transfermarkt.staffs",
+        "transfermarkt/ceapi_staff_team_11_.json",
+        lambda: transfermarkt.staffs.Spider(id="11"),
+    ),
+    Case(
+        "transfermarkt.player",
+        "transfermarkt/bukayo-saka_profil_spieler_433177.html",
+        lambda: transfermarkt.player.Spider(id="433177", path_name="bukayo-saka"),
+    ),
+    Case(
+        "transfermarkt.staff",
+        "transfermarkt/mikel-arteta_profil_trainer_47620.html",
+        lambda: transfermarkt.staff.Spider(id="47620", path_name="mikel-arteta"),
+    ),
+    Case(
+        "official.premier_league",
+        "premier_league/teams?pageSize=100&compSeasons=578&comps=1&altIds=true&page=0.json",
+        lambda: official.competition.Spider(name="Premier League", season=2023),
+    ),
+    Case(
+        "official.la_liga",
+        "la_liga/subscriptionSlug=laliga-easports-2023.json",
+        lambda: official.competition.LaLigaSpider(name="La Liga", season=2023),
+    ),
+    Case(
+        "official.bundesliga",
+        "bundesliga/assets_historic_season_2022-2023.json",
+        lambda: official.competition.BundesligaSpider(
+            name="Bundesliga", season=2022
+        ),
+    ),
+    Case(
+        "official.serie_a",
+        "serie_a/STAGIONE=2023-24.json",
+        lambda: official.competition.Spider(name="Serie A", season=2023),
+    ),
+    Case(
+        "official.ligue_1",
+        "ligue_1/clubs_List?seasonId=2023-2024.html",
+        lambda: official.competition.Ligue1Spider(name="Ligue 1", season=2023),
+    ),
+)
+
+
+@dataclasses.dataclass
+class Result:
+    name: str
+    bytes: int
+    items: int
+    rounds: int
+    # 每次 parse 的中位数耗时 (秒)
+    seconds: float
+    validation_share: float
+    peak_memory: int
+
+    @property
+    def mb_per_s(self) -> float:
+        return self.bytes / self.seconds / 1e6
+
+    @property
+    def items_per_s(self) -> float:
+        return self.items / self.seconds
+
+    def to_dict(self) -> dict[str, typing.Any]:
+        return {
+            **dataclasses.asdict(self),
+            "mb_per_s": self.mb_per_s,
+            "items_per_s": self.items_per_s,
+        }
+
+
+def get_response(case: Case, spider: BaseSpider, data: Path = DATA) -> httpx.Response:
+    content = (data / case.file).read_bytes()
+    if case.file.endswith(".json"):
+        content_type = "application/json"
+    else:
+        content_type = "text/html; charset=utf-8"
+    return httpx.Response(
+        200,
+        headers={"Content-Type": content_type},
+        content=content,
+        request=spider.request,
+    )
+
+
+def count_items(value: typing.Any) -> int:
+    """Pydantic models in a parse result, nested ones included."""
+    if isinstance(value, BaseModel):
+        fields = type(value).model_fields
+        return 1 + sum(count_items(getattr(value, name)) for name in fields)
+    if isinstance(value, (list, tuple, set)):
+        return sum(count_items(item) for item in value)
+    if isinstance(value, dict):
+        return sum(count_items(item) for item in value.values())
+    return 0
+
+
+@contextmanager
+def validation_timer() -> typing.Iterator[list[float]]:
+    """Sum the time spent in BaseModel.__init__ into the yielded list."""
+    total = [0.0]
+    depth = 0
+    init = BaseModel.__init__
+
+    def timed_init(self: BaseModel, /, **data: typing.Any) -> None:
+        nonlocal depth
+        if depth:
+            init(self, **data)
+            return
+        depth += 1
+        start = time.perf_counter()
+        try:
+            init(self, **data)
+        finally:
+            total[0] += time.perf_counter() - start
+            depth -= 1
+
+    BaseModel.__init__ = timed_init  # type: ignore[method-assign]
+    try:
+        yield total
+    finally:
+        BaseModel.__init__ = init  # type: ignore[method-assign]
+
+
+def parse(spider: BaseSpider, response: httpx.Response) -> typing.Any:
+    # 每次都新建 Response，避免 response.json() 等的缓存
+    response = httpx.Response(
+        response.status_code,
+        headers=response.headers,
+        content=response.content,
+        request=response.request,
+    )
+    return spider.parse(response)
+
+
+def run_case(
+    case: Case,
+    *,
+    data: Path = DATA,
+    min_time: float = 1.0,
+    min_rounds: int = 5,
+) -> Result:
+    spider = case.spider()
+    response = get_response(case, spider, data)
+    items = count_items(parse(spider, response))
+
+    timings: list[float] = []
+    started = time.perf_counter()
+    while len(timings) < min_rounds or time.perf_counter() - started < min_time:
+        start = time.perf_counter()
+        parse(spider, response)
+        timings.append(time.perf_counter() - start)
+
+    # 计时 BaseModel.__init__ 有额外开销，单独运行
+    with validation_timer() as validation:
+        start = time.perf_counter()
+        for _ in range(min_rounds):
+            parse(spider, response)
+        total = time.perf_counter() - start
+
+    started_tracemalloc = not tracemalloc.is_tracing()
+    if started_tracemalloc:
+        tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        current, _ = tracemalloc.get_traced_memory()
+        parse(spider, response)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        if started_tracemalloc:
+            tracemalloc.stop()
+
+    return Result(
+        name=case.name,
+        bytes=len(response.content),
+        items=items,
+        rounds=len(timings),
+        seconds=statistics.median(timings),
+        validation_share=validation[0] / total,
+        peak_memory=peak - current,
+    )
+
+
+def compare(
+    results: typing.Iterable[Result],
+    baseline: dict[str, dict[str, typing.Any]],
+    *,
+    tolerance: float = 0.2,
+) -> list[str]:
+    """Regressions of throughput or peak memory beyond the tolerance."""
+    regressions = []
+    for result in results:
+        if (base := baseline.get(result.name)) is None:
+            continue
+        if result.mb_per_s < base["mb_per_s"] * (1 - tolerance):
+            regressions.append(
+                f"{result.name}: {result.mb_per_s:.2f} MB/s, "
+                f"baseline {base['mb_per_s']:.2f} MB/s"
+            )
+        if result.peak_memory > base["peak_memory"] * (1 + tolerance):
+            regressions.append(
+                f"{result.name}: peak {result.peak_memory / 1e6:.2f} MB, "
+                f"baseline {base['peak_memory'] / 1e6:.2f} MB"
+            )
+    return regressions
+
+
+def load_baseline(path: str | os.PathLike[str]) -> dict[str, dict[str, typing.Any]]:
+    with open(path) as f:
+        baseline: dict[str, dict[str, typing.Any]] = json.load(f)
+    return baseline
+
+
+def save_baseline(
+    path: str | os.PathLike[str], results: typing.Iterable[Result]
+) -> None:
+    with open(path, "w") as f:
+        json.dump({result.name: result.to_dict() for result in results}, f, indent=2)
+        f.write("\n")
+
+
+def format_result(
+    result: Result, baseline: dict[str, typing.Any] | None = None
+) -> str:
+    line = (
+        f"{result.name:<28} {result.bytes / 1e6:>6.2f} MB {result.mb_per_s:>8.2f}"
+        f" MB/s {result.items_per_s:>10.0f} items/s"
+        f" {result.validation_share:>6.1%} pydantic"
+        f" {result.peak_memory / 1e6:>7.2f} MB peak"
+    )
+    if baseline is not None:
+        line += f" {result.mb_per_s / baseline['mb_per_s'] - 1:>+7.1%}"
+    return line
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the parse of the spiders over tests/data."
+    )
+    parser.add_argument("cases", nargs="*", help="names or prefixes of the cases")
+    parser.add_argument("--data", type=Path, default=DATA)
+    parser.add_argument("--min-time", type=float, default=1.0)
+    parser.add_argument("--baseline", help="JSON file to compare with")
+    parser.add_argument(
+        "--save", action="store_true", help="write the results as the baseline"
+    )
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+    if not args.data.is_dir():
+        parser.error(
+            f"{args.data} is not a directory, pass the tests/data of a checkout"
+        )
+
+    baseline = {}
+    if args.baseline and not args.save and os.path.exists(args.baseline):
+        baseline = load_baseline(args.baseline)
+
+    results = []
+    failures = []
+    for case in CASES:
+        if args.cases and not case.name.startswith(tuple(args.cases)):
+            continue
+        try:
+            result = run_case(case, data=args.data, min_time=args.min_time)
+        except Exception as exc:
+            print(f"{case.name:<28} error: {exc!r}")
+            failures.append(case.name)
+            continue
+        results.append(result)
+        print(format_result(result, baseline.get(case.name)))
+
+    if args.save:
+        if args.baseline is None:
+            parser.error("--save requires --baseline")
+        if failures:
+            print(f"not saved, failed: {', '.join(failures)}", file=sys.stderr)
+            return 1
+        save_baseline(args.baseline, results)
+        return 0
+    regressions = compare(results, baseline, tolerance=args.tolerance)
+    for regression in regressions:
+        print(f"regression: {regression}", file=sys.stderr)
+    if failures:
+        print(f"failed: {', '.join(failures)}", file=sys.stderr)
+    return 1 if regressions or failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+import time
+
+import httpx
+
+from .config import BREAKER_RECOVERY, BREAKER_THRESHOLD
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# 401/403 通常意味着 API key 失效，例如 official 的 laliga
+FAILURE_STATUSES = frozenset({401, 403, 429, 500, 502, 503, 504})
+
+
+class CircuitOpenError(httpx.TransportError):
+    """The circuit of the source is open, the request was not sent."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures, requests fail fast while
+    it is open. After `recovery` seconds one probe request is let through
+    (half open), its success closes the circuit and its failure opens it
+    again.
+    """
+
+    def __init__(
+        self,
+        threshold: int = BREAKER_THRESHOLD,
+        recovery: float = BREAKER_RECOVERY,
+    ) -> None:
+        self.threshold = threshold
+        self.recovery = recovery
+        self.failures = 0
+        self._opened_at: float | None = None
+        # 持有探测名额的请求
+        self._probe: object | None = None
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return CLOSED
+        if time.monotonic() - self._opened_at < self.recovery:
+            return OPEN
+        return HALF_OPEN
+
+    def allow(self, request: object = None) -> bool:
+        """
+        Return True if a request can be sent. When half open, the probe is
+        reserved for `request`, such as the httpx.Request being sent.
+        """
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and self._probe is None:
+            self._probe = object() if request is None else request
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._opened_at = None
+        self._probe = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._probe is not None or self.failures >= self.threshold:
+            self._opened_at = time.monotonic()
+        self._probe = None
+
+    def release(self, request: object = None) -> None:
+        """
+        The request was cancelled, free the probe without a verdict if the
+        request holds it.
+        """
+        if request is None or self._probe is request:
+            self._probe = None
+
+
+class CircuitBreakers:
+    def __init__(
+        self,
+        threshold: int = BREAKER_THRESHOLD,
+        recovery: float = BREAKER_RECOVERY,
+        statuses: frozenset[int] = FAILURE_STATUSES,
+    ) -> None:
+        """Parameters:
+
+        * threshold: consecutive failures of a source to open its circuit
+        * recovery: seconds before a probe request is let through
+        * statuses: response status codes counted as failures, exceptions
+            raised by the transport are always failures
+        """
+        self.threshold = threshold
+        self.recovery = recovery
+        self.statuses = statuses
+        self.breakers: dict[str, CircuitBreaker] = {}
+
+    def get(self, source: str) -> CircuitBreaker:
+        if (breaker := self.breakers.get(source)) is None:
+            breaker = CircuitBreaker(self.threshold, self.recovery)
+            self.breakers[source] = breaker
+        return breaker
+
+    def is_failure(self, response: httpx.Response) -> bool:
+        return response.status_code in self.statuses
+
+    @property
+    def states(self) -> dict[str, str]:
+        return {source: breaker.state for source, breaker in self.breakers.items()}
@@ -0,0 +1,232 @@
+import json
+import lzma
+import os
+import tempfile
+import threading
+import time
+import typing
+import zlib
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+import httpx
+
+from .config import CACHE_TTLS, DEFAULT_CACHE_TTL
+
+# 缓存的是解码后的内容，这些 headers 已经不再适用
+DROPPED_HEADERS = frozenset({"content-encoding", "content-length", "transfer-encoding"})
+
+
+class Entry:
+    def __init__(
+        self,
+        *,
+        status_code: int,
+        headers: list[tuple[str, str]],
+        content: bytes,
+        stored_at: float | None = None,
+    ) -> None:
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.stored_at = time.time() if stored_at is None else stored_at
+
+    @classmethod
+    def from_response(cls, response: httpx.Response) -> "Entry":
+        headers = [
+            (key, value)
+            for key, value in response.headers.multi_items()
+            if key.lower() not in DROPPED_HEADERS
+        ]
+        return cls(
+            status_code=response.status_code,
+            headers=headers,
+            content=response.content,
+        )
+
+    def to_response(self, request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            self.status_code,
+            headers=self.headers,
+            content=self.content,
+            request=request,
+        )
+
+    @property
+    def validators(self) -> dict[str, str]:
+        """Conditional request headers to revalidate the entry."""
+        headers = httpx.Headers(self.headers)
+        validators = {}
+        if etag := headers.get("ETag"):
+            validators["If-None-Match"] = etag
+        if last_modified := headers.get("Last-Modified"):
+            validators["If-Modified-Since"] = last_modified
+        return validators
+
+    def revalidate(self, response: httpx.Response) -> "Entry":
+        """Return a new entry refreshed by a 304 Not Modified response."""
+        headers = httpx.Headers(self.headers)
+        for key, value in response.headers.items():
+            if key.lower() not in DROPPED_HEADERS:
+                headers[key] = value
+        return Entry(
+            status_code=self.status_code,
+            headers=headers.multi_items(),
+            content=self.content,
+        )
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.stored_at
+
+    def dumps(self) -> bytes:
+        meta = {
+            "status_code": self.status_code,
+            "headers": self.headers,
+            "stored_at": self.stored_at,
+        }
+        return json.dumps(meta).encode() + b"\n" + self.content
+
+    @classmethod
+    def loads(cls, data: bytes) -> "Entry":
+        meta, content = data.split(b"\n", 1)
+        kwargs = json.loads(meta)
+        kwargs["headers"] = [(key, value) for key, value in kwargs["headers"]]
+        return cls(**kwargs, content=content)
+
+
+class BaseCache(ABC):
+    """
+    Responses cache keyed by scraper.fingerprint, entries are returned
+    regardless of their age, freshness is decided by `is_fresh`.
+    """
+
+    def __init__(
+        self,
+        *,
+        ttls: dict[str, float] | None = None,
+        default_ttl: float = DEFAULT_CACHE_TTL,
+    ) -> None:
+        self.ttls = {**CACHE_TTLS, **(ttls or {})}
+        self.default_ttl = default_ttl
+
+    def get_ttl(self, source: str) -> float:
+        return self.ttls.get(source, self.default_ttl)
+
+    def is_fresh(self, entry: Entry, source: str) -> bool:
+        return entry.age < self.get_ttl(source)
+
+    @abstractmethod
+    def get(self, key: str) -> Entry | None:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, entry: Entry) -> None:
+        ...
+
+
+class DiskCache(BaseCache):
+    """
+    One compressed file per entry, the least recently used files are
+    removed when the total size exceeds max_bytes.
+    """
+
+    suffixes = {"zlib": ".zz", "lzma": ".xz"}
+
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        *,
+        max_bytes: int = 256 * 1024 * 1024,
+        compression: typing.Literal["zlib", "lzma"] = "zlib",
+        ttls: dict[str, float] | None = None,
+        default_ttl: float = DEFAULT_CACHE_TTL,
+    ) -> None:
+        super().__init__(ttls=ttls, default_ttl=default_ttl)
+        self.path = Path(path).expanduser()
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.compression = compression
+        self._lock = threading.Lock()
+        self._size = sum(file.stat().st_size for file in self._files())
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def _files(self) -> typing.Iterator[Path]:
+        for suffix in self.suffixes.values():
+            yield from self.path.glob(f"*{suffix}")
+
+    def _get_file(self, key: str) -> Path:
+        return self.path / f"{key}{self.suffixes[self.compression]}"
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.compression == "lzma":
+            return lzma.compress(data)
+        return zlib.compress(data)
+
+    def _decompress(self, data: bytes) -> bytes:
+        if self.compression == "lzma":
+            return lzma.decompress(data)
+        return zlib.decompress(data)
+
+    def get(self, key: str) -> Entry | None:
+        file = self._get_file(key)
+        try:
+            data = file.read_bytes()
+            # 用修改时间记录最近一次使用
+            os.utime(file)
+        except FileNotFoundError:
+            return None
+        try:
+            return Entry.loads(self._decompress(data))
+        except (zlib.error, lzma.LZMAError, ValueError):
+            # 损坏的文件当作未命中；同时被 set 写入的新文件不能删除
+            with self._lock:
+                try:
+                    current = file.read_bytes()
+                except FileNotFoundError:
+                    return None
+                if current == data:
+                    file.unlink()
+                    self._size -= len(data)
+            return None
+
+    def set(self, key: str, entry: Entry) -> None:
+        file = self._get_file(key)
+        data = self._compress(entry.dumps())
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        with self._lock:
+            try:
+                self._size -= file.stat().st_size
+            except FileNotFoundError:
+                pass
+            os.replace(tmp, file)
+            self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        files = []
+        for file in self._files():
+            try:
+                stat = file.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, file))
+        files.sort()
+        self._size = sum(size for _, size, _ in files)
+        for _, size, file in files:
+            if self._size <= self.max_bytes:
+                break
+            file.unlink(missing_ok=True)
+            self._size -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            for file in self._files():
+                file.unlink(missing_ok=True)
+            self._size = 0
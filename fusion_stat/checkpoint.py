@@ -0,0 +1,96 @@
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import typing
+
+Job = tuple[str, dict[str, typing.Any]]
+
+
+class Checkpoint:
+    """
+    SQLite store of the crawl state, so a crawl can be resumed after the
+    process dies without repeating finished requests:
+
+    * items: the parsed item of every finished spider
+    * jobs: crawler jobs (kind, params) and whether they are done, a crawl
+        without params resumes from the pending ones
+
+    The methods block, call them with asyncio.to_thread from a coroutine.
+    """
+
+    def __init__(self, path: str | os.PathLike[str]) -> None:
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS items (key TEXT PRIMARY KEY, item BLOB)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "key TEXT PRIMARY KEY, kind TEXT, params TEXT, done INTEGER DEFAULT 0)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def get_job_key(kind: str, params: dict[str, typing.Any]) -> str:
+        return f"{kind}:{json.dumps(params, sort_keys=True)}"
+
+    def get_item(self, key: str) -> typing.Any | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT item FROM items WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return pickle.loads(row[0])
+
+    def set_item(self, key: str, item: typing.Any) -> None:
+        data = pickle.dumps(item)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO items (key, item) VALUES (?, ?)",
+                (key, data),
+            )
+
+    def add_jobs(self, jobs: typing.Iterable[Job]) -> None:
+        rows = [
+            (self.get_job_key(kind, params), kind, json.dumps(params))
+            for kind, params in jobs
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO jobs (key, kind, params) VALUES (?, ?, ?)",
+                rows,
+            )
+
+    def add_job(self, kind: str, params: dict[str, typing.Any]) -> None:
+        self.add_jobs([(kind, params)])
+
+    def finish_job(self, kind: str, params: dict[str, typing.Any]) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET done = 1 WHERE key = ?",
+                (self.get_job_key(kind, params),),
+            )
+
+    def is_done(self, kind: str, params: dict[str, typing.Any]) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT done FROM jobs WHERE key = ?",
+                (self.get_job_key(kind, params),),
+            ).fetchone()
+        return row is not None and bool(row[0])
+
+    @property
+    def pending_jobs(self) -> list[Job]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT kind, params FROM jobs WHERE done = 0"
+            ).fetchall()
+        return [(kind, json.loads(params)) for kind, params in rows]
+
+    def close(self) -> None:
+        self._conn.close()
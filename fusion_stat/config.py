@@ -1,3 +1,5 @@
+import typing
+
 from fifacodes import Members
 
 COMPETITIONS_SCORE_CUTOFF = 97
@@ -45,3 +47,67 @@ POSITIONS = {
 }
 
 fifa_members = Members()
+
+SOURCES = {
+    "fbref.com": "fbref",
+    "fotmob.com": "fotmob",
+    "transfermarkt.com": "transfermarkt",
+    "pulselive.com": "pulselive",
+    "laliga.com": "laliga",
+    "legaseriea.it": "legaseriea",
+    "bundesliga.com": "bundesliga",
+    "ligue1.com": "ligue1",
+}
+
+# 每个来源同时进行的最大请求数，超出的请求会排队等待
+CONCURRENCY = {
+    "fbref": 2,
+    "fotmob": 8,
+    "transfermarkt": 2,
+}
+DEFAULT_CONCURRENCY = 4
+
+# App 批量方法同时处理的实体数
+BATCH_CONCURRENCY = 8
+# crawler 各阶段之间队列的长度
+CRAWL_QUEUE_SIZE = 16
+
+# 令牌桶限速: (每秒请求数, 桶容量)，同一进程内的所有 App 共用
+RATE_LIMITS: dict[str, tuple[float, float]] = {
+    "fbref": (10 / 60, 2),
+    "fotmob": (5, 10),
+    "transfermarkt": (1, 3),
+    "pulselive": (5, 10),
+    "laliga": (2, 4),
+    "legaseriea": (2, 4),
+    "bundesliga": (2, 4),
+    "ligue1": (2, 4),
+}
+
+# 各来源的 retry.RetryPolicy 参数，未配置的来源使用默认值
+RETRIES: dict[str, dict[str, typing.Any]] = {
+    # fbref 的页面很大而且限速严格，退避时间长一些
+    "fbref": {"max_attempts": 4, "backoff_base": 5.0},
+    "transfermarkt": {"max_attempts": 4, "backoff_base": 2.0},
+}
+
+# 各来源缓存的有效期 (秒)
+CACHE_TTLS: dict[str, float] = {
+    "fotmob": 300,
+    "fbref": 6 * 3600,
+    "transfermarkt": 6 * 3600,
+    "pulselive": 24 * 3600,
+    "laliga": 24 * 3600,
+    "legaseriea": 24 * 3600,
+    "bundesliga": 24 * 3600,
+    "ligue1": 24 * 3600,
+}
+DEFAULT_CACHE_TTL = 3600
+
+# 连续失败多少次后熔断，熔断多少秒后放行一个探测请求
+BREAKER_THRESHOLD = 5
+BREAKER_RECOVERY = 30.0
+
+# 各来源的超时 (秒)，包括重试和解析，未配置的来源不限时
+# 例如 {"transfermarkt": 10}
+TIMEOUTS: dict[str, float] = {}
@@ -0,0 +1,177 @@
+import asyncio
+import typing
+
+from .checkpoint import Checkpoint
+from .config import BATCH_CONCURRENCY, CRAWL_QUEUE_SIZE
+from .models import Competition, Player, Staff, Team
+
+if typing.TYPE_CHECKING:
+    from .api import App
+
+Result = Competition | Team | Player | Staff
+Job = tuple[str, dict[str, typing.Any]]
+Output = tuple[Job, Result] | Exception | None
+
+# 各阶段处理的任务类型: competition -> team -> player and staff
+STAGES = (("competition",), ("team",), ("player", "staff"))
+
+
+async def run_job(app: "App", job: Job) -> Result:
+    """("team", params) => await app.get_team(**params)"""
+    kind, params = job
+    method: typing.Callable[..., typing.Awaitable[Result]] = getattr(
+        app, f"get_{kind}"
+    )
+    return await method(**params)
+
+
+def get_jobs(result: Result) -> typing.Iterator[Job]:
+    """Return the jobs of the next stage, such as the teams of a competition."""
+    if isinstance(result, Competition):
+        for params in result.get_teams_params():
+            yield "team", params
+    elif isinstance(result, Team):
+        for params in result.get_players_params():
+            yield "player", params
+        for params in result.get_staffs_params():
+            yield "staff", params
+
+
+class Crawler:
+    """
+    A staged pipeline: competitions -> teams -> players and staffs.
+
+    Every stage has `workers` tasks and is connected to the next one by a
+    queue of `queue_size` jobs, a full queue blocks the previous stage, so
+    memory stays flat however large the crawl is. Results are yielded in
+    completion order.
+
+    With a checkpoint, jobs are recorded before they are queued and marked
+    as done once the consumer has taken their result. A crawl resumes either
+    with the same params again, done jobs are then not yielded again and
+    their items come from the checkpoint so only their children are
+    expanded, or without params from the pending jobs of the checkpoint.
+    """
+
+    def __init__(
+        self,
+        app: "App",
+        *,
+        queue_size: int = CRAWL_QUEUE_SIZE,
+        workers: int = BATCH_CONCURRENCY,
+        checkpoint: Checkpoint | None = None,
+    ) -> None:
+        self.app = app
+        self.queue_size = queue_size
+        self.workers = workers
+        self.checkpoint = checkpoint
+        # 从 checkpoint 恢复时已经放入队列的任务
+        self._resumed: set[str] = set()
+
+    async def _work(
+        self,
+        inbox: "asyncio.Queue[Job | None]",
+        outbox: "asyncio.Queue[Job | None] | None",
+        results: "asyncio.Queue[Output]",
+    ) -> None:
+        while (job := await inbox.get()) is not None:
+            try:
+                result = await run_job(self.app, job)
+            except Exception as exc:
+                await results.put(exc)
+                return
+            next_jobs = [] if outbox is None else list(get_jobs(result))
+            # 在结果被取走之前记录下一阶段的任务，之后进程退出也不会丢失
+            await self._record(next_jobs)
+            if self.checkpoint is None or not await asyncio.to_thread(
+                self.checkpoint.is_done, *job
+            ):
+                await results.put((job, result))
+            if outbox is not None:
+                for next_job in next_jobs:
+                    await self._put(outbox, next_job)
+
+    async def _record(self, jobs: list[Job]) -> None:
+        if self.checkpoint is not None and jobs:
+            await asyncio.to_thread(self.checkpoint.add_jobs, jobs)
+
+    async def _put(self, queue: "asyncio.Queue[Job | None]", job: Job) -> None:
+        if self._resumed and Checkpoint.get_job_key(*job) in self._resumed:
+            return
+        await queue.put(job)
+
+    async def _resume(self, queues: list["asyncio.Queue[Job | None]"]) -> None:
+        assert self.checkpoint is not None
+        checkpoint = self.checkpoint
+        jobs = await asyncio.to_thread(lambda: checkpoint.pending_jobs)
+        self._resumed = {Checkpoint.get_job_key(*job) for job in jobs}
+        for index, kinds in enumerate(STAGES):
+            for job in jobs:
+                if job[0] in kinds:
+                    await queues[index].put(job)
+
+    async def _run(
+        self,
+        params: typing.Iterable[dict[str, typing.Any]] | None,
+        results: "asyncio.Queue[Output]",
+    ) -> None:
+        queues: list[asyncio.Queue[Job | None]] = [
+            asyncio.Queue(self.queue_size) for _ in STAGES
+        ]
+        stages = []
+        for index, inbox in enumerate(queues):
+            outbox = queues[index + 1] if index + 1 < len(queues) else None
+            workers = [
+                asyncio.ensure_future(self._work(inbox, outbox, results))
+                for _ in range(self.workers)
+            ]
+            stages.append(workers)
+        try:
+            if params is None:
+                await self._resume(queues)
+            else:
+                for kwargs in params:
+                    job: Job = ("competition", kwargs)
+                    await self._record([job])
+                    await self._put(queues[0], job)
+            # 上一个阶段全部结束后，下一个阶段才不会再有新的任务
+            for inbox, workers in zip(queues, stages):
+                for _ in workers:
+                    await inbox.put(None)
+                await asyncio.gather(*workers)
+            await results.put(None)
+        except Exception as exc:
+            await results.put(exc)
+        finally:
+            workers = [worker for workers in stages for worker in workers]
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    async def crawl(
+        self,
+        params: typing.Iterable[dict[str, typing.Any]] | None = None,
+    ) -> typing.AsyncGenerator[Result, None]:
+        """Parameters:
+
+        * params: competitions params, such as Competitions.get_params(),
+            None resumes the pending jobs of the checkpoint
+        """
+        if params is None and self.checkpoint is None:
+            raise ValueError("a crawl without params needs a checkpoint")
+        self._resumed = set()
+        results: asyncio.Queue[Output] = asyncio.Queue(self.queue_size)
+        runner = asyncio.ensure_future(self._run(params, results))
+        try:
+            while (output := await results.get()) is not None:
+                if isinstance(output, Exception):
+                    raise output
+                job, result = output
+                yield result
+                if self.checkpoint is not None:
+                    await asyncio.to_thread(self.checkpoint.finish_job, *job)
+            await runner
+        finally:
+            # 等待 worker 真正退出，避免它们在 crawl 结束后继续运行
+            runner.cancel()
+            await asyncio.gather(runner, return_exceptions=True)
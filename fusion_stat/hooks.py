@@ -0,0 +1,106 @@
+import dataclasses
+import time
+import typing
+
+import httpx
+
+if typing.TYPE_CHECKING:
+    from .scraper import BaseSpider
+
+
+@dataclasses.dataclass
+class RequestEvent:
+    """
+    One attempt of a request, timestamps are time.monotonic() values,
+    those of stages that were not reached are None.
+
+    * started -> built: build the client request
+    * built -> queued: wait for a slot of the source (Scheduler)
+    * queued -> sent: wait for the rate limiter
+    * sent -> finished: dns, connect, transfer and decode of the body,
+        `trace` has the httpcore events such as
+        "connection.connect_tcp.complete" when the transport reports them
+    """
+
+    request: httpx.Request
+    source: str
+    # 第几次尝试，大于 1 表示重试
+    attempt: int
+    started: float
+    built: float | None = None
+    queued: float | None = None
+    sent: float | None = None
+    finished: float | None = None
+    trace: dict[str, float] = dataclasses.field(default_factory=dict)
+    response: httpx.Response | None = None
+    # 传输的字节数 (压缩的) 和解码后的字节数
+    bytes_downloaded: int = 0
+    bytes_decoded: int = 0
+
+    async def on_trace(self, name: str, info: dict[str, typing.Any]) -> None:
+        self.trace[name] = time.monotonic()
+
+
+@dataclasses.dataclass
+class ParseEvent:
+    """
+    BaseSpider.parse of a response, including the pydantic validation.
+    fetch_started is when the spider started to get its response (from the
+    cache, a shared download or the network).
+    """
+
+    spider: "BaseSpider"
+    response: httpx.Response
+    started: float
+    fetch_started: float | None = None
+    finished: float | None = None
+    bytes: int = 0
+    item: typing.Any = None
+
+
+@dataclasses.dataclass
+class LoopLagEvent:
+    """
+    lag: seconds between scheduling a callback on the loop and running it.
+    culprit: for stalls (lag >= threshold), the spider parse or model method
+    that was blocking the loop, such as
+    "fusion_stat.spiders.fbref.competition.Spider.parse", else the
+    innermost function; None when the loop was not stalled.
+    """
+
+    lag: float
+    started: float
+    culprit: str | None = None
+
+
+class Hooks:
+    """
+    Override the methods of interest and pass instances to
+    Engine(hooks=[...]) or App(hooks=[...]). Hooks are called on the event
+    loop, they should be quick.
+    """
+
+    def on_request_start(self, event: RequestEvent) -> None:
+        ...
+
+    def on_response(self, event: RequestEvent) -> None:
+        ...
+
+    def on_parse_start(self, event: ParseEvent) -> None:
+        ...
+
+    def on_parse_end(self, event: ParseEvent) -> None:
+        ...
+
+    def on_cache(self, source: str, status: str) -> None:
+        """status: "hit", "miss" or "revalidated" (by a 304)"""
+
+    def on_loop_lag(self, event: LoopLagEvent) -> None:
+        """Measured by monitor.LoopMonitor if the engine has one."""
+
+    def on_error(
+        self,
+        event: RequestEvent | ParseEvent,
+        exception: BaseException,
+    ) -> None:
+        ...
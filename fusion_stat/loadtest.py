@@ -0,0 +1,448 @@
+"""
+End to end benchmarks of App calls against an in-process transport that
+serves the payloads of tests/data under simulated network conditions:
+
+    python -m fusion_stat.loadtest --latency 0.05 --bandwidth 5e6
+    python -m fusion_stat.loadtest get_team get_teams \\
+        --origin fbref:latency=0.5,jitter=0.2,error_rate=0.05
+
+Scheduler, cache and concurrency changes can be measured without touching
+the real sites.
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import json
+import math
+import random
+import re
+import sys
+import time
+import typing
+from pathlib import Path
+
+import httpx
+
+from .api import App
+from .bench import CASES, DATA
+from .config import RATE_LIMITS
+from .ratelimit import RateLimiter
+from .scraper import get_source
+
+
+@dataclasses.dataclass(frozen=True)
+class Conditions:
+    """Parameters:
+
+    * latency: seconds before the first byte
+    * jitter: up to this many seconds are added to the latency at random
+    * bandwidth: bytes per second of the link of the source, shared by its
+        concurrent responses (see Link), None is unlimited
+    * error_rate: probability that a request gets `error_status`
+    * error_status: such as 503, retried by the default retry policies
+    """
+
+    latency: float = 0.0
+    jitter: float = 0.0
+    bandwidth: float | None = None
+    error_rate: float = 0.0
+    error_status: int = 503
+
+    def get_latency(self, rng: random.Random) -> float:
+        return self.latency + rng.uniform(0, self.jitter)
+
+
+class Link:
+    """
+    The link of a source: responses are sent one after another at the full
+    bandwidth, so concurrent responses drain it together and more
+    concurrency does not make a source faster than its bandwidth.
+    """
+
+    def __init__(self, bandwidth: float) -> None:
+        self.bandwidth = bandwidth
+        # 链路空闲的时刻 (time.monotonic())
+        self.free_at = 0.0
+
+    def reserve(self, size: int, ready: float) -> float:
+        """When a response of size bytes ready at `ready` is received."""
+        start = max(ready, self.free_at)
+        self.free_at = start + size / self.bandwidth
+        return self.free_at
+
+
+def get_shape(url: httpx.URL) -> str:
+    """
+    "https://fbref.com/en/squads/18bb7c10/Arsenal-Stats?a=b"
+    => "fbref.com/en/squads/*/Arsenal-Stats"
+
+    Path segments containing a digit (ids, seasons) are wildcards and the
+    query is dropped.
+    """
+    segments = [
+        "*" if re.search(r"\d", segment) else segment
+        for segment in url.path.split("/")
+    ]
+    return url.host + "/".join(segments)
+
+
+class FixtureRoutes:
+    """
+    Fixture files of the requests of bench.CASES. A request is matched by
+    its URL, otherwise by the shape of its URL (see get_shape), so the same
+    team with other ids is served the Arsenal fixtures.
+    """
+
+    def __init__(self, data: Path = DATA) -> None:
+        self.data = data
+        self.urls: dict[str, str] = {}
+        self.shapes: dict[str, str] = {}
+        for case in CASES:
+            try:
+                url = case.spider().request.url
+            except Exception:
+                continue
+            self.urls[str(url)] = case.file
+            self.shapes.setdefault(get_shape(url), case.file)
+        self._contents: dict[str, bytes] = {}
+
+    def get(self, url: httpx.URL) -> tuple[str, bytes] | None:
+        """(content type, content) of the fixture of url, or None"""
+        if (file := self.urls.get(str(url))) is None:
+            if (file := self.shapes.get(get_shape(url))) is None:
+                return None
+        if (content := self._contents.get(file)) is None:
+            content = self._contents[file] = (self.data / file).read_bytes()
+        if file.endswith(".json"):
+            return "application/json", content
+        return "text/html; charset=utf-8", content
+
+
+class SimulatedTransport(httpx.AsyncBaseTransport):
+    """
+    Serve fixture routes with per source conditions, such as
+    {"fbref": Conditions(latency=0.5, bandwidth=1e6)}, sources are those of
+    config.SOURCES. Requests without a fixture get 404.
+    """
+
+    def __init__(
+        self,
+        *,
+        routes: FixtureRoutes | None = None,
+        conditions: dict[str, Conditions] | None = None,
+        default: Conditions = Conditions(),
+        seed: int | None = None,
+    ) -> None:
+        self.routes = FixtureRoutes() if routes is None else routes
+        self.conditions = {} if conditions is None else conditions
+        self.default = default
+        self.rng = random.Random(seed)
+        self.requests: dict[str, int] = {}
+        self.links: dict[str, Link] = {}
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        source = get_source(request.url)
+        self.requests[source] = self.requests.get(source, 0) + 1
+        conditions = self.conditions.get(source, self.default)
+        if self.rng.random() < conditions.error_rate:
+            await asyncio.sleep(conditions.get_latency(self.rng))
+            return httpx.Response(conditions.error_status, request=request)
+        if (fixture := self.routes.get(request.url)) is None:
+            await asyncio.sleep(conditions.get_latency(self.rng))
+            return httpx.Response(404, request=request)
+        content_type, content = fixture
+        delay = conditions.get_latency(self.rng)
+        if conditions.bandwidth:
+            if (link := self.links.get(source)) is None:
+                link = self.links[source] = Link(conditions.bandwidth)
+            now = time.monotonic()
+            delay = link.reserve(len(content), now + delay) - now
+        await asyncio.sleep(delay)
+        return httpx.Response(
+            200,
+            headers={"Content-Type": content_type},
+            content=content,
+            request=request,
+        )
+
+
+def get_team_params(index: int) -> dict[str, typing.Any]:
+    # 每个 index 的 id 不同，避免相同的请求被合并
+    return {
+        "fotmob_id": str(9825 + index),
+        "fbref_id": f"{index:08x}",
+        "fbref_path_name": "Arsenal",
+        "transfermarkt_id": str(11 + index),
+        "transfermarkt_path_name": "arsenal-fc",
+    }
+
+
+def get_player_params(index: int) -> dict[str, typing.Any]:
+    return {
+        "fotmob_id": str(961995 + index),
+        "fbref_id": f"{index:08x}",
+        "fbref_path_name": "Bukayo-Saka",
+        "transfermarkt_id": str(433177 + index),
+        "transfermarkt_path_name": "bukayo-saka",
+    }
+
+
+@dataclasses.dataclass
+class Options:
+    batch: int = 20
+    batch_concurrency: int = 8
+
+
+# 返回处理的实体数
+Scenario = typing.Callable[[App, int, Options], typing.Awaitable[int]]
+
+
+async def get_competitions(app: App, index: int, options: Options) -> int:
+    await app.get_competitions()
+    return 1
+
+
+async def get_competition(app: App, index: int, options: Options) -> int:
+    # 官方来源需要 season，而 PREMIER_LEAGUE 的赛季索引没有当前赛季
+    await app.get_competition(
+        fotmob_id=str(47 + index),
+        fbref_id="9",
+        fbref_path_name="Premier-League",
+        transfermarkt_id="GB1",
+        transfermarkt_path_name="premier-league",
+    )
+    return 1
+
+
+async def get_team(app: App, index: int, options: Options) -> int:
+    await app.get_team(**get_team_params(index))
+    return 1
+
+
+async def get_teams(app: App, index: int, options: Options) -> int:
+    start = index * options.batch
+    params = (get_team_params(start + i) for i in range(options.batch))
+    teams = app.get_teams(params, concurrency=options.batch_concurrency)
+    return len([team async for team in teams])
+
+
+async def get_players(app: App, index: int, options: Options) -> int:
+    start = index * options.batch
+    params = (get_player_params(start + i) for i in range(options.batch))
+    players = app.get_players(params, concurrency=options.batch_concurrency)
+    return len([player async for player in players])
+
+
+SCENARIOS: dict[str, Scenario] = {
+    "get_competitions": get_competitions,
+    "get_competition": get_competition,
+    "get_team": get_team,
+    "get_teams": get_teams,
+    "get_players": get_players,
+}
+
+
+def get_percentile(values: typing.Sequence[float], percent: float) -> float:
+    """Nearest rank percentile of values, such as percent=95."""
+    if not values:
+        return math.nan
+    values = sorted(values)
+    rank = math.ceil(percent / 100 * len(values))
+    return values[max(rank, 1) - 1]
+
+
+@dataclasses.dataclass
+class Result:
+    name: str
+    wall: float
+    items: int
+    errors: int
+    latencies: list[float]
+    requests: dict[str, int]
+
+    @property
+    def calls(self) -> int:
+        return len(self.latencies)
+
+    @property
+    def p50(self) -> float:
+        return get_percentile(self.latencies, 50)
+
+    @property
+    def p95(self) -> float:
+        return get_percentile(self.latencies, 95)
+
+    @property
+    def p99(self) -> float:
+        return get_percentile(self.latencies, 99)
+
+    @property
+    def throughput(self) -> float:
+        """Items per second"""
+        return self.items / self.wall
+
+    def to_dict(self) -> dict[str, typing.Any]:
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "wall": self.wall,
+            "items": self.items,
+            "errors": self.errors,
+            "p50": self.p50,
+            "p95": self.p95,
+            "p99": self.p99,
+            "throughput": self.throughput,
+            "requests": self.requests,
+        }
+
+
+async def run_scenario(
+    name: str,
+    transport: SimulatedTransport,
+    *,
+    calls: int = 20,
+    concurrency: int = 1,
+    options: Options | None = None,
+    **app_kwargs: typing.Any,
+) -> Result:
+    """
+    Make `calls` calls of the scenario, `concurrency` at a time, with a new
+    App over transport. app_kwargs are passed to App, the rate limiter
+    defaults to RateLimiter() without limits.
+    """
+    scenario = SCENARIOS[name]
+    options = Options() if options is None else options
+    app_kwargs.setdefault("rate_limiter", RateLimiter())
+    indexes = iter(range(calls))
+    latencies: list[float] = []
+    items = 0
+    errors = 0
+    transport.requests = {}
+
+    async def work(app: App) -> None:
+        nonlocal items, errors
+        for index in indexes:
+            start = time.perf_counter()
+            try:
+                count = await scenario(app, index, options)
+            except Exception:
+                errors += 1
+            else:
+                items += count
+            latencies.append(time.perf_counter() - start)
+
+    async with App(transport=transport, **app_kwargs) as app:
+        started = time.perf_counter()
+        await asyncio.gather(*(work(app) for _ in range(concurrency)))
+        wall = time.perf_counter() - started
+    return Result(
+        name=name,
+        wall=wall,
+        items=items,
+        errors=errors,
+        latencies=latencies,
+        requests=dict(transport.requests),
+    )
+
+
+def format_result(result: Result) -> str:
+    return (
+        f"{result.name:<18} {result.calls:>4} calls {result.wall:>7.2f}s"
+        f" p50 {result.p50 * 1000:>8.1f}ms p95 {result.p95 * 1000:>8.1f}ms"
+        f" p99 {result.p99 * 1000:>8.1f}ms {result.throughput:>8.1f} items/s"
+        f" {result.errors:>3} errors"
+    )
+
+
+def parse_origin(value: str) -> tuple[str, Conditions]:
+    """"fbref:latency=0.5,error_rate=0.1" => ("fbref", Conditions(...))"""
+    source, _, params = value.partition(":")
+    fields = {field.name: field.type for field in dataclasses.fields(Conditions)}
+    kwargs: dict[str, typing.Any] = {}
+    for param in filter(None, params.split(",")):
+        key, _, number = param.partition("=")
+        if key not in fields:
+            raise argparse.ArgumentTypeError(f"unknown condition {key!r}")
+        kwargs[key] = int(number) if key == "error_status" else float(number)
+    return source, Conditions(**kwargs)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Benchmark App calls under simulated network conditions."
+    )
+    parser.add_argument(
+        "scenarios", nargs="*", help=f"default all: {', '.join(SCENARIOS)}"
+    )
+    parser.add_argument("--data", type=Path, default=DATA)
+    parser.add_argument("--calls", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--batch", type=int, default=Options.batch)
+    parser.add_argument(
+        "--batch-concurrency", type=int, default=Options.batch_concurrency
+    )
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--bandwidth", type=float, default=None)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--origin",
+        type=parse_origin,
+        action="append",
+        default=[],
+        help="conditions of a source, such as fbref:latency=0.5,bandwidth=1e6",
+    )
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument(
+        "--rate-limit",
+        action="store_true",
+        help="use the rate limits of config.RATE_LIMITS",
+    )
+    parser.add_argument("--json", help="write the results to a JSON file")
+    args = parser.parse_args(argv)
+    for name in args.scenarios:
+        if name not in SCENARIOS:
+            parser.error(f"unknown scenario {name!r}")
+
+    default = Conditions(
+        latency=args.latency,
+        jitter=args.jitter,
+        bandwidth=args.bandwidth,
+        error_rate=args.error_rate,
+    )
+    transport = SimulatedTransport(
+        routes=FixtureRoutes(args.data),
+        conditions=dict(args.origin),
+        default=default,
+        seed=args.seed,
+    )
+    options = Options(batch=args.batch, batch_concurrency=args.batch_concurrency)
+    app_kwargs: dict[str, typing.Any] = {"partial": True}
+    if args.rate_limit:
+        app_kwargs["rate_limiter"] = RateLimiter(RATE_LIMITS)
+
+    results = []
+    for name in args.scenarios or SCENARIOS:
+        result = asyncio.run(
+            run_scenario(
+                name,
+                transport,
+                calls=args.calls,
+                concurrency=args.concurrency,
+                options=options,
+                **app_kwargs,
+            )
+        )
+        results.append(result)
+        print(format_result(result))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump([result.to_dict() for result in results], f, indent=2)
+            f.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
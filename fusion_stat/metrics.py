@@ -0,0 +1,286 @@
+"""
+In-process metrics in the Prometheus text format:
+
+    registry = Registry()
+    async with App(hooks=[MetricsHooks(registry)]) as app:
+        ...
+    registry.write("fusion_stat.prom")
+"""
+
+import math
+import os
+import tempfile
+import typing
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+from .hooks import Hooks, LoopLagEvent, ParseEvent, RequestEvent
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+PARSE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+Labels = tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def _format_labels(names: Labels, values: Labels) -> str:
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        value = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Metric(ABC):
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Labels = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = labels
+
+    def _key(self, labels: dict[str, str]) -> Labels:
+        return tuple(str(labels[name]) for name in self.labels)
+
+    @abstractmethod
+    def samples(self) -> typing.Iterator[tuple[str, str, float]]:
+        """Yield (name, formatted labels, value)"""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: Labels = ()) -> None:
+        super().__init__(name, help, labels)
+        self.values: dict[Labels, float] = {}
+
+    def inc(self, value: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + value
+
+    def get(self, **labels: str) -> float:
+        return self.values.get(self._key(labels), 0)
+
+    def samples(self) -> typing.Iterator[tuple[str, str, float]]:
+        for key, value in sorted(self.values.items()):
+            yield self.name, _format_labels(self.labels, key), value
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, value: float = 1, **labels: str) -> None:
+        self.inc(-value, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        self.values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Labels = (),
+        buckets: typing.Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # 每个标签组合: 各个桶的计数 (非累计)、总和
+        self.counts: dict[Labels, list[int]] = {}
+        self.sums: dict[Labels, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        if (counts := self.counts.get(key)) is None:
+            counts = self.counts[key] = [0] * len(self.buckets)
+            self.sums[key] = 0.0
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[index] += 1
+                break
+        self.sums[key] += value
+
+    def get_count(self, **labels: str) -> int:
+        return sum(self.counts.get(self._key(labels), ()))
+
+    def samples(self) -> typing.Iterator[tuple[str, str, float]]:
+        for key, counts in sorted(self.counts.items()):
+            total = 0
+            for bound, count in zip(self.buckets, counts):
+                total += count
+                labels = _format_labels(
+                    self.labels + ("le",), key + (_format_value(bound),)
+                )
+                yield f"{self.name}_bucket", labels, total
+            labels = _format_labels(self.labels, key)
+            yield f"{self.name}_sum", labels, self.sums[key]
+            yield f"{self.name}_count", labels, total
+
+
+M = typing.TypeVar("M", bound=Metric)
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: dict[str, Metric] = {}
+
+    def register(self, metric: M) -> M:
+        if metric.name in self.metrics:
+            raise ValueError(f"metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Labels = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: Labels = ()) -> Gauge:
+        return self.register(Gauge(name, help, labels))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labels: Labels = (),
+        buckets: typing.Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        return "".join(metric.render() for metric in self.metrics.values())
+
+    def write(self, path: str | os.PathLike[str]) -> None:
+        """Write atomically, such as for the textfile collector of node_exporter."""
+        path = Path(path).expanduser()
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(self.render())
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+
+def get_spider_name(event: ParseEvent) -> str:
+    return f"{type(event.spider).__module__}.{type(event.spider).__qualname__}"
+
+
+class MetricsHooks(Hooks):
+    """Hooks that aggregate the events of an Engine or App into a registry."""
+
+    def __init__(self, registry: Registry | None = None) -> None:
+        self.registry = Registry() if registry is None else registry
+        registry = self.registry
+        self.requests = registry.counter(
+            "fusion_stat_requests_total",
+            "Requests sent, by source and status code or error.",
+            ("source", "status"),
+        )
+        self.retries = registry.counter(
+            "fusion_stat_retries_total",
+            "Requests that were retry attempts.",
+            ("source",),
+        )
+        self.request_seconds = registry.histogram(
+            "fusion_stat_request_seconds",
+            "Latency of a request attempt, queue and rate limit waits included.",
+            ("source",),
+        )
+        self.bytes_downloaded = registry.counter(
+            "fusion_stat_downloaded_bytes_total",
+            "Bytes received on the wire.",
+            ("source",),
+        )
+        self.in_flight = registry.gauge(
+            "fusion_stat_requests_in_flight",
+            "Requests waiting for a slot, the rate limiter or a response.",
+            ("source",),
+        )
+        self.cache = registry.counter(
+            "fusion_stat_cache_total",
+            "Cache lookups by status: hit, miss or revalidated.",
+            ("source", "status"),
+        )
+        self.spider_seconds = registry.histogram(
+            "fusion_stat_spider_fetch_seconds",
+            "Time for a spider to get its response.",
+            ("spider",),
+        )
+        self.parse_seconds = registry.histogram(
+            "fusion_stat_parse_seconds",
+            "Time of BaseSpider.parse, pydantic validation included.",
+            ("spider",),
+            PARSE_BUCKETS,
+        )
+        self.loop_lag = registry.histogram(
+            "fusion_stat_loop_lag_seconds",
+            "Event loop scheduling lag, see monitor.LoopMonitor.",
+            buckets=PARSE_BUCKETS,
+        )
+        self.loop_stalls = registry.counter(
+            "fusion_stat_loop_stalls_total",
+            "Event loop stalls by the function blocking the loop.",
+            ("culprit",),
+        )
+        self.parse_errors = registry.counter(
+            "fusion_stat_parse_errors_total",
+            "Responses that failed to parse.",
+            ("spider",),
+        )
+
+    def on_request_start(self, event: RequestEvent) -> None:
+        self.in_flight.inc(source=event.source)
+        if event.attempt > 1:
+            self.retries.inc(source=event.source)
+
+    def on_response(self, event: RequestEvent) -> None:
+        source = event.source
+        self.in_flight.dec(source=source)
+        assert event.response is not None and event.finished is not None
+        self.requests.inc(source=source, status=str(event.response.status_code))
+        self.request_seconds.observe(event.finished - event.started, source=source)
+        self.bytes_downloaded.inc(event.bytes_downloaded, source=source)
+
+    def on_parse_end(self, event: ParseEvent) -> None:
+        spider = get_spider_name(event)
+        assert event.finished is not None
+        if event.fetch_started is not None:
+            self.spider_seconds.observe(
+                event.started - event.fetch_started, spider=spider
+            )
+        self.parse_seconds.observe(event.finished - event.started, spider=spider)
+
+    def on_cache(self, source: str, status: str) -> None:
+        self.cache.inc(source=source, status=status)
+
+    def on_loop_lag(self, event: LoopLagEvent) -> None:
+        self.loop_lag.observe(event.lag)
+        if event.culprit is not None:
+            self.loop_stalls.inc(culprit=event.culprit)
+
+    def on_error(
+        self,
+        event: RequestEvent | ParseEvent,
+        exception: BaseException,
+    ) -> None:
+        if isinstance(event, ParseEvent):
+            self.parse_errors.inc(spider=get_spider_name(event))
+            return
+        self.in_flight.dec(source=event.source)
+        self.requests.inc(source=event.source, status=type(exception).__name__)
@@ -5,6 +5,7 @@ from rapidfuzz import process
 from . import spiders
 from .config import MEMBERS_SCORE_CUFOFF
 from .scraper import BaseItem
+from .tracing import traced
 from .utils import mean_scorer
 
 
@@ -24,12 +25,18 @@ U = typing.TypeVar("U", bound=PlayerItemTypes)
 E = typing.TypeVar("E", bound=CompetitionItemTypes)
 
 
+def get_missing(**sources: typing.Any) -> set[str]:
+    """Return the names of sources that are left out in partial mode."""
+    return {name for name, item in sources.items() if item is None}
+
+
 class Competitions:
     def __init__(
         self,
         fotmob: list[spiders.fotmob.competitions.Item],
-        fbref: list[spiders.fbref.competitions.Item],
-        transfermarkt: list[spiders.transfermarkt.competitions.Item],
+        fbref: list[spiders.fbref.competitions.Item] | None = None,
+        transfermarkt: list[spiders.transfermarkt.competitions.Item]
+        | None = None,
         season: int | None = None,
     ) -> None:
         self._fotmob = fotmob
@@ -37,6 +44,11 @@ class Competitions:
         self._transfermarkt = transfermarkt
         self._season = season
 
+    @property
+    def missing(self) -> set[str]:
+        return get_missing(fbref=self._fbref, transfermarkt=self._transfermarkt)
+
+    @traced()
     def _find_competition(
         self,
         query: CompetitionItemTypes,
@@ -70,7 +82,8 @@ class Competitions:
         self,
     ) -> typing.Generator[dict[str, typing.Any], typing.Any, None]:
         """
-        Return a generator of dicts that include the following keys:
+        Return a generator of dicts that include the following keys,
+        keys of missing sources are left out:
 
         * id (str): competition id
         * name (str): config competition name
@@ -88,26 +101,29 @@ class Competitions:
                 * path_name (str): transfermarkt competition path name
         """
         for fotmob_competition in self._fotmob:
-            fbref_competition = self._find_competition(
-                fotmob_competition, self._fbref
-            )
-            transfermarkt_competition = self._find_competition(
-                fotmob_competition, self._transfermarkt
-            )
-
             item = {
                 "id": fotmob_competition.id,
                 "name": fotmob_competition.name,
                 "fotmob": fotmob_competition.model_dump(),
-                "fbref": fbref_competition.model_dump(),
-                "transfermarkt": transfermarkt_competition.model_dump(),
             }
+            if self._fbref is not None:
+                fbref_competition = self._find_competition(
+                    fotmob_competition, self._fbref
+                )
+                item["fbref"] = fbref_competition.model_dump()
+            if self._transfermarkt is not None:
+                transfermarkt_competition = self._find_competition(
+                    fotmob_competition, self._transfermarkt
+                )
+                item["transfermarkt"] = transfermarkt_competition.model_dump()
             yield item
 
     @property
+    @traced()
     def items(self) -> list[dict[str, typing.Any]]:
         """
-        Return a list of dicts that include the following keys:
+        Return a list of dicts that include the following keys,
+        keys of missing sources are left out:
 
         * id (str): competition id
         * name (str): config competition name
@@ -130,7 +146,8 @@ class Competitions:
         self,
     ) -> typing.Generator[dict[str, typing.Any], typing.Any, None]:
         """
-        Return a generator of dicts that include the following keys:
+        Return a generator of dicts that include the following keys,
+        keys of missing sources are left out:
 
             * fotmob_id (str): fotmob competition id
             * fbref_id (str): fbref competition id
@@ -141,14 +158,21 @@ class Competitions:
             * season (int, optional): fotmob competition season
         """
         for item in self.get_items():
-            competition_params = {
+            competition_params: dict[str, typing.Any] = {
                 "fotmob_id": item["fotmob"]["id"],
-                "fbref_id": item["fbref"]["id"],
-                "fbref_path_name": item["fbref"]["path_name"],
                 "official_name": item["name"],
-                "transfermarkt_id": item["transfermarkt"]["id"],
-                "transfermarkt_path_name": item["transfermarkt"]["path_name"],
             }
+            if "fbref" in item:
+                competition_params["fbref_id"] = item["fbref"]["id"]
+                competition_params["fbref_path_name"] = item["fbref"]["path_name"]
+            if "transfermarkt" in item:
+                transfermarkt_competition = item["transfermarkt"]
+                competition_params["transfermarkt_id"] = transfermarkt_competition[
+                    "id"
+                ]
+                competition_params["transfermarkt_path_name"] = (
+                    transfermarkt_competition["path_name"]
+                )
 
             if self._season is not None:
                 competition_params["season"] = self._season
@@ -160,15 +184,24 @@ class Competition:
     def __init__(
         self,
         fotmob: spiders.fotmob.competition.Item,
-        fbref: spiders.fbref.competition.Item,
-        official: spiders.official.competition.Item,
-        transfermarkt: spiders.transfermarkt.competition.Item,
+        fbref: spiders.fbref.competition.Item | None = None,
+        official: spiders.official.competition.Item | None = None,
+        transfermarkt: spiders.transfermarkt.competition.Item | None = None,
     ) -> None:
         self._fotmob = fotmob
         self._fbref = fbref
         self._official = official
         self._transfermarkt = transfermarkt
 
+    @property
+    def missing(self) -> set[str]:
+        return get_missing(
+            fbref=self._fbref,
+            official=self._official,
+            transfermarkt=self._transfermarkt,
+        )
+
+    @traced()
     def _find_team(
         self,
         query: BaseItem,
@@ -184,7 +217,8 @@ class Competition:
     @property
     def info(self) -> dict[str, typing.Any]:
         """
-        Return a dict that includes the following keys:
+        Return a dict that includes the following keys,
+        keys of missing sources are left out:
 
         * id (str): competition id.
         * name (str): competition name.
@@ -196,23 +230,31 @@ class Competition:
         * market_values (str): Competition market values.
         * player_average_market_value (str): Competition player average market value.
         """
-        return {
+        info: dict[str, typing.Any] = {
             "id": self._fotmob.id,
             "name": self._fotmob.name,
-            "logo": self._official.logo,
             "type": self._fotmob.type,
             "season": self._fotmob.season,
             "country_code": self._fotmob.country_code,
-            "names": self._fotmob.names | {self._fbref.name},
-            "market_values": self._transfermarkt.market_values,
-            "player_average_market_value": self._transfermarkt.player_average_market_value,  # noqa: E501
+            "names": set(self._fotmob.names),
         }
+        if self._official is not None:
+            info["logo"] = self._official.logo
+        if self._fbref is not None:
+            info["names"] |= {self._fbref.name}
+        if self._transfermarkt is not None:
+            info["market_values"] = self._transfermarkt.market_values
+            info["player_average_market_value"] = (
+                self._transfermarkt.player_average_market_value
+            )
+        return info
 
     def get_teams(
         self,
     ) -> typing.Generator[dict[str, typing.Any], typing.Any, None]:
         """
-        Return a generator of dicts that include the following keys:
+        Return a generator of dicts that include the following keys,
+        keys of missing sources are left out:
 
         * id (str): team id.
         * name (str): team name.
@@ -232,27 +274,29 @@ class Competition:
                 * xg (float): expected goals.
         """
         for fotmob_team in self._fotmob.teams:
-            fbref_team = self._find_team(fotmob_team, self._fbref.teams)
-            official_team = self._find_team(fotmob_team, self._official.teams)
-            transfermarkt_team = self._find_team(
-                fotmob_team, self._transfermarkt.teams
-            )
-
-            team = {
-                **fotmob_team.model_dump(),
-                "country_code": official_team.country_code,
-                "market_values": transfermarkt_team.market_values,
-                "logo": official_team.logo,
-                "shooting": fbref_team.shooting.model_dump(),
-            }
-            team["names"] |= fbref_team.names
+            team = fotmob_team.model_dump()
+            if self._official is not None:
+                official_team = self._find_team(fotmob_team, self._official.teams)
+                team["country_code"] = official_team.country_code
+                team["logo"] = official_team.logo
+            if self._transfermarkt is not None:
+                transfermarkt_team = self._find_team(
+                    fotmob_team, self._transfermarkt.teams
+                )
+                team["market_values"] = transfermarkt_team.market_values
+            if self._fbref is not None:
+                fbref_team = self._find_team(fotmob_team, self._fbref.teams)
+                team["shooting"] = fbref_team.shooting.model_dump()
+                team["names"] |= fbref_team.names
 
             yield team
 
     @property
+    @traced()
     def teams(self) -> list[dict[str, typing.Any]]:
         """
-        Return a list of dicts that include the following keys:
+        Return a list of dicts that include the following keys,
+        keys of missing sources are left out:
 
         * id (str): team id.
         * name (str): team name.
@@ -293,9 +337,11 @@ class Competition:
         )
 
     @property
+    @traced()
     def table(self) -> list[dict[str, typing.Any]]:
         """
-        Return a list of dicts sorted by the standings that include the following keys:
+        Return a list of dicts sorted by the standings that include the following keys,
+        keys of missing sources are left out:
 
         * id (str): team id.
         * name (str): team name.
@@ -309,8 +355,9 @@ class Competition:
         * xg (float): expected goals.
         * logo (str): team logo.
         """
-        teams = [
-            {
+        teams = []
+        for team in self.get_teams():
+            row = {
                 "id": team["id"],
                 "name": team["name"],
                 "played": team["played"],
@@ -320,11 +367,12 @@ class Competition:
                 "goals_for": team["goals_for"],
                 "goals_against": team["goals_against"],
                 "points": team["points"],
-                "xg": team["shooting"]["xg"],
-                "logo": team["logo"],
             }
-            for team in self.get_teams()
-        ]
+            if "shooting" in team:
+                row["xg"] = team["shooting"]["xg"]
+            if "logo" in team:
+                row["logo"] = team["logo"]
+            teams.append(row)
         table = sorted(teams, key=self.sort_table_key)
         return table
 
@@ -371,6 +419,7 @@ class Competition:
             yield match
 
     @property
+    @traced()
     def matches(self) -> list[dict[str, typing.Any]]:
         """
         Return a list of dicts that include the following keys:
@@ -399,7 +448,8 @@ class Competition:
         self,
     ) -> typing.Generator[dict[str, typing.Any], typing.Any, None]:
         """
-        Return a generator of dicts that include the following keys:
+        Return a generator of dicts that include the following keys,
+        keys of missing sources are left out:
 
             * fotmob_id (str): fotmob team id
             * fbref_id (str): fbref team id
@@ -408,22 +458,23 @@ class Competition:
             * transfermarkt_path_name (str): transfermarkt team path name
         """
         for fotmob_team in self._fotmob.teams:
-            fbref_team = self._find_team(
-                fotmob_team,
-                self._fbref.teams,
-            )
-            transfermarkt_team = self._find_team(
-                fotmob_team,
-                self._transfermarkt.teams,
-            )
-
-            team_params = {
-                "fotmob_id": fotmob_team.id,
-                "fbref_id": fbref_team.id,
-                "fbref_path_name": fbref_team.path_name,
-                "transfermarkt_id": transfermarkt_team.id,
-                "transfermarkt_path_name": transfermarkt_team.path_name,
-            }
+            team_params = {"fotmob_id": fotmob_team.id}
+            if self._fbref is not None:
+                fbref_team = self._find_team(
+                    fotmob_team,
+                    self._fbref.teams,
+                )
+                team_params["fbref_id"] = fbref_team.id
+                team_params["fbref_path_name"] = fbref_team.path_name
+            if self._transfermarkt is not None:
+                transfermarkt_team = self._find_team(
+                    fotmob_team,
+                    self._transfermarkt.teams,
+                )
+                team_params["transfermarkt_id"] = transfermarkt_team.id
+                team_params["transfermarkt_path_name"] = (
+                    transfermarkt_team.path_name
+                )
             yield team_params
 
 
@@ -431,15 +482,25 @@ class Team:
     def __init__(
         self,
         fotmob: spiders.fotmob.team.Item,
-        fbref: spiders.fbref.team.Item,
-        transfermarkt: spiders.transfermarkt.team.Item,
-        transfermarkt_staffs: list[spiders.transfermarkt.staffs.Item],
+        fbref: spiders.fbref.team.Item | None = None,
+        transfermarkt: spiders.transfermarkt.team.Item | None = None,
+        transfermarkt_staffs: list[spiders.transfermarkt.staffs.Item]
+        | None = None,
     ) -> None:
         self._fotmob = fotmob
         self._fbref = fbref
         self._transfermarkt = transfermarkt
         self._transfermarkt_staffs = transfermarkt_staffs
 
+    @property
+    def missing(self) -> set[str]:
+        return get_missing(
+            fbref=self._fbref,
+            transfermarkt=self._transfermarkt,
+            transfermarkt_staffs=self._transfermarkt_staffs,
+        )
+
+    @traced()
     def _find_player(
         self,
         query: PlayerItemTypes,
@@ -460,18 +521,22 @@ class Team:
 
     @property
     def info(self) -> dict[str, typing.Any]:
-        return {
+        info: dict[str, typing.Any] = {
             "id": self._fotmob.id,
             "name": self._fotmob.name,
-            "names": self._fotmob.names | self._fbref.names,
+            "names": set(self._fotmob.names),
             "country_code": self._fotmob.country_code,
-            "market_values": self._transfermarkt.market_values,
         }
+        if self._fbref is not None:
+            info["names"] |= self._fbref.names
+        if self._transfermarkt is not None:
+            info["market_values"] = self._transfermarkt.market_values
+        return info
 
     def get_staffs(
         self,
     ) -> typing.Generator[dict[str, typing.Any], typing.Any, None]:
-        for transfermarkt_staff in self._transfermarkt_staffs:
+        for transfermarkt_staff in self._transfermarkt_staffs or []:
             yield {
                 "id": transfermarkt_staff.id,
                 "name": transfermarkt_staff.name,
@@ -487,32 +552,34 @@ class Team:
     ) -> typing.Generator[dict[str, typing.Any], typing.Any, None]:
         for fotmob_player in self._fotmob.players:
             try:
-                fbref_player = self._find_player(
-                    fotmob_player,
-                    self._fbref.players,
-                )
-                transfermarkt_player = self._find_player(
-                    fotmob_player,
-                    self._transfermarkt.players,
-                )
-
                 name = fotmob_player.name
-                shooting = fbref_player.shooting
-                player = {
+                player: dict[str, typing.Any] = {
                     "id": fotmob_player.id,
                     "name": name,
-                    "names": {name} | fbref_player.names,
+                    "names": {name},
                     "country": fotmob_player.country,
                     "position": fotmob_player.position,
-                    "date_of_birth": transfermarkt_player.date_of_birth,
-                    "market_values": transfermarkt_player.market_values,
-                    "shooting": shooting.model_dump(),
                 }
+                if self._transfermarkt is not None:
+                    transfermarkt_player = self._find_player(
+                        fotmob_player,
+                        self._transfermarkt.players,
+                    )
+                    player["date_of_birth"] = transfermarkt_player.date_of_birth
+                    player["market_values"] = transfermarkt_player.market_values
+                if self._fbref is not None:
+                    fbref_player = self._find_player(
+                        fotmob_player,
+                        self._fbref.players,
+                    )
+                    player["names"] |= fbref_player.names
+                    player["shooting"] = fbref_player.shooting.model_dump()
                 yield player
             except TypeError:
                 pass
 
     @property
+    @traced()
     def players(self) -> list[dict[str, typing.Any]]:
         return list(self.get_players())
 
@@ -521,21 +588,23 @@ class Team:
     ) -> typing.Generator[dict[str, typing.Any], typing.Any, None]:
         for fotmob_player in self._fotmob.players:
             try:
-                fbref_player = self._find_player(
-                    fotmob_player,
-                    self._fbref.players,
-                )
-                transfermarkt_player = self._find_player(
-                    fotmob_player,
-                    self._transfermarkt.players,
-                )
-                player_params = {
-                    "fotmob_id": fotmob_player.id,
-                    "fbref_id": fbref_player.id,
-                    "fbref_path_name": fbref_player.path_name,
-                    "transfermarkt_id": transfermarkt_player.id,
-                    "transfermarkt_path_name": transfermarkt_player.path_name,
-                }
+                player_params = {"fotmob_id": fotmob_player.id}
+                if self._fbref is not None:
+                    fbref_player = self._find_player(
+                        fotmob_player,
+                        self._fbref.players,
+                    )
+                    player_params["fbref_id"] = fbref_player.id
+                    player_params["fbref_path_name"] = fbref_player.path_name
+                if self._transfermarkt is not None:
+                    transfermarkt_player = self._find_player(
+                        fotmob_player,
+                        self._transfermarkt.players,
+                    )
+                    player_params["transfermarkt_id"] = transfermarkt_player.id
+                    player_params["transfermarkt_path_name"] = (
+                        transfermarkt_player.path_name
+                    )
                 yield player_params
             except TypeError:
                 pass
@@ -543,7 +612,7 @@ class Team:
     def get_staffs_params(
         self,
     ) -> typing.Generator[dict[str, typing.Any], typing.Any, None]:
-        for transfermarkt_staff in self._transfermarkt_staffs:
+        for transfermarkt_staff in self._transfermarkt_staffs or []:
             yield {
                 "transfermarkt_id": transfermarkt_staff.id,
                 "transfermarkt_path_name": transfermarkt_staff.path_name,
@@ -554,13 +623,17 @@ class Player:
     def __init__(
         self,
         fotmob: spiders.fotmob.player.Item,
-        fbref: spiders.fbref.player.Item,
-        transfermarkt: spiders.transfermarkt.player.Item,
+        fbref: spiders.fbref.player.Item | None = None,
+        transfermarkt: spiders.transfermarkt.player.Item | None = None,
     ) -> None:
         self._fotmob = fotmob
         self._fbref = fbref
         self._transfermarkt = transfermarkt
 
+    @property
+    def missing(self) -> set[str]:
+        return get_missing(fbref=self._fbref, transfermarkt=self._transfermarkt)
+
 
 class Staff:
     def __init__(self, transfermarkt: spiders.transfermarkt.staff.Item) -> None:
@@ -574,6 +647,7 @@ class Matches:
     ) -> None:
         self._fotmob = fotmob
 
+    @traced()
     def _find_match(
         self,
         query: BaseItem,
@@ -614,6 +688,7 @@ class Matches:
             yield fotmob_match.model_dump()
 
     @property
+    @traced()
     def items(self) -> list[dict[str, typing.Any]]:
         """
         Return a list of dicts that include the following keys:
@@ -0,0 +1,133 @@
+"""
+Detect the event loop being blocked, such as by a slow parse:
+
+    async with App(loop_monitor=LoopMonitor(), hooks=[MetricsHooks()]) as app:
+        ...
+"""
+
+import asyncio
+import sys
+import threading
+import time
+import types
+
+from .hooks import Hooks, LoopLagEvent
+
+# 卡顿归因于这些模块中最外层的函数，例如 Spider.parse 或 Team.players
+CULPRIT_MODULES = ("fusion_stat.spiders.", "fusion_stat.models")
+
+
+def _describe(frame: types.FrameType) -> str:
+    code = frame.f_code
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{frame.f_globals.get('__name__')}.{name}"
+
+
+def get_culprit(frame: types.FrameType | None) -> str | None:
+    innermost = None
+    culprit = None
+    while frame is not None:
+        description = _describe(frame)
+        if innermost is None:
+            innermost = description
+        if description.startswith(CULPRIT_MODULES):
+            culprit = description
+        frame = frame.f_back
+    return culprit or innermost
+
+
+class LoopMonitor:
+    """
+    A watchdog thread pings the event loop every `interval` seconds and
+    reports the lag to the hooks (Hooks.on_loop_lag). When the loop does not
+    answer within `threshold` seconds, the stack of the loop thread is
+    sampled to find what is blocking it. Nothing runs on the loop except
+    the pings and the reports.
+
+    The lag is reported to `hooks` and to those of the engines the monitor
+    is attached to, so one monitor can be shared by several Apps.
+    """
+
+    def __init__(
+        self,
+        *,
+        interval: float = 0.25,
+        threshold: float = 0.1,
+        hooks: list[Hooks] | None = None,
+    ) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self.hooks = [] if hooks is None else hooks
+        # 所附加的 engine 的 hooks 列表，它们之后的修改同样生效
+        self._attached: list[list[Hooks]] = []
+        self.max_lag = 0.0
+        self.stalls = 0
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def attach(self, hooks: list[Hooks]) -> None:
+        """Also report to the hooks list of an engine."""
+        self._attached.append(hooks)
+
+    def detach(self, hooks: list[Hooks]) -> None:
+        """Stop reporting to the hooks list, stop the thread after the last."""
+        self._attached = [other for other in self._attached if other is not hooks]
+        if not self._attached:
+            self.stop()
+
+    def start(self, loop: asyncio.AbstractEventLoop | None = None) -> None:
+        if self._thread is not None:
+            return
+        loop = loop or asyncio.get_running_loop()
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._watch,
+            args=(loop, threading.get_ident()),
+            name="fusion-stat-loop-monitor",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _watch(self, loop: asyncio.AbstractEventLoop, thread_id: int) -> None:
+        while not self._stop.wait(self.interval):
+            answered = threading.Event()
+            started = time.monotonic()
+            try:
+                loop.call_soon_threadsafe(answered.set)
+            except RuntimeError:
+                # loop 已经关闭
+                return
+            culprit = None
+            if not answered.wait(self.threshold):
+                culprit = get_culprit(sys._current_frames().get(thread_id))
+                while not answered.wait(self.interval):
+                    if self._stop.is_set():
+                        return
+            event = LoopLagEvent(time.monotonic() - started, started, culprit)
+            try:
+                loop.call_soon_threadsafe(self._report, event)
+            except RuntimeError:
+                return
+
+    def _report(self, event: LoopLagEvent) -> None:
+        self.max_lag = max(self.max_lag, event.lag)
+        if event.culprit is not None:
+            self.stalls += 1
+        seen = set()
+        for hooks in (self.hooks, *self._attached):
+            for hook in hooks:
+                # 同一个 hook 可能在多个列表中
+                if id(hook) not in seen:
+                    seen.add(id(hook))
+                    hook.on_loop_lag(event)
@@ -0,0 +1,158 @@
+"""
+cProfile and tracemalloc around the CPU bound parts of App calls, see
+App.profiling. Only code running on the event loop thread is profiled, so
+parses sent to an executor are not included.
+"""
+
+import contextvars
+import cProfile
+import io
+import itertools
+import os
+import pstats
+import tracemalloc
+import typing
+from contextlib import nullcontext
+from pathlib import Path
+from types import TracebackType
+
+_profiler: contextvars.ContextVar["Profiler | None"] = contextvars.ContextVar(
+    "fusion_stat_profiler", default=None
+)
+
+
+def get_profiler() -> "Profiler | None":
+    return _profiler.get()
+
+
+class _Call:
+    def __init__(self, profiler: "Profiler", name: str) -> None:
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.prefix = f"{next(self.profiler._counter):04d}-{self.name}"
+        if self.profiler.memory:
+            self.before = tracemalloc.take_snapshot()
+
+    def __exit__(self, *args: object) -> None:
+        if self.profiler.memory:
+            after = tracemalloc.take_snapshot()
+            self.profiler.write_snapshots(self.prefix, self.before, after)
+
+
+class Profiler:
+    """
+    CPU time of BaseSpider.parse (pydantic validation included) and of the
+    fusion methods of the models is recorded by one cProfile.Profile.
+    Every App call takes a tracemalloc snapshot before and after, concurrent
+    calls share the same process wide snapshots.
+
+    Files written to path:
+
+    * cpu.prof: pstats dump, open with pstats or snakeviz
+    * cpu.txt: the top functions by cumulative time
+    * NNNN-<call>-before.tracemalloc, NNNN-<call>-after.tracemalloc:
+        tracemalloc.Snapshot.load can read them
+    * NNNN-<call>-memory.txt: the lines that allocated the most between
+        the two snapshots and the peak of the call
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        *,
+        memory: bool = True,
+        frames: int = 1,
+        top: int = 30,
+    ) -> None:
+        self.path = Path(path).expanduser()
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.memory = memory
+        self.frames = frames
+        self.top = top
+        self.profile = cProfile.Profile()
+        self._depth = 0
+        self._counter = itertools.count()
+        self._started_tracemalloc = False
+        self._token: contextvars.Token["Profiler | None"] | None = None
+
+    def start(self) -> None:
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracemalloc = True
+        self._token = _profiler.set(self)
+
+    def stop(self) -> None:
+        if self._token is not None:
+            _profiler.reset(self._token)
+            self._token = None
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        self.write_stats()
+
+    # 嵌套的 section 只启用一次 cProfile
+    def __enter__(self) -> None:
+        if not self._depth:
+            self.profile.enable()
+        self._depth += 1
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self._depth -= 1
+        if not self._depth:
+            self.profile.disable()
+
+    def section(self) -> "Profiler":
+        """Profile the CPU time of the block."""
+        return self
+
+    def call(self, name: str) -> _Call:
+        """Take tracemalloc snapshots before and after the block."""
+        if self.memory:
+            tracemalloc.reset_peak()
+        return _Call(self, name)
+
+    def write_snapshots(
+        self,
+        prefix: str,
+        before: tracemalloc.Snapshot,
+        after: tracemalloc.Snapshot,
+    ) -> None:
+        before.dump(str(self.path / f"{prefix}-before.tracemalloc"))
+        after.dump(str(self.path / f"{prefix}-after.tracemalloc"))
+        _, peak = tracemalloc.get_traced_memory()
+        lines = [f"peak: {peak / 1024:.1f} KiB"]
+        for stat in after.compare_to(before, "lineno")[: self.top]:
+            lines.append(str(stat))
+        (self.path / f"{prefix}-memory.txt").write_text("\n".join(lines) + "\n")
+
+    def write_stats(self) -> None:
+        self.profile.dump_stats(self.path / "cpu.prof")
+        stream = io.StringIO()
+        try:
+            stats = pstats.Stats(self.profile, stream=stream)
+        except TypeError:
+            # 没有任何记录时 pstats 无法创建
+            return
+        stats.sort_stats("cumulative").print_stats(self.top)
+        (self.path / "cpu.txt").write_text(stream.getvalue())
+
+
+def section() -> typing.ContextManager[None]:
+    """Profile the block if a profiler is active, such as a parse."""
+    if (profiler := _profiler.get()) is None:
+        return nullcontext()
+    return profiler.section()
+
+
+def call(name: str) -> typing.ContextManager[None]:
+    """Snapshot the memory around an App call if a profiler is active."""
+    if (profiler := _profiler.get()) is None:
+        return nullcontext()
+    return profiler.call(name)
@@ -0,0 +1,124 @@
+import asyncio
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from .config import RATE_LIMITS
+
+
+def parse_retry_after(value: str) -> float | None:
+    """
+    "120" => 120.0
+    "Wed, 21 Oct 2015 07:28:00 GMT" => seconds from now
+    """
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        dt = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return max(0.0, (dt - datetime.now(timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    """
+    Tokens are refilled at `rate` per second up to `capacity`, every request
+    takes one. A negative level means requests are waiting for tokens.
+
+    The bucket is guarded by a thread lock instead of an asyncio lock so it
+    can be shared by event loops running in different threads.
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        if now > self._updated:
+            elapsed = now - self._updated
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    @property
+    def level(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+    def reserve(self) -> float:
+        """Take a token and return the seconds to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            ready_at = self._updated + max(0.0, -self._tokens) / self.rate
+            return max(0.0, ready_at - now)
+
+    def refund(self) -> None:
+        """Give back a reserved token that will not be used."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens + 1)
+
+    def pause(self, seconds: float) -> None:
+        """Stop handing out tokens for `seconds`, such as after a Retry-After."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            until = now + seconds
+            self._paused_until = max(self._paused_until, until)
+            if until > self._updated:
+                self._tokens = min(self._tokens, 0.0)
+                self._updated = until
+
+    async def acquire(self) -> None:
+        delay = self.reserve()
+        try:
+            await asyncio.sleep(delay)
+            # 等待期间可能收到了新的 Retry-After
+            while (delay := self._paused_until - time.monotonic()) > 0:
+                await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            # 被取消的请求不应让后面的请求多等
+            self.refund()
+            raise
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        limits: dict[str, tuple[float, float]] | None = None,
+    ) -> None:
+        """Parameters:
+
+        * limits: {source: (rate, capacity)}, sources that are not
+            included are not limited
+        """
+        self.buckets = {
+            source: TokenBucket(rate, capacity)
+            for source, (rate, capacity) in (limits or {}).items()
+        }
+
+    async def acquire(self, source: str) -> None:
+        if (bucket := self.buckets.get(source)) is not None:
+            await bucket.acquire()
+
+    def pause(self, source: str, seconds: float) -> None:
+        if (bucket := self.buckets.get(source)) is not None:
+            bucket.pause(seconds)
+
+    @property
+    def levels(self) -> dict[str, float]:
+        return {source: bucket.level for source, bucket in self.buckets.items()}
+
+
+rate_limiter = RateLimiter(RATE_LIMITS)
@@ -0,0 +1,41 @@
+import random
+from dataclasses import dataclass
+
+import httpx
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    Retry transient failures with exponential backoff, the n-th retry waits
+    `backoff_base * 2 ** (n - 1)` seconds (capped at `backoff_max`) plus up
+    to `jitter` of that delay at random.
+    """
+
+    max_attempts: int = 3
+    backoff_base: float = 0.5
+    backoff_max: float = 30.0
+    jitter: float = 0.5
+    statuses: frozenset[int] = frozenset({429, 500, 502, 503, 504})
+    exceptions: tuple[type[Exception], ...] = (
+        httpx.TimeoutException,
+        httpx.NetworkError,
+        httpx.RemoteProtocolError,
+    )
+
+    def get_delay(self, attempt: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * 2.0 ** (attempt - 1))
+        return delay + random.uniform(0, self.jitter * delay)
+
+    def is_retryable(
+        self,
+        attempt: int,
+        *,
+        response: httpx.Response | None = None,
+        exception: Exception | None = None,
+    ) -> bool:
+        if attempt >= self.max_attempts:
+            return False
+        if response is not None:
+            return response.status_code in self.statuses
+        return isinstance(exception, self.exceptions)
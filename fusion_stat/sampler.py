@@ -0,0 +1,206 @@
+"""
+Keep the payloads of slow spiders on disk to investigate them offline:
+
+    sampler = SlowCallSampler("~/.cache/fusion-stat/samples", latency=5)
+    async with App(hooks=[sampler]) as app:
+        ...
+
+    sampler.close()
+
+    for sample in load_samples("~/.cache/fusion-stat/samples"):
+        sample.timings, sample.replay()
+"""
+
+import os
+import pickle
+import queue
+import threading
+import time
+import traceback
+import typing
+import weakref
+import zlib
+from pathlib import Path
+
+import httpx
+
+from .hooks import Hooks, ParseEvent, RequestEvent
+
+if typing.TYPE_CHECKING:
+    from .scraper import BaseSpider
+
+
+class Sample:
+    def __init__(
+        self,
+        *,
+        spider: "BaseSpider",
+        url: str,
+        request_headers: list[tuple[str, str]],
+        status_code: int,
+        headers: list[tuple[str, str]],
+        content: bytes,
+        timings: dict[str, float],
+    ) -> None:
+        self.spider = spider
+        self.url = url
+        self.request_headers = request_headers
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.timings = timings
+
+    @property
+    def request(self) -> httpx.Request:
+        return httpx.Request("GET", self.url, headers=self.request_headers)
+
+    @property
+    def response(self) -> httpx.Response:
+        return httpx.Response(
+            self.status_code,
+            headers=self.headers,
+            content=self.content,
+            request=self.request,
+        )
+
+    def replay(self) -> typing.Any:
+        """Parse the captured response again, such as under a profiler."""
+        return self.spider.parse(self.response)
+
+
+def get_request_timings(event: RequestEvent) -> dict[str, float]:
+    """Seconds of each stage of a request, see hooks.RequestEvent."""
+    stages = [
+        ("build", event.started, event.built),
+        ("queue", event.built, event.queued),
+        ("rate_limit", event.queued, event.sent),
+        ("transfer", event.sent, event.finished),
+    ]
+    timings = {
+        name: end - start
+        for name, start, end in stages
+        if start is not None and end is not None
+    }
+    if event.sent is not None:
+        for name, at in event.trace.items():
+            timings[f"trace.{name}"] = at - event.sent
+    timings["attempt"] = event.attempt
+    return timings
+
+
+class SlowCallSampler(Hooks):
+    """
+    Capture a spider whose network time (the last attempt of its request)
+    and parse took more than `latency` seconds or whose parse took more than
+    `parse_time` seconds. The waits for a slot of the source and for the
+    rate limiter are not counted, they are kept as the "queue" and
+    "rate_limit" timings. Only the newest `capacity` samples are kept in the
+    directory.
+
+    Samples are written by a background thread, call flush() to wait for
+    them and close() to stop the thread.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        *,
+        latency: float = 5.0,
+        parse_time: float = 1.0,
+        capacity: int = 100,
+    ) -> None:
+        self.path = Path(path).expanduser()
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.latency = latency
+        self.parse_time = parse_time
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        # 响应对应的请求阶段耗时，缓存命中的响应没有
+        self._requests: weakref.WeakKeyDictionary[
+            httpx.Response, dict[str, float]
+        ] = weakref.WeakKeyDictionary()
+        self._samples: queue.Queue[Sample | None] = queue.Queue()
+        self._thread: threading.Thread | None = None
+
+    def on_response(self, event: RequestEvent) -> None:
+        if event.response is not None:
+            self._requests[event.response] = get_request_timings(event)
+
+    def on_parse_end(self, event: ParseEvent) -> None:
+        assert event.finished is not None
+        parse_time = event.finished - event.started
+        fetch_started = event.fetch_started or event.started
+        # 缓存命中的响应没有网络耗时
+        request = self._requests.get(event.response, {})
+        latency = request.get("transfer", 0.0) + parse_time
+        if latency < self.latency and parse_time < self.parse_time:
+            return
+        timings = {
+            "latency": latency,
+            "fetch": event.started - fetch_started,
+            "queue": request.get("queue", 0.0),
+            "rate_limit": request.get("rate_limit", 0.0),
+            "parse": parse_time,
+            **{f"request.{name}": value for name, value in request.items()},
+        }
+        response = event.response
+        sample = Sample(
+            spider=event.spider,
+            url=str(response.request.url),
+            request_headers=response.request.headers.multi_items(),
+            status_code=response.status_code,
+            headers=response.headers.multi_items(),
+            content=response.content,
+            timings=timings,
+        )
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._write, name="fusion-stat-sampler", daemon=True
+            )
+            self._thread.start()
+        self._samples.put(sample)
+
+    def _write(self) -> None:
+        while True:
+            sample = self._samples.get()
+            try:
+                if sample is None:
+                    return
+                self.add(sample)
+            except Exception:
+                # 写入失败时线程不能退出，否则 flush() 会一直等待
+                traceback.print_exc()
+            finally:
+                self._samples.task_done()
+
+    def flush(self) -> None:
+        """Wait for the captured samples to be written."""
+        self._samples.join()
+
+    def close(self) -> None:
+        """Write the captured samples and stop the writer thread."""
+        if self._thread is None:
+            return
+        self._samples.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def add(self, sample: Sample) -> None:
+        """Write a sample to the directory, this blocks."""
+        data = zlib.compress(pickle.dumps(sample))
+        name = f"{time.time_ns()}-{type(sample.spider).__module__}.sample"
+        with self._lock:
+            tmp = self.path / f"{name}.tmp"
+            tmp.write_bytes(data)
+            os.replace(tmp, self.path / name)
+            # 环形缓冲: 只保留最新的 capacity 个
+            files = sorted(self.path.glob("*.sample"))
+            for file in files[: max(0, len(files) - self.capacity)]:
+                file.unlink(missing_ok=True)
+
+
+def load_samples(path: str | os.PathLike[str]) -> typing.Iterator[Sample]:
+    """Yield the samples from the oldest to the newest."""
+    for file in sorted(Path(path).expanduser().glob("*.sample")):
+        sample: Sample = pickle.loads(zlib.decompress(file.read_bytes()))
+        yield sample
@@ -1,12 +1,41 @@
 import asyncio
+import concurrent.futures
+import enum
+import hashlib
+import heapq
+import itertools
+import json
+import time
 import typing
 from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
 
 import httpx
 from pydantic import BaseModel
 
+from . import profiling, ratelimit
+from .breaker import CircuitBreakers, CircuitOpenError
+from .cache import BaseCache, Entry
+from .checkpoint import Checkpoint
+from .config import CONCURRENCY, DEFAULT_CONCURRENCY, RETRIES, SOURCES, TIMEOUTS
+from .hooks import Hooks, ParseEvent, RequestEvent
+from .monitor import LoopMonitor
+from .retry import RetryPolicy
+from .tracing import tracer
+
+
+class Priority(enum.IntEnum):
+    """Requests of a higher priority jump the queue of their source."""
+
+    HIGH = 0
+    NORMAL = 1
+    LOW = 2
+
 
 class BaseSpider(ABC):
+    # 例如比赛实时数据使用 HIGH，历史赛季的回填使用 LOW
+    priority = Priority.NORMAL
+
     @property
     @abstractmethod
     def request(self) -> httpx.Request:
@@ -22,31 +51,377 @@ class BaseItem(BaseModel):
     name: str
 
 
+def get_source(url: httpx.URL) -> str:
+    """
+    "https://www.fotmob.com/api/allLeagues" => "fotmob"
+
+    Hosts that are not in config.SOURCES are returned as is.
+    """
+    host = url.host
+    for domain, source in SOURCES.items():
+        if host == domain or host.endswith(f".{domain}"):
+            return source
+    return host
+
+
+# 由 httpx.AsyncClient 或传输层自动添加的 headers，不影响响应内容
+FINGERPRINT_IGNORED_HEADERS = frozenset(
+    {
+        "accept",
+        "accept-encoding",
+        "connection",
+        "content-length",
+        "host",
+        "if-modified-since",
+        "if-none-match",
+        "user-agent",
+    }
+)
+
+
+def fingerprint(request: httpx.Request) -> str:
+    """
+    Hash of the method, the canonical url (query params sorted, fragment
+    dropped) and the headers that can change the response.
+    """
+    url = request.url
+    query = sorted(url.params.multi_items())
+    headers = sorted(
+        (key.lower(), value)
+        for key, value in request.headers.multi_items()
+        if key.lower() not in FINGERPRINT_IGNORED_HEADERS
+    )
+    data = [
+        request.method,
+        f"{url.scheme}://{url.netloc.decode().lower()}{url.path}",
+        query,
+        headers,
+    ]
+    return hashlib.sha1(json.dumps(data).encode()).hexdigest()
+
+
+class Scheduler:
+    """
+    Limit concurrent requests per source, excess requests wait in a queue
+    ordered by priority, then by arrival.
+    """
+
+    def __init__(
+        self,
+        limits: dict[str, int] | None = None,
+        default: int = DEFAULT_CONCURRENCY,
+    ) -> None:
+        self.limits = {**CONCURRENCY, **(limits or {})}
+        self.default = default
+        self._active: dict[str, int] = {}
+        self._waiters: dict[
+            str, list[tuple[int, int, asyncio.Future[None]]]
+        ] = {}
+        self._counter = itertools.count()
+
+    def get_limit(self, source: str) -> int:
+        return self.limits.get(source, self.default)
+
+    @property
+    def max_connections(self) -> int:
+        # 每个来源各有自己的名额，未配置的也是；SOURCES 之外的主机再留一份 default
+        sources = set(SOURCES.values()) | set(self.limits)
+        return sum(self.get_limit(source) for source in sources) + self.default
+
+    def waiting(self, source: str) -> int:
+        waiters = self._waiters.get(source, [])
+        return sum(not future.done() for *_, future in waiters)
+
+    async def _acquire(self, source: str, priority: int) -> None:
+        active = self._active.get(source, 0)
+        waiters = self._waiters.setdefault(source, [])
+        if active < self.get_limit(source) and not waiters:
+            self._active[source] = active + 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(waiters, (priority, next(self._counter), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # 已经被分配了名额，但还没来得及运行就被取消
+            if future.done() and not future.cancelled():
+                self._release(source)
+            raise
+
+    def _release(self, source: str) -> None:
+        waiters = self._waiters[source]
+        while waiters:
+            *_, future = heapq.heappop(waiters)
+            # 被取消的等待者直接丢弃，名额交给下一个
+            if not future.done():
+                future.set_result(None)
+                return
+        self._active[source] -= 1
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        source: str,
+        priority: int = Priority.NORMAL,
+    ) -> typing.AsyncIterator[None]:
+        await self._acquire(source, priority)
+        try:
+            yield
+        finally:
+            self._release(source)
+
+
+class _Flight:
+    __slots__ = ("task", "priority", "waiters")
+
+    def __init__(self, task: "asyncio.Task[httpx.Response]", priority: int) -> None:
+        self.task = task
+        self.priority = priority
+        self.waiters = 0
+
+
 class Downloader:
     def __init__(
         self,
         *,
         client: httpx.AsyncClient | None = None,
+        concurrency: dict[str, int] | None = None,
+        rate_limiter: ratelimit.RateLimiter | None = None,
+        retries: dict[str, RetryPolicy] | None = None,
+        cache: BaseCache | None = None,
+        transport: httpx.AsyncBaseTransport | None = None,
+        breakers: CircuitBreakers | None = None,
+        hooks: list[Hooks] | None = None,
     ):
+        """Parameters:
+
+        * client: custom httpx.AsyncClient
+        * concurrency: max concurrent requests per source
+        * rate_limiter: defaults to the process wide ratelimit.rate_limiter
+        * retries: retry policy per source, see config.RETRIES
+        * cache: responses cache, such as cache.DiskCache
+        * transport: transport of the default client, such as
+            archive.ReplayTransport, ignored if client is given
+        * breakers: circuit breaker per source, the state of each source
+            is in `breakers.states`
+        * hooks: see hooks.Hooks, the list can be changed later
+        """
+        self.cache = cache
+        self.breakers = breakers or CircuitBreakers()
+        self.hooks = [] if hooks is None else hooks
+        self.scheduler = Scheduler(concurrency)
+        self.retries = {
+            **{source: RetryPolicy(**kw) for source, kw in RETRIES.items()},
+            **(retries or {}),
+        }
+        if rate_limiter is None:
+            self.rate_limiter = ratelimit.rate_limiter
+        else:
+            self.rate_limiter = rate_limiter
         if client is None:
-            self.client = httpx.AsyncClient()
+            max_connections = self.scheduler.max_connections
+            self.client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections,
+                ),
+                transport=transport,
+            )
         else:
             self.client = client
+        # fingerprint => {priority: flight}
+        self._flights: dict[str, dict[int, _Flight]] = {}
+
+    def get_retry(self, source: str) -> RetryPolicy:
+        return self.retries.get(source) or RetryPolicy()
 
-    async def _get(self, request: httpx.Request) -> httpx.Response:
+    async def _send(
+        self,
+        request: httpx.Request,
+        source: str,
+        priority: int,
+        attempt: int = 1,
+    ) -> httpx.Response:
+        hooks = self.hooks
+        started = time.monotonic() if hooks else 0.0
         # 暂时用来修复 merge_headers 引发的错误
         client_request = self.client.build_request(
             "GET",
             request.url,
             headers=request.headers,
         )
+        # 没有注册 hooks 时不记录任何时间
+        event = None
+        if hooks:
+            event = RequestEvent(
+                client_request, source, attempt, started, time.monotonic()
+            )
+            client_request.extensions["trace"] = event.on_trace
+            for hook in hooks:
+                hook.on_request_start(event)
+
+        breaker = self.breakers.get(source)
+        try:
+            if not breaker.allow(client_request):
+                raise CircuitOpenError(
+                    f"circuit of {source} is open", request=request
+                )
+            try:
+                async with self.scheduler.slot(source, priority):
+                    if event is not None:
+                        event.queued = time.monotonic()
+                    await self.rate_limiter.acquire(source)
+                    if event is not None:
+                        event.sent = time.monotonic()
+                    response = await self.client.send(client_request)
+            except Exception:
+                breaker.record_failure()
+                raise
+            except BaseException:
+                breaker.release(client_request)
+                raise
+        except BaseException as exc:
+            if event is not None:
+                event.finished = time.monotonic()
+                for hook in hooks:
+                    hook.on_error(event, exc)
+            raise
+        if self.breakers.is_failure(response):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+        if event is not None:
+            event.finished = time.monotonic()
+            event.response = response
+            event.bytes_downloaded = response.num_bytes_downloaded
+            event.bytes_decoded = len(response.content)
+            for hook in hooks:
+                hook.on_response(event)
 
-        response = await self.client.send(client_request)
-        response.raise_for_status()
+        if response.status_code in (429, 503) and (
+            retry_after := response.headers.get("Retry-After")
+        ):
+            if (seconds := ratelimit.parse_retry_after(retry_after)) is not None:
+                self.rate_limiter.pause(source, seconds)
         return response
 
-    async def download(self, *requests: httpx.Request) -> list[httpx.Response]:
-        tasks = (self._get(request) for request in requests)
+    async def _get(
+        self,
+        request: httpx.Request,
+        priority: int = Priority.NORMAL,
+    ) -> httpx.Response:
+        """
+        Concurrent requests with the same fingerprint share one download,
+        it is cancelled only when every waiter has been cancelled. A request
+        only joins a download of the same or a higher priority, so a live
+        lookup never waits in the queue of a backfill.
+        """
+        with tracer.span("Downloader._get", url=str(request.url)):
+            return await self._get_flight(request, priority)
+
+    async def _get_flight(
+        self,
+        request: httpx.Request,
+        priority: int,
+    ) -> httpx.Response:
+        key = fingerprint(request)
+        flights = self._flights.setdefault(key, {})
+        if joinable := [p for p in flights if p <= priority]:
+            flight = flights[min(joinable)]
+        else:
+            flight = _Flight(
+                asyncio.ensure_future(self._fetch(request, key, priority)),
+                priority,
+            )
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            flights[priority] = flight
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                # 立即移除，之后的请求不会加入正在被取消的下载
+                self._forget(key, flight)
+                flight.task.cancel()
+
+    def _forget(self, key: str, flight: _Flight) -> None:
+        flights = self._flights.get(key, {})
+        if flights.get(flight.priority) is flight:
+            del flights[flight.priority]
+            if not flights:
+                del self._flights[key]
+
+    async def _fetch(
+        self,
+        request: httpx.Request,
+        key: str,
+        priority: int,
+    ) -> httpx.Response:
+        source = get_source(request.url)
+        if self.cache is None:
+            return await self._retry(request, source, priority)
+
+        entry = await asyncio.to_thread(self.cache.get, key)
+        conditional_request = request
+        if entry is not None:
+            if self.cache.is_fresh(entry, source):
+                self._on_cache(source, "hit")
+                return entry.to_response(request)
+            if validators := entry.validators:
+                conditional_request = httpx.Request(
+                    request.method,
+                    request.url,
+                    headers={**request.headers, **validators},
+                )
+
+        response = await self._retry(conditional_request, source, priority)
+        if entry is not None and response.status_code == 304:
+            self._on_cache(source, "revalidated")
+            entry = entry.revalidate(response)
+            await asyncio.to_thread(self.cache.set, key, entry)
+            return entry.to_response(request)
+        self._on_cache(source, "miss")
+        if response.status_code == 200:
+            entry = Entry.from_response(response)
+            await asyncio.to_thread(self.cache.set, key, entry)
+        return response
+
+    def _on_cache(self, source: str, status: str) -> None:
+        for hook in self.hooks:
+            hook.on_cache(source, status)
+
+    async def _retry(
+        self,
+        request: httpx.Request,
+        source: str,
+        priority: int,
+    ) -> httpx.Response:
+        retry = self.get_retry(source)
+        attempt = 1
+        while True:
+            try:
+                response = await self._send(request, source, priority, attempt)
+            except Exception as exc:
+                if not retry.is_retryable(attempt, exception=exc):
+                    raise
+            else:
+                if not retry.is_retryable(attempt, response=response):
+                    # 304 由 _fetch 使用缓存的内容处理
+                    if response.status_code != 304:
+                        response.raise_for_status()
+                    return response
+            await asyncio.sleep(retry.get_delay(attempt))
+            attempt += 1
+
+    async def download(
+        self,
+        *requests: httpx.Request,
+        priority: int = Priority.NORMAL,
+    ) -> list[httpx.Response]:
+        tasks = (self._get(request, priority) for request in requests)
         responses = await asyncio.gather(*tasks)
         return responses
 
@@ -55,17 +430,231 @@ class Engine:
     def __init__(
         self,
         client: httpx.AsyncClient | None = None,
+        *,
+        concurrency: dict[str, int] | None = None,
+        retries: dict[str, RetryPolicy] | None = None,
+        cache: BaseCache | None = None,
+        executor: concurrent.futures.Executor | None = None,
+        checkpoint: Checkpoint | None = None,
+        transport: httpx.AsyncBaseTransport | None = None,
+        rate_limiter: ratelimit.RateLimiter | None = None,
+        breakers: CircuitBreakers | None = None,
+        timeouts: dict[str, float] | None = None,
+        hooks: list[Hooks] | None = None,
+        loop_monitor: LoopMonitor | None = None,
     ) -> None:
-        self.downloader = Downloader(client=client)
-
-    async def process(self, *spiders: BaseSpider) -> list[typing.Any]:
-        items = []
-        requests = (spider.request for spider in spiders)
-        responses = await self.downloader.download(*requests)
-        for spider, response in zip(spiders, responses):
-            item = spider.parse(response)
-            items.append(item)
+        """Parameters:
+
+        * executor: run BaseSpider.parse in a thread or process pool instead
+            of the event loop, spiders and responses are pickled for a
+            process pool. The executor is not shut down by Engine.close.
+        * checkpoint: items of finished spiders are stored in and served
+            from the checkpoint instead of being downloaded again.
+        * transport, rate_limiter, breakers: see Downloader
+        * timeouts: seconds per source to download (retries included) and
+            parse a spider, see config.TIMEOUTS
+        * hooks: called on requests, responses, parses and errors, see
+            hooks.Hooks. They are shared with the downloader, the list can
+            be changed later.
+        * loop_monitor: measure the event loop lag and find what blocks the
+            loop, reported by Hooks.on_loop_lag. It starts with the first
+            spider and stops when the last engine sharing it is closed.
+        """
+        self.downloader = Downloader(
+            client=client,
+            concurrency=concurrency,
+            retries=retries,
+            cache=cache,
+            transport=transport,
+            rate_limiter=rate_limiter,
+            breakers=breakers,
+            hooks=[] if hooks is None else hooks,
+        )
+        self.hooks = self.downloader.hooks
+        self.loop_monitor = loop_monitor
+        if loop_monitor is not None:
+            loop_monitor.attach(self.hooks)
+        self.executor = executor
+        self.checkpoint = checkpoint
+        self.timeouts = {**TIMEOUTS, **(timeouts or {})}
+
+    async def _parse(
+        self,
+        spider: BaseSpider,
+        response: httpx.Response,
+        fetch_started: float | None = None,
+    ) -> typing.Any:
+        if not (hooks := self.hooks):
+            return await self._run_parse(spider, response)
+        event = ParseEvent(spider, response, time.monotonic(), fetch_started)
+        event.bytes = len(response.content)
+        for hook in hooks:
+            hook.on_parse_start(event)
+        try:
+            event.item = await self._run_parse(spider, response)
+        except Exception as exc:
+            event.finished = time.monotonic()
+            for hook in hooks:
+                hook.on_error(event, exc)
+            raise
+        event.finished = time.monotonic()
+        for hook in hooks:
+            hook.on_parse_end(event)
+        return event.item
+
+    async def _run_parse(
+        self,
+        spider: BaseSpider,
+        response: httpx.Response,
+    ) -> typing.Any:
+        spider_cls = type(spider)
+        name = f"{spider_cls.__module__}.{spider_cls.__qualname__}.parse"
+        with tracer.span(name, bytes=len(response.content)):
+            if self.executor is None:
+                with profiling.section():
+                    return spider.parse(response)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, spider.parse, response)
+
+    @staticmethod
+    def get_spider_key(spider: BaseSpider) -> str:
+        # 同一个请求可能被不同的 spider 解析，例如 fotmob player 和 staff
+        spider_cls = type(spider)
+        name = f"{spider_cls.__module__}.{spider_cls.__qualname__}"
+        return f"{name}:{fingerprint(spider.request)}"
+
+    async def _crawl(
+        self,
+        spider: BaseSpider,
+        priority: int | None = None,
+    ) -> typing.Any:
+        if self.loop_monitor is not None and not self.loop_monitor.running:
+            self.loop_monitor.start()
+        if priority is None:
+            priority = spider.priority
+        timeout = self.timeouts.get(get_source(spider.request.url))
+        spider_cls = type(spider)
+        with tracer.span("Engine.crawl", spider=spider_cls.__module__):
+            if timeout is None:
+                return await self._get_item(spider, priority)
+            return await asyncio.wait_for(self._get_item(spider, priority), timeout)
+
+    async def _get_item(self, spider: BaseSpider, priority: int) -> typing.Any:
+        if self.checkpoint is None:
+            started = time.monotonic() if self.hooks else None
+            response = await self.downloader._get(spider.request, priority)
+            return await self._parse(spider, response, started)
+
+        key = self.get_spider_key(spider)
+        item = await asyncio.to_thread(self.checkpoint.get_item, key)
+        if item is not None:
+            return item
+        started = time.monotonic() if self.hooks else None
+        response = await self.downloader._get(spider.request, priority)
+        item = await self._parse(spider, response, started)
+        await asyncio.to_thread(self.checkpoint.set_item, key, item)
+        return item
+
+    async def process(
+        self,
+        *spiders: BaseSpider,
+        return_exceptions: bool = False,
+        priority: int | None = None,
+        timeout: float | None = None,
+    ) -> list[typing.Any]:
+        """
+        Return the items in the order of spiders, if return_exceptions is
+        True, a failed spider returns its exception instead of raising it
+        so the other items are kept. priority overrides the priority of
+        the spiders, see Priority.
+
+        Spiders that are not finished after timeout seconds are cancelled
+        and fail with asyncio.TimeoutError.
+        """
+        with tracer.span("Engine.process", spiders=len(spiders)):
+            return await self._process(
+                spiders, return_exceptions, priority, timeout
+            )
+
+    async def _process(
+        self,
+        spiders: tuple[BaseSpider, ...],
+        return_exceptions: bool,
+        priority: int | None,
+        timeout: float | None,
+    ) -> list[typing.Any]:
+        if timeout is None:
+            tasks = (self._crawl(spider, priority) for spider in spiders)
+            return await asyncio.gather(*tasks, return_exceptions=return_exceptions)
+
+        futures = [
+            asyncio.ensure_future(self._crawl(spider, priority)) for spider in spiders
+        ]
+        try:
+            if futures:
+                await asyncio.wait(
+                    futures,
+                    timeout=timeout,
+                    return_when=asyncio.ALL_COMPLETED
+                    if return_exceptions
+                    else asyncio.FIRST_EXCEPTION,
+                )
+        finally:
+            for future in futures:
+                future.cancel()
+            await asyncio.gather(*futures, return_exceptions=True)
+        items: list[typing.Any] = []
+        for spider, future in zip(spiders, futures):
+            if future.cancelled():
+                name = type(spider).__module__
+                items.append(
+                    asyncio.TimeoutError(f"{name} timed out after {timeout}s")
+                )
+            elif (exc := future.exception()) is not None:
+                items.append(exc)
+            else:
+                items.append(future.result())
+        if not return_exceptions:
+            # 优先抛出真正的错误，而不是因此被取消的超时
+            errors = [item for item in items if isinstance(item, BaseException)]
+            errors.sort(key=lambda exc: isinstance(exc, asyncio.TimeoutError))
+            if errors:
+                raise errors[0]
         return items
 
+    async def stream(
+        self,
+        *spiders: BaseSpider,
+        return_exceptions: bool = False,
+        priority: int | None = None,
+    ) -> typing.AsyncGenerator[tuple[BaseSpider, typing.Any], None]:
+        """
+        Yield (spider, item) as soon as each spider is downloaded and parsed,
+        in completion order. Unfinished spiders are cancelled when the
+        generator is closed or a spider fails.
+        """
+        tasks = {
+            asyncio.ensure_future(self._crawl(spider, priority)): spider
+            for spider in spiders
+        }
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if return_exceptions and (exc := task.exception()) is not None:
+                        yield tasks[task], exc
+                    else:
+                        yield tasks[task], task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            # 等待下载真正停止，并取回未被读取的异常
+            await asyncio.gather(*tasks, return_exceptions=True)
+
     async def close(self) -> None:
+        if self.loop_monitor is not None:
+            self.loop_monitor.detach(self.hooks)
         await self.downloader.client.aclose()
@@ -1,6 +1,6 @@
 import httpx
 
-from ...scraper import BaseItem, BaseSpider
+from ...scraper import BaseItem, BaseSpider, Priority
 from ._common import BASE_URL
 
 
@@ -9,6 +9,8 @@ class Item(BaseItem):
 
 
 class Spider(BaseSpider):
+    priority = Priority.HIGH
+
     def __init__(self, *, id: str) -> None:
         self.id = id
 
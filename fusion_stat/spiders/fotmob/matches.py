@@ -4,7 +4,7 @@ import httpx
 from rapidfuzz import process
 
 from ...config import COMPETITIONS_SCORE_CUTOFF, CompetitionsConfig
-from ...scraper import BaseItem, BaseSpider
+from ...scraper import BaseItem, BaseSpider, Priority
 from ._common import BASE_URL, parse_score
 
 
@@ -28,6 +28,8 @@ class Spider(BaseSpider):
     * date: "%Y-%m-%d", such as "2023-09-03"
     """
 
+    priority = Priority.HIGH
+
     def __init__(self, *, date: str) -> None:
         self.date = date.replace("-", "")
 
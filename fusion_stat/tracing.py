@@ -0,0 +1,189 @@
+"""
+Nested spans of App calls, Engine.process, downloads, BaseSpider.parse and
+the fusion methods of the models. Tracing is off until an exporter is set:
+
+    tracing.set_exporter(tracing.JSONLinesExporter("trace.jsonl"))
+"""
+
+import contextvars
+import functools
+import inspect
+import json
+import os
+import secrets
+import threading
+import time
+import typing
+from abc import ABC, abstractmethod
+from contextlib import nullcontext
+from pathlib import Path
+from types import TracebackType
+
+from . import profiling
+from .profiling import get_profiler
+
+P = typing.ParamSpec("P")
+R = typing.TypeVar("R")
+
+
+class Span:
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "start",
+        "duration",
+        "attributes",
+        "error",
+        "_started",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        parent: "Span | None" = None,
+        attributes: dict[str, typing.Any] | None = None,
+    ) -> None:
+        self.name = name
+        self.trace_id: str = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        # start 是 unix 时间 (微秒)，duration 由 monotonic 时钟计算 (微秒)
+        self.start = time.time_ns() // 1000
+        self.duration: int | None = None
+        self.attributes = attributes or {}
+        self.error: str | None = None
+        self._started = time.perf_counter_ns()
+
+    def finish(self) -> None:
+        self.duration = (time.perf_counter_ns() - self._started) // 1000
+
+    def to_dict(self) -> dict[str, typing.Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration": self.duration,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+_current_span: contextvars.ContextVar[Span | None] = contextvars.ContextVar(
+    "fusion_stat_span", default=None
+)
+
+
+def get_current_span() -> Span | None:
+    return _current_span.get()
+
+
+class BaseExporter(ABC):
+    @abstractmethod
+    def export(self, span: Span) -> None:
+        ...
+
+    def close(self) -> None:
+        ...
+
+
+class JSONLinesExporter(BaseExporter):
+    """Append one JSON object per finished span, children come first."""
+
+    def __init__(self, path: str | os.PathLike[str]) -> None:
+        self.path = Path(path).expanduser()
+        self._file = open(self.path, "a")
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class _SpanContext:
+    def __init__(self, tracer: "Tracer", span: Span) -> None:
+        self.tracer = tracer
+        self.span = span
+
+    def __enter__(self) -> Span:
+        self._token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        _current_span.reset(self._token)
+        self.span.finish()
+        if exc_type is not None:
+            self.span.error = exc_type.__name__
+        if (exporter := self.tracer.exporter) is not None:
+            exporter.export(self.span)
+
+
+class Tracer:
+    def __init__(self, exporter: BaseExporter | None = None) -> None:
+        self.exporter = exporter
+
+    def span(
+        self,
+        name: str,
+        **attributes: typing.Any,
+    ) -> typing.ContextManager[Span | None]:
+        """A child of the current span, a no-op without exporter."""
+        if self.exporter is None:
+            return nullcontext()
+        return _SpanContext(self, Span(name, _current_span.get(), attributes))
+
+
+tracer = Tracer()
+
+
+def set_exporter(exporter: BaseExporter | None) -> None:
+    """Enable tracing of the process, None disables it."""
+    tracer.exporter = exporter
+
+
+def traced(
+    name: str | None = None,
+) -> typing.Callable[[typing.Callable[P, R]], typing.Callable[P, R]]:
+    """
+    Run the function or coroutine function in a span of its qualname. Under
+    App.profiling, functions are profiled by cProfile and coroutine
+    functions get memory snapshots, see profiling.Profiler.
+    """
+
+    def decorator(func: typing.Callable[P, R]) -> typing.Callable[P, R]:
+        span_name = name or func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args: P.args, **kwargs: P.kwargs) -> typing.Any:
+                if tracer.exporter is None and get_profiler() is None:
+                    return await func(*args, **kwargs)
+                with tracer.span(span_name), profiling.call(span_name):
+                    return await func(*args, **kwargs)
+
+            return typing.cast(typing.Callable[P, R], async_wrapper)
+
+        @functools.wraps(func)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            if tracer.exporter is None and get_profiler() is None:
+                return func(*args, **kwargs)
+            with tracer.span(span_name), profiling.section():
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,390 @@
+"""
+Multi-process crawler: workers pull jobs from a SQLite work queue, each
+worker only takes the jobs of its shard (by entity id). Run workers on other
+hosts pointed at the same queue file with:
+
+    python -m fusion_stat.workqueue QUEUE_FILE --shard 0 --shards 4
+
+Nobody else takes the jobs of a shard, so such a worker has to be restarted
+by its process manager when it dies, ShardedCrawler restarts its own.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import typing
+import zlib
+
+from .api import App
+from .config import BATCH_CONCURRENCY
+from .crawler import Job, Result, get_jobs, run_job
+
+
+class WorkerDied(RuntimeError):
+    """A worker process exited with an error more times than allowed."""
+
+
+def get_shard(params: dict[str, typing.Any], shards: int) -> int:
+    entity_id = (
+        params.get("fotmob_id")
+        or params.get("transfermarkt_id")
+        or json.dumps(params, sort_keys=True)
+    )
+    return zlib.crc32(str(entity_id).encode()) % shards
+
+
+class WorkQueue:
+    """
+    Jobs are (kind, params) such as ("team", {"fotmob_id": "9825", ...}),
+    their results are pickled fused models. A job is claimed with a lease,
+    if the worker dies the job is claimed again once the lease expires.
+
+    The methods block (up to the sqlite timeout while other workers hold the
+    database), call them with asyncio.to_thread from a coroutine.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        *,
+        shards: int = 1,
+        lease: float = 600,
+    ) -> None:
+        self.path = path
+        self.lease = lease
+        self._conn = sqlite3.connect(
+            path, timeout=60, isolation_level=None, check_same_thread=False
+        )
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id INTEGER PRIMARY KEY, key TEXT UNIQUE, kind TEXT, params TEXT, "
+            "shard INTEGER, status TEXT DEFAULT 'pending', lease_until REAL, "
+            "result BLOB, error TEXT)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_shard ON jobs (shard, status)"
+        )
+        # 分片数在创建队列时确定，之后的 worker 以文件中的为准
+        self._conn.execute(
+            "INSERT OR IGNORE INTO meta (key, value) VALUES ('shards', ?)",
+            (str(shards),),
+        )
+        (value,) = self._conn.execute(
+            "SELECT value FROM meta WHERE key = 'shards'"
+        ).fetchone()
+        self.shards = int(value)
+
+    def put(self, *jobs: Job) -> None:
+        rows = [
+            (
+                f"{kind}:{json.dumps(params, sort_keys=True)}",
+                kind,
+                json.dumps(params),
+                get_shard(params, self.shards),
+            )
+            for kind, params in jobs
+        ]
+        with self._transaction():
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO jobs (key, kind, params, shard) "
+                "VALUES (?, ?, ?, ?)",
+                rows,
+            )
+
+    def claim(self, shard: int) -> tuple[int, Job] | None:
+        with self._transaction():
+            row = self._conn.execute(
+                "SELECT id, kind, params FROM jobs WHERE shard = ? AND "
+                "(status = 'pending' OR (status = 'running' AND lease_until < ?)) "
+                "LIMIT 1",
+                (shard, time.time()),
+            ).fetchone()
+            if row is None:
+                return None
+            id_, kind, params = row
+            self._conn.execute(
+                "UPDATE jobs SET status = 'running', lease_until = ? WHERE id = ?",
+                (time.time() + self.lease, id_),
+            )
+        return id_, (kind, json.loads(params))
+
+    def complete(self, id_: int, result: Result) -> None:
+        data = pickle.dumps(result)
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'done', result = ? WHERE id = ?",
+                (data, id_),
+            )
+
+    def requeue(self, shard: int) -> int:
+        """
+        Make the running jobs of a shard pending again without waiting for
+        their leases, when its worker is known to be dead.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'pending', lease_until = NULL "
+                "WHERE shard = ? AND status = 'running'",
+                (shard,),
+            )
+        return cursor.rowcount
+
+    def fail(self, id_: int, error: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ? WHERE id = ?",
+                (error, id_),
+            )
+
+    @property
+    def unfinished(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN ('pending', 'running')"
+            ).fetchone()
+        return int(count)
+
+    @property
+    def counts(self) -> dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall()
+        return dict(rows)
+
+    def get_results(self) -> typing.Iterator[Result]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT result FROM jobs WHERE status = 'done' ORDER BY id"
+            ).fetchall()
+        for (result,) in rows:
+            yield pickle.loads(result)
+
+    def get_errors(self) -> list[tuple[Job, str]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT kind, params, error FROM jobs WHERE status = 'failed'"
+            ).fetchall()
+        return [((kind, json.loads(params)), error) for kind, params, error in rows]
+
+    def _transaction(self) -> "_Transaction":
+        return _Transaction(self._conn, self._lock)
+
+    def close(self) -> None:
+        # 等待其他线程中进行的操作
+        with self._lock:
+            self._conn.close()
+
+
+class _Transaction:
+    # BEGIN IMMEDIATE 避免多个进程同时领取同一个任务
+    def __init__(self, conn: sqlite3.Connection, lock: threading.Lock) -> None:
+        self.conn = conn
+        self.lock = lock
+
+    def __enter__(self) -> None:
+        self.lock.acquire()
+        try:
+            self.conn.execute("BEGIN IMMEDIATE")
+        except BaseException:
+            self.lock.release()
+            raise
+
+    def __exit__(self, exc_type: type[BaseException] | None, *args: object) -> None:
+        try:
+            self.conn.execute("COMMIT" if exc_type is None else "ROLLBACK")
+        finally:
+            self.lock.release()
+
+
+async def _run(
+    app: App,
+    queue: WorkQueue,
+    id_: int,
+    job: Job,
+    expand: bool,
+) -> None:
+    try:
+        result = await run_job(app, job)
+    except Exception as exc:
+        await asyncio.to_thread(queue.fail, id_, repr(exc))
+        return
+    # 先加入下一阶段的任务再完成当前任务，unfinished 才不会提前归零
+    if expand:
+        await asyncio.to_thread(queue.put, *get_jobs(result))
+    await asyncio.to_thread(queue.complete, id_, result)
+
+
+async def work(
+    path: str | os.PathLike[str],
+    shard: int,
+    *,
+    app_factory: typing.Callable[[], App] = App,
+    concurrency: int = BATCH_CONCURRENCY,
+    poll_interval: float = 0.5,
+    expand: bool = True,
+) -> None:
+    """
+    Process the jobs of a shard until no job of any shard is unfinished,
+    because running jobs of other shards can still add jobs to this one.
+    Errors of the queue itself (not those of the jobs, which are recorded
+    as failed) are raised, the running jobs are claimed again once their
+    leases expire.
+    """
+    queue = WorkQueue(path)
+    pending: set[asyncio.Future[None]] = set()
+    try:
+        async with app_factory() as app:
+            while True:
+                while len(pending) < concurrency:
+                    claimed = await asyncio.to_thread(queue.claim, shard)
+                    if claimed is None:
+                        break
+                    coro = _run(app, queue, *claimed, expand)
+                    pending.add(asyncio.ensure_future(coro))
+                if not pending:
+                    if not await asyncio.to_thread(lambda: queue.unfinished):
+                        break
+                    await asyncio.sleep(poll_interval)
+                    continue
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=poll_interval,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                for task in done:
+                    task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        queue.close()
+
+
+def run_worker(
+    path: str | os.PathLike[str],
+    shard: int,
+    app_factory: typing.Callable[[], App] = App,
+    concurrency: int = BATCH_CONCURRENCY,
+    expand: bool = True,
+) -> None:
+    asyncio.run(
+        work(
+            path,
+            shard,
+            app_factory=app_factory,
+            concurrency=concurrency,
+            expand=expand,
+        )
+    )
+
+
+class ShardedCrawler:
+    """
+    Crawl with one worker process per shard, results of all workers are
+    merged from the queue file. app_factory has to be picklable (a module
+    level function or class) when processes are spawned.
+
+    A worker that dies (such as killed for its memory) is restarted up to
+    `max_restarts` times per shard, its running jobs are claimed again.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        *,
+        workers: int | None = None,
+        app_factory: typing.Callable[[], App] = App,
+        concurrency: int = BATCH_CONCURRENCY,
+        max_restarts: int = 3,
+    ) -> None:
+        self.path = path
+        self.workers = workers or os.cpu_count() or 1
+        self.app_factory = app_factory
+        self.concurrency = concurrency
+        self.max_restarts = max_restarts
+
+    def _start(self, shard: int, expand: bool) -> multiprocessing.Process:
+        process = multiprocessing.Process(
+            target=run_worker,
+            args=(self.path, shard, self.app_factory, self.concurrency, expand),
+        )
+        process.start()
+        return process
+
+    def run(
+        self,
+        params: typing.Iterable[dict[str, typing.Any]],
+        *,
+        kind: str = "competition",
+        expand: bool = True,
+    ) -> WorkQueue:
+        """
+        Add the jobs, run the workers until every job is finished and
+        return the queue, see WorkQueue.get_results and get_errors. Raise
+        WorkerDied when a worker keeps dying, the other workers are then
+        terminated and the queue file can be run again.
+
+        Parameters:
+
+        * params: such as Competitions.get_params()
+        * kind: kind of the params, "competition", "team", "player" or "staff"
+        * expand: add the teams of competitions and the players and staffs
+            of teams as new jobs
+        """
+        queue = WorkQueue(self.path, shards=self.workers)
+        queue.put(*((kind, kwargs) for kwargs in params))
+        processes = {shard: self._start(shard, expand) for shard in range(queue.shards)}
+        restarts = dict.fromkeys(processes, 0)
+        try:
+            while processes:
+                shards = {
+                    process.sentinel: shard for shard, process in processes.items()
+                }
+                for sentinel in multiprocessing.connection.wait(list(shards)):
+                    shard = shards[typing.cast(int, sentinel)]
+                    process = processes.pop(shard)
+                    process.join()
+                    if process.exitcode == 0:
+                        continue
+                    if restarts[shard] >= self.max_restarts:
+                        raise WorkerDied(
+                            f"worker of shard {shard} exited with {process.exitcode}"
+                        )
+                    restarts[shard] += 1
+                    # 进程已经退出，它领取的任务不必等租约过期
+                    queue.requeue(shard)
+                    processes[shard] = self._start(shard, expand)
+        finally:
+            for process in processes.values():
+                process.terminate()
+                process.join()
+        return queue
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Run a fusion-stat queue worker.")
+    parser.add_argument("path", help="queue file")
+    parser.add_argument("--shard", type=int, required=True)
+    parser.add_argument("--shards", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    args = parser.parse_args(argv)
+    # 创建队列以写入分片数
+    WorkQueue(args.path, shards=args.shards).close()
+    run_worker(args.path, args.shard, concurrency=args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,12 +3,22 @@ import typing
 import httpx
 import pytest
 
+from fusion_stat import ratelimit
+
 
 @pytest.fixture(scope="session")
 def anyio_backend() -> typing.Literal["asyncio"]:
     return "asyncio"
 
 
+@pytest.fixture(scope="session", autouse=True)
+def no_rate_limit() -> typing.Generator[None, typing.Any, None]:
+    # mock 的请求不需要限速
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(ratelimit, "rate_limiter", ratelimit.RateLimiter())
+        yield
+
+
 @pytest.fixture(scope="session")
 async def client() -> typing.AsyncGenerator[httpx.AsyncClient, typing.Any]:
     async with httpx.AsyncClient() as client:
@@ -130,3 +130,37 @@ class TestCompetition:
         assert team["fbref_path_name"] == "Manchester-City"
         assert team["transfermarkt_id"] == "281"
         assert team["transfermarkt_path_name"] == "manchester-city"
+
+
+class TestPartialCompetition:
+    @pytest.fixture(scope="class")
+    def competition(self) -> Competition:
+        fotmob_data = read_data("fotmob", "leagues?id=47.json")
+        fbref_data = read_data("fbref", "comps_9_Premier-League-Stats.html")
+        fotmob_spider = fotmob.competition.Spider(id="47")
+        fbref_spider = fbref.competition.Spider(
+            id="9", path_name="Premier-League"
+        )
+        return Competition(
+            fotmob=fotmob_spider.parse(httpx.Response(200, json=fotmob_data)),
+            fbref=fbref_spider.parse(httpx.Response(200, text=fbref_data)),
+        )
+
+    def test_missing(self, competition: Competition) -> None:
+        assert competition.missing == {"official", "transfermarkt"}
+
+    def test_info(self, competition: Competition) -> None:
+        info = competition.info
+        assert info["name"] == "Premier League"
+        assert "logo" not in info
+        assert "market_values" not in info
+
+    def test_table(self, competition: Competition) -> None:
+        team = competition.table[0]
+        assert "xg" in team
+        assert "logo" not in team
+
+    def test_get_teams_params(self, competition: Competition) -> None:
+        params = next(competition.get_teams_params())
+        assert "fbref_id" in params
+        assert "transfermarkt_id" not in params
@@ -62,3 +62,26 @@ class TestCompetitions:
         assert competition["transfermarkt_path_name"] == "premier-league"
         with pytest.raises(KeyError):
             assert competition["season"]
+
+
+class TestPartialCompetitions:
+    @pytest.fixture(scope="class")
+    def competitions(self) -> Competitions:
+        fotmob_data = read_data("fotmob", "allLeagues.json")
+        fbref_data = read_data("fbref", "comps_.html")
+        return Competitions(
+            fotmob=fotmob.competitions.Spider().parse(
+                httpx.Response(200, json=fotmob_data)
+            ),
+            fbref=fbref.competitions.Spider().parse(
+                httpx.Response(200, text=fbref_data)
+            ),
+        )
+
+    def test_missing(self, competitions: Competitions) -> None:
+        assert competitions.missing == {"transfermarkt"}
+
+    def test_get_params(self, competitions: Competitions) -> None:
+        params = next(competitions.get_params())
+        assert params["fbref_id"] == "9"
+        assert "transfermarkt_id" not in params
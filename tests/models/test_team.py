@@ -101,3 +101,34 @@ class TestTeam:
         staff = next(params)
         assert staff["transfermarkt_id"] == "47620"
         assert staff["transfermarkt_path_name"] == "mikel-arteta"
+
+
+class TestPartialTeam:
+    @pytest.fixture(scope="class")
+    def team(self) -> Team:
+        fotmob_data = read_data("fotmob", "teams?id=9825.json")
+        fotmob_spider = fotmob.team.Spider(id="9825")
+        return Team(
+            fotmob=fotmob_spider.parse(httpx.Response(200, json=fotmob_data)),
+        )
+
+    def test_missing(self, team: Team) -> None:
+        assert team.missing == {"fbref", "transfermarkt", "transfermarkt_staffs"}
+
+    def test_info(self, team: Team) -> None:
+        info = team.info
+        assert info["name"] == "Arsenal"
+        assert "market_values" not in info
+
+    def test_players(self, team: Team) -> None:
+        player = team.players[0]
+        assert player["name"] == "David Raya"
+        assert "shooting" not in player
+        assert "market_values" not in player
+
+    def test_get_players_params(self, team: Team) -> None:
+        params = next(team.get_players_params())
+        assert list(params) == ["fotmob_id"]
+
+    def test_staffs(self, team: Team) -> None:
+        assert team.staffs == []
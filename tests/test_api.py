@@ -1,3 +1,8 @@
+import asyncio
+import gc
+import time
+import typing
+
 import httpx
 import pytest
 import respx
@@ -45,8 +50,8 @@ class TestFusion:
             assert fbref_route.called
             assert transfermarkt_route.called
         assert len(coms._fotmob) > 0
-        assert len(coms._fbref) > 0
-        assert len(coms._transfermarkt) > 0
+        assert coms._fbref
+        assert coms._transfermarkt
 
     @pytest.mark.anyio
     async def test_get_competition(self, app: App) -> None:
@@ -73,9 +78,9 @@ class TestFusion:
             assert pl_route.called
             assert transfermarkt_route.called
         assert com._fotmob.name
-        assert com._fbref.name
-        assert com._official.name
-        assert com._transfermarkt.name
+        assert com._fbref and com._fbref.name
+        assert com._official and com._official.name
+        assert com._transfermarkt and com._transfermarkt.name
 
     @pytest.mark.anyio
     async def test_get_team(self, app: App) -> None:
@@ -88,7 +93,7 @@ class TestFusion:
             "ceapi_staff_team_11_.json"
         )
 
-        params = {
+        params: dict[str, typing.Any] = {
             "fotmob_id": "9825",
             "fbref_id": "18bb7c10",
             "fbref_path_name": "Arsenal",
@@ -102,8 +107,8 @@ class TestFusion:
             assert transfermarkt_route.called
             assert transfermarkt_staffs_route.called
         assert team._fotmob.name
-        assert team._fbref.name
-        assert team._transfermarkt.name
+        assert team._fbref and team._fbref.name
+        assert team._transfermarkt and team._transfermarkt.name
         assert team._transfermarkt_staffs
 
     @pytest.mark.anyio
@@ -126,8 +131,8 @@ class TestFusion:
             assert fbref_route.called
             assert transfermarkt_route.called
         assert player._fotmob.name
-        assert player._fbref.name
-        assert player._transfermarkt.name
+        assert player._fbref and player._fbref.name
+        assert player._transfermarkt and player._transfermarkt.name
 
     @pytest.mark.anyio
     async def test_get_staff(self, app: App) -> None:
@@ -160,3 +165,165 @@ class TestFusion:
             match = await app.get_match(fotmob_id="4193490")
             assert fotmob_route.called
         assert match._fotmob.name
+
+
+class TestBatch:
+    @pytest.fixture(scope="class")
+    def app(self, client: httpx.AsyncClient) -> App:
+        return App(client=client)
+
+    @pytest.mark.anyio
+    async def test_batch_concurrency(self, app: App) -> None:
+        running = 0
+        max_running = 0
+
+        async def method(*, id: int) -> int:
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01 * (5 - id))
+            running -= 1
+            return id
+
+        params = ({"id": id} for id in range(5))
+        results = [id async for id in app._batch(method, params, 2)]
+        assert sorted(results) == list(range(5))
+        assert results != list(range(5))
+        assert max_running == 2
+
+    @pytest.mark.anyio
+    async def test_batch_error(self, app: App) -> None:
+        cancelled = False
+        errors: list[dict[str, typing.Any]] = []
+        loop = asyncio.get_running_loop()
+        loop.set_exception_handler(lambda loop, context: errors.append(context))
+
+        async def method(*, id: int) -> int:
+            nonlocal cancelled
+            if id < 2:
+                await asyncio.sleep(0)
+                raise ValueError(id)
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled = True
+                raise
+            return id
+
+        params = [{"id": id} for id in range(3)]
+        try:
+            with pytest.raises(ValueError):
+                async for _ in app._batch(method, params, 3):
+                    pass
+            # 失败后其他任务已经结束，而不是仍在后台运行
+            assert cancelled
+            gc.collect()
+            assert not errors
+        finally:
+            loop.set_exception_handler(None)
+
+    @pytest.mark.anyio
+    async def test_get_teams(self, app: App) -> None:
+        fotmob_mock("teams?id=9825.json")
+        fbref_mock("squads_18bb7c10_Arsenal-Stats.html")
+        transfermarkt_mock("arsenal-fc_startseite_verein_11.html")
+        transfermarkt_mock("ceapi_staff_team_11_.json")
+
+        params = [
+            {
+                "fotmob_id": "9825",
+                "fbref_id": "18bb7c10",
+                "fbref_path_name": "Arsenal",
+                "transfermarkt_id": "11",
+                "transfermarkt_path_name": "arsenal-fc",
+            }
+        ]
+        with respx.mock:
+            teams = [team async for team in app.get_teams(params)]
+        assert len(teams) == 1
+        assert teams[0].info["name"] == "Arsenal"
+
+    @pytest.mark.anyio
+    async def test_get_staffs(self, app: App) -> None:
+        transfermarkt_mock("mikel-arteta_profil_trainer_47620.html")
+
+        params = [
+            {"transfermarkt_id": "47620", "transfermarkt_path_name": "mikel-arteta"}
+        ]
+        with respx.mock:
+            staffs = [staff async for staff in app.get_staffs(params)]
+        assert staffs[0]._transfermarkt.name
+
+
+class TestPartialFusion:
+    @pytest.fixture(scope="class")
+    def app(self, client: httpx.AsyncClient) -> App:
+        return App(client=client, partial=True)
+
+    @pytest.mark.anyio
+    async def test_get_team(self, app: App) -> None:
+        fotmob_mock("teams?id=9825.json")
+        fbref_mock("squads_18bb7c10_Arsenal-Stats.html")
+        transfermarkt_route = respx.get(
+            "https://www.transfermarkt.com/arsenal-fc/startseite/verein/11"
+        ).mock(httpx.Response(404))
+        transfermarkt_mock("ceapi_staff_team_11_.json")
+
+        with respx.mock:
+            team = await app.get_team(
+                fotmob_id="9825",
+                fbref_id="18bb7c10",
+                fbref_path_name="Arsenal",
+                transfermarkt_id="11",
+                transfermarkt_path_name="arsenal-fc",
+            )
+            assert transfermarkt_route.called
+        assert team.missing == {"transfermarkt"}
+        assert "market_values" not in team.info
+        assert team.staffs
+
+    @pytest.mark.anyio
+    async def test_get_team_without_params(self, app: App) -> None:
+        fotmob_route = fotmob_mock("teams?id=9825.json")
+
+        with respx.mock:
+            team = await app.get_team(fotmob_id="9825")
+            assert fotmob_route.called
+        assert team.missing == {"fbref", "transfermarkt", "transfermarkt_staffs"}
+
+    @pytest.mark.anyio
+    async def test_get_team_timeout(self, client: httpx.AsyncClient) -> None:
+        async def slow(request: httpx.Request) -> httpx.Response:
+            await asyncio.sleep(1)
+            return httpx.Response(404)
+
+        fotmob_mock("teams?id=9825.json")
+        fbref_mock("squads_18bb7c10_Arsenal-Stats.html")
+        respx.get(
+            "https://www.transfermarkt.com/arsenal-fc/startseite/verein/11"
+        ).mock(side_effect=slow)
+        transfermarkt_mock("ceapi_staff_team_11_.json")
+
+        # 不是 partial 模式，超时的来源同样被忽略
+        app = App(client=client)
+        with respx.mock:
+            team = await app.get_team(
+                fotmob_id="9825",
+                fbref_id="18bb7c10",
+                fbref_path_name="Arsenal",
+                transfermarkt_id="11",
+                transfermarkt_path_name="arsenal-fc",
+                deadline=time.monotonic() + 0.2,
+            )
+        assert team.missing == {"transfermarkt"}
+        assert team.staffs
+
+    @pytest.mark.anyio
+    async def test_required_source_failed(self, app: App) -> None:
+        respx.get(
+            "https://www.fotmob.com/api/matchDetails?matchId=4193490"
+        ).mock(httpx.Response(404))
+
+        with respx.mock:
+            with pytest.raises(httpx.HTTPStatusError):
+                await app.get_match(fotmob_id="4193490")
@@ -0,0 +1,98 @@
+import threading
+from pathlib import Path
+
+import httpx
+import pytest
+
+from fusion_stat import App
+from fusion_stat.archive import (
+    Archive,
+    NotArchived,
+    RecordTransport,
+    ReplayTransport,
+)
+from fusion_stat.cache import Entry
+from fusion_stat.ratelimit import RateLimiter
+from fusion_stat.scraper import Downloader, fingerprint
+from tests.utils import read_data
+
+URL = "https://www.fotmob.com/api/matches?date=20230903"
+
+
+def test_archive(tmp_path: Path) -> None:
+    archive = Archive(tmp_path / "crawl.archive")
+    assert archive.load() == {}
+    archive.add("a", Entry(status_code=200, headers=[], content=b"1"))
+    archive.add("a", Entry(status_code=200, headers=[], content=b"2"))
+    archive.add("b", Entry(status_code=404, headers=[], content=b""))
+    entries = archive.load()
+    assert entries["a"].content == b"2"
+    assert entries["b"].status_code == 404
+
+    # 中断写入的最后一条记录被忽略
+    with open(archive.path, "ab") as f:
+        f.write(b"\x00\x00\x01\x00abc")
+    assert len(archive.load()) == 2
+
+
+@pytest.mark.anyio
+async def test_record_and_replay(tmp_path: Path) -> None:
+    path = tmp_path / "crawl.archive"
+    data = read_data("fotmob", "matches?date=20230903.json")
+    calls = 0
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        return httpx.Response(200, json=data)
+
+    transport = RecordTransport(path, httpx.MockTransport(handler))
+    async with App(transport=transport) as app:
+        recorded = await app.get_matches(date="2023-09-03")
+    assert calls == 1
+
+    async with App(
+        transport=ReplayTransport(path),
+        rate_limiter=RateLimiter(),
+    ) as app:
+        replayed = await app.get_matches(date="2023-09-03")
+        with pytest.raises(NotArchived):
+            await app.get_matches(date="2023-09-04")
+    assert calls == 1
+    assert [m["id"] for m in replayed.get_items()] == [
+        m["id"] for m in recorded.get_items()
+    ]
+
+
+class ThreadArchive(Archive):
+    def add(self, key: str, entry: Entry) -> None:
+        self.thread = threading.get_ident()
+        super().add(key, entry)
+
+
+@pytest.mark.anyio
+async def test_record_off_loop(tmp_path: Path) -> None:
+    archive = ThreadArchive(tmp_path / "crawl.archive")
+    mock = httpx.MockTransport(lambda request: httpx.Response(200))
+    transport = RecordTransport(archive, mock)
+    async with httpx.AsyncClient(transport=transport) as client:
+        await client.get(URL)
+    assert archive.thread != threading.get_ident()
+    assert len(archive.load()) == 1
+
+
+@pytest.mark.anyio
+async def test_replay_error_response(tmp_path: Path) -> None:
+    archive = Archive(tmp_path / "crawl.archive")
+    request = httpx.Request("GET", URL)
+    archive.add(
+        fingerprint(request),
+        Entry(status_code=404, headers=[], content=b""),
+    )
+    downloader = Downloader(
+        client=httpx.AsyncClient(transport=ReplayTransport(archive)),
+        rate_limiter=RateLimiter(),
+    )
+    with pytest.raises(httpx.HTTPStatusError):
+        await downloader._get(request)
+    await downloader.client.aclose()
@@ -0,0 +1,88 @@
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+from fusion_stat import bench
+from fusion_stat.spiders import fotmob
+
+
+def get_case(name: str) -> bench.Case:
+    return next(case for case in bench.CASES if case.name == name)
+
+
+def test_cases_data() -> None:
+    for case in bench.CASES:
+        assert (bench.DATA / case.file).exists(), case.name
+
+
+def test_run_case() -> None:
+    result = bench.run_case(
+        get_case("fotmob.competitions"), min_time=0, min_rounds=2
+    )
+    assert result.bytes == (bench.DATA / "fotmob/allLeagues.json").stat().st_size
+    assert result.items > 0
+    assert result.rounds == 2
+    assert result.mb_per_s > 0
+    assert result.items_per_s > 0
+    assert 0 < result.validation_share < 1
+    assert result.peak_memory > 0
+
+
+def test_count_items() -> None:
+    item = fotmob.competitions.Item(
+        id="47", name="Premier League", country_code="ENG"
+    )
+    assert bench.count_items([item, item]) == 2
+    assert bench.count_items({"a": [item], "b": None}) == 1
+
+
+def test_compare(tmp_path: Path) -> None:
+    result = bench.Result(
+        name="fotmob.team",
+        bytes=1_000_000,
+        items=100,
+        rounds=5,
+        seconds=0.01,
+        validation_share=0.1,
+        peak_memory=1_000_000,
+    )
+    path = tmp_path / "bench.json"
+    bench.save_baseline(path, [result])
+    baseline = bench.load_baseline(path)
+    assert json.loads(path.read_text())["fotmob.team"]["mb_per_s"] == 100
+    assert bench.compare([result], baseline) == []
+
+    slower = bench.Result(**{**vars(result), "seconds": 0.02})
+    bigger = bench.Result(**{**vars(result), "peak_memory": 2_000_000})
+    assert len(bench.compare([slower], baseline)) == 1
+    assert len(bench.compare([bigger], baseline)) == 1
+    assert bench.compare([slower], baseline, tolerance=0.6) == []
+
+
+def test_main(tmp_path: Path) -> None:
+    path = str(tmp_path / "bench.json")
+    argv = ["fotmob.competitions", "--min-time", "0", "--baseline", path]
+    assert bench.main([*argv, "--save"]) == 0
+    assert list(bench.load_baseline(path)) == ["fotmob.competitions"]
+    assert bench.main([*argv, "--tolerance", "100"]) == 0
+
+
+def test_main_failure(tmp_path: Path) -> None:
+    data = tmp_path / "data"
+    case = get_case("fotmob.team")
+    (data / case.file).parent.mkdir(parents=True)
+    (data / case.file).write_text("{}")
+    shutil.copy(bench.DATA / "fotmob/allLeagues.json", data / "fotmob")
+    path = tmp_path / "bench.json"
+    argv = ["fotmob.competitions", "fotmob.team", "--min-time", "0"]
+    argv += ["--data", str(data), "--baseline", str(path)]
+    assert bench.main([*argv, "--save"]) == 1
+    assert not path.exists()
+    assert bench.main(argv) == 1
+
+
+def test_main_no_data(tmp_path: Path) -> None:
+    with pytest.raises(SystemExit):
+        bench.main(["--data", str(tmp_path / "data")])
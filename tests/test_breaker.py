@@ -0,0 +1,129 @@
+import asyncio
+
+import httpx
+import pytest
+import respx
+
+from fusion_stat import App
+from fusion_stat.breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitBreakers,
+    CircuitOpenError,
+)
+from fusion_stat.ratelimit import RateLimiter
+from fusion_stat.retry import RetryPolicy
+from fusion_stat.scraper import Downloader
+
+URL = "https://example.com/api"
+
+
+class TestCircuitBreaker:
+    def test_open(self) -> None:
+        breaker = CircuitBreaker(threshold=2, recovery=60)
+        breaker.record_failure()
+        assert breaker.state == CLOSED
+        breaker.record_success()
+        breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        assert not breaker.allow()
+
+    def test_half_open(self) -> None:
+        breaker = CircuitBreaker(threshold=1, recovery=0)
+        breaker.record_failure()
+        assert breaker.state == HALF_OPEN
+        # 只放行一个探测请求
+        assert breaker.allow()
+        assert not breaker.allow()
+        breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_success()
+        assert breaker.state == CLOSED
+
+    def test_release(self) -> None:
+        breaker = CircuitBreaker(threshold=1, recovery=0)
+        breaker.record_failure()
+        assert breaker.allow()
+        breaker.release()
+        assert breaker.allow()
+
+    def test_release_other_request(self) -> None:
+        breaker = CircuitBreaker(threshold=2, recovery=0)
+        breaker.record_failure()
+        other = object()
+        assert breaker.allow(other)
+        breaker.record_failure()
+        probe = object()
+        assert breaker.allow(probe)
+        # 断路器打开前发出的请求被取消，不释放探测名额
+        breaker.release(other)
+        assert not breaker.allow()
+        breaker.release(probe)
+        assert breaker.allow()
+
+
+class TestDownloader:
+    @pytest.mark.anyio
+    async def test_fail_fast(self) -> None:
+        breakers = CircuitBreakers(threshold=2, recovery=60)
+        downloader = Downloader(
+            rate_limiter=RateLimiter(),
+            retries={"example.com": RetryPolicy(max_attempts=1)},
+            breakers=breakers,
+        )
+        route = respx.get(URL).mock(httpx.Response(403))
+        with respx.mock:
+            for _ in range(2):
+                with pytest.raises(httpx.HTTPStatusError):
+                    await downloader._get(httpx.Request("GET", URL))
+            with pytest.raises(CircuitOpenError):
+                await downloader._get(httpx.Request("GET", URL))
+            assert route.call_count == 2
+        assert breakers.states == {"example.com": OPEN}
+        await downloader.client.aclose()
+
+    @pytest.mark.anyio
+    async def test_not_found_is_success(self) -> None:
+        downloader = Downloader(
+            rate_limiter=RateLimiter(),
+            breakers=CircuitBreakers(threshold=1),
+        )
+        respx.get(URL).mock(httpx.Response(404))
+        with respx.mock:
+            for _ in range(2):
+                with pytest.raises(httpx.HTTPStatusError):
+                    await downloader._get(httpx.Request("GET", URL))
+        assert downloader.breakers.states == {"example.com": CLOSED}
+        await downloader.client.aclose()
+
+    @pytest.mark.anyio
+    async def test_cancelled_probe(self) -> None:
+        breakers = CircuitBreakers(threshold=1, recovery=0)
+        breakers.get("example.com").record_failure()
+        downloader = Downloader(rate_limiter=RateLimiter(), breakers=breakers)
+
+        async def slow(request: httpx.Request) -> httpx.Response:
+            await asyncio.sleep(1)
+            return httpx.Response(200)
+
+        respx.get(URL).mock(side_effect=slow)
+        with respx.mock:
+            task = asyncio.ensure_future(downloader._get(httpx.Request("GET", URL)))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        assert breakers.get("example.com").allow()
+        await downloader.client.aclose()
+
+
+@pytest.mark.anyio
+async def test_app_breakers() -> None:
+    breakers = CircuitBreakers(threshold=3)
+    async with App(breakers=breakers) as app:
+        assert app._engine.downloader.breakers is breakers
+        breakers.get("fbref").record_failure()
+        assert app.circuit_states == {"fbref": CLOSED}
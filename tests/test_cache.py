@@ -0,0 +1,133 @@
+import os
+from pathlib import Path
+from unittest import mock
+
+import httpx
+import pytest
+import respx
+
+from fusion_stat.cache import DiskCache, Entry
+from fusion_stat.scraper import Downloader
+
+URL = "https://fbref.com/en/comps/"
+
+
+def test_entry() -> None:
+    response = httpx.Response(
+        200,
+        headers={"Content-Encoding": "identity", "ETag": '"abc"'},
+        content=b"text\nmore",
+    )
+    entry = Entry.loads(Entry.from_response(response).dumps())
+    assert entry.status_code == 200
+    assert entry.content == b"text\nmore"
+    assert ("etag", '"abc"') in entry.headers
+    assert "content-encoding" not in dict(entry.headers)
+
+    cached = entry.to_response(httpx.Request("GET", URL))
+    assert cached.text == "text\nmore"
+    assert entry.validators == {"If-None-Match": '"abc"'}
+
+
+class TestDiskCache:
+    @pytest.mark.parametrize("compression", ["zlib", "lzma"])
+    def test_get_set(self, tmp_path: Path, compression: str) -> None:
+        cache = DiskCache(tmp_path, compression=compression)  # type: ignore
+        assert cache.get("a") is None
+        cache.set("a", Entry(status_code=200, headers=[], content=b"a" * 1000))
+        entry = cache.get("a")
+        assert entry is not None
+        assert entry.content == b"a" * 1000
+        assert 0 < cache.size < 1000
+
+    def test_is_fresh(self, tmp_path: Path) -> None:
+        cache = DiskCache(tmp_path, ttls={"fbref": 10}, default_ttl=0)
+        entry = Entry(status_code=200, headers=[], content=b"")
+        assert cache.is_fresh(entry, "fbref")
+        assert not cache.is_fresh(entry, "example.com")
+
+    def test_evict(self, tmp_path: Path) -> None:
+        cache = DiskCache(tmp_path)
+        for mtime, key in enumerate(("a", "b", "c")):
+            cache.set(key, Entry(status_code=200, headers=[], content=key.encode()))
+            os.utime(tmp_path / f"{key}.zz", (mtime, mtime))
+        cache.get("a")
+        assert (tmp_path / "a.zz").stat().st_mtime > 2
+        cache.max_bytes = cache.size - 1
+        cache.set("d", Entry(status_code=200, headers=[], content=b"d"))
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get("d") is not None
+        assert cache.size <= cache.max_bytes
+
+    def test_corrupted(self, tmp_path: Path) -> None:
+        (tmp_path / "a.zz").write_bytes(b"not zlib")
+        cache = DiskCache(tmp_path)
+        assert cache.size == 8
+        assert cache.get("a") is None
+        assert not (tmp_path / "a.zz").exists()
+        assert cache.size == 0
+
+    def test_corrupted_replaced(self, tmp_path: Path) -> None:
+        (tmp_path / "a.zz").write_bytes(b"not zlib")
+        cache = DiskCache(tmp_path)
+        entry = Entry(status_code=200, headers=[], content=b"a")
+        decompress = cache._decompress
+
+        def set_and_decompress(data: bytes) -> bytes:
+            # 读取损坏的文件之后，另一个线程写入了新的内容
+            cache.set("a", entry)
+            return decompress(data)
+
+        with mock.patch.object(cache, "_decompress", set_and_decompress):
+            assert cache.get("a") is None
+        cached = cache.get("a")
+        assert cached is not None and cached.content == b"a"
+        assert cache.size == (tmp_path / "a.zz").stat().st_size
+
+
+class TestDownloader:
+    @pytest.mark.anyio
+    async def test_cache(self, client: httpx.AsyncClient, tmp_path: Path) -> None:
+        downloader = Downloader(client=client, cache=DiskCache(tmp_path))
+        route = respx.get(URL).mock(return_value=httpx.Response(200, text="comps"))
+        with respx.mock:
+            await downloader._get(httpx.Request("GET", URL))
+            response = await downloader._get(httpx.Request("GET", URL))
+            assert route.call_count == 1
+        assert response.text == "comps"
+
+    @pytest.mark.anyio
+    async def test_expired(self, client: httpx.AsyncClient, tmp_path: Path) -> None:
+        cache = DiskCache(tmp_path, ttls={"fbref": 0})
+        downloader = Downloader(client=client, cache=cache)
+        route = respx.get(URL).mock(return_value=httpx.Response(200, text="comps"))
+        with respx.mock:
+            await downloader._get(httpx.Request("GET", URL))
+            await downloader._get(httpx.Request("GET", URL))
+            assert route.call_count == 2
+
+    @pytest.mark.anyio
+    async def test_revalidate(self, client: httpx.AsyncClient, tmp_path: Path) -> None:
+        cache = DiskCache(tmp_path, ttls={"fbref": 0})
+        downloader = Downloader(client=client, cache=cache)
+        headers = {"ETag": '"v1"', "Last-Modified": "Wed, 21 Oct 2015 07:28:00 GMT"}
+        route = respx.get(URL).mock(
+            side_effect=[
+                httpx.Response(200, text="comps", headers=headers),
+                httpx.Response(304, headers={"ETag": '"v2"'}),
+            ]
+        )
+        with respx.mock:
+            await downloader._get(httpx.Request("GET", URL))
+            response = await downloader._get(httpx.Request("GET", URL))
+            assert route.call_count == 2
+            request_headers = route.calls.last.request.headers
+        assert request_headers["If-None-Match"] == '"v1"'
+        assert request_headers["If-Modified-Since"] == headers["Last-Modified"]
+        assert response.status_code == 200
+        assert response.text == "comps"
+        (file,) = tmp_path.glob("*.zz")
+        entry = cache.get(file.stem)
+        assert entry is not None
+        assert entry.validators["If-None-Match"] == '"v2"'
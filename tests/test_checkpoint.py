@@ -0,0 +1,63 @@
+from pathlib import Path
+
+import httpx
+import pytest
+import respx
+
+from fusion_stat.checkpoint import Checkpoint
+from fusion_stat.scraper import Engine
+from fusion_stat.spiders import fotmob
+
+
+class TestCheckpoint:
+    def test_items(self, tmp_path: Path) -> None:
+        checkpoint = Checkpoint(tmp_path / "crawl.db")
+        assert checkpoint.get_item("a") is None
+        checkpoint.set_item("a", {"name": "Arsenal"})
+        checkpoint.close()
+
+        checkpoint = Checkpoint(tmp_path / "crawl.db")
+        assert checkpoint.get_item("a") == {"name": "Arsenal"}
+        checkpoint.close()
+
+    def test_jobs(self, tmp_path: Path) -> None:
+        checkpoint = Checkpoint(tmp_path / "crawl.db")
+        checkpoint.add_job("team", {"fotmob_id": "9825"})
+        checkpoint.add_job("team", {"fotmob_id": "8650"})
+        checkpoint.finish_job("team", {"fotmob_id": "9825"})
+        checkpoint.add_job("team", {"fotmob_id": "9825"})
+        assert checkpoint.is_done("team", {"fotmob_id": "9825"})
+        assert not checkpoint.is_done("team", {"fotmob_id": "8650"})
+        assert checkpoint.pending_jobs == [("team", {"fotmob_id": "8650"})]
+        checkpoint.close()
+
+
+class TestEngine:
+    @pytest.mark.anyio
+    async def test_resume(self, client: httpx.AsyncClient, tmp_path: Path) -> None:
+        checkpoint = Checkpoint(tmp_path / "crawl.db")
+        route = respx.get("https://www.fotmob.com/api/playerData?id=1").mock(
+            return_value=httpx.Response(
+                200,
+                json={
+                    "name": "Bukayo Saka",
+                    "meta": {"personJSONLD": {"nationality": {"name": "England"}}},
+                    "positionDescription": {
+                        "primaryPosition": {"label": "Right Winger"}
+                    },
+                },
+            )
+        )
+        with respx.mock:
+            engine = Engine(client, checkpoint=checkpoint)
+            (player,) = await engine.process(fotmob.player.Spider(id="1"))
+            # 重启之后
+            engine = Engine(client, checkpoint=checkpoint)
+            player_2, staff = await engine.process(
+                fotmob.player.Spider(id="1"),
+                fotmob.staff.Spider(id="1"),
+            )
+            assert route.call_count == 2
+        assert player_2 == player
+        assert isinstance(staff, fotmob.staff.Item)
+        checkpoint.close()
@@ -0,0 +1,138 @@
+import asyncio
+import typing
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+from fusion_stat import App, Competition, Player, Staff, Team
+from fusion_stat.checkpoint import Checkpoint
+from fusion_stat.crawler import Crawler
+
+
+class FakeApp(App):
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls: list[str] = []
+
+    async def get_competition(self, **params: typing.Any) -> Competition:
+        self.calls.append(f"competition {params['fotmob_id']}")
+        competition = mock.Mock(spec=Competition)
+        competition.get_teams_params.return_value = (
+            {"fotmob_id": f"{params['fotmob_id']}-{i}"} for i in range(3)
+        )
+        return competition
+
+    async def get_team(self, **params: typing.Any) -> Team:
+        self.calls.append(f"team {params['fotmob_id']}")
+        team = mock.Mock(spec=Team)
+        team.get_players_params.return_value = (
+            {"fotmob_id": f"{params['fotmob_id']}-{i}"} for i in range(2)
+        )
+        team.get_staffs_params.return_value = iter(
+            [{"transfermarkt_id": params["fotmob_id"]}]
+        )
+        return team
+
+    async def get_player(self, **params: typing.Any) -> Player:
+        await asyncio.sleep(0)
+        return mock.Mock(spec=Player)
+
+    async def get_staff(self, **params: typing.Any) -> Staff:
+        raise ValueError("staff not found")
+
+
+class TestCrawler:
+    @pytest.mark.anyio
+    async def test_crawl(self) -> None:
+        app = FakeApp()
+        app.get_staff = mock.AsyncMock(  # type: ignore
+            return_value=mock.Mock(spec=Staff)
+        )
+        params = [{"fotmob_id": "47"}, {"fotmob_id": "87"}]
+        results = [result async for result in app.crawl_competition(params)]
+        await app.close()
+
+        counts: dict[type, int] = {}
+        for result in results:
+            for cls in (Competition, Team, Player, Staff):
+                if isinstance(result, cls):
+                    counts[cls] = counts.get(cls, 0) + 1
+        assert counts == {Competition: 2, Team: 6, Player: 12, Staff: 6}
+
+    @pytest.mark.anyio
+    async def test_backpressure(self) -> None:
+        app = FakeApp()
+        app.get_staff = mock.AsyncMock(  # type: ignore
+            return_value=mock.Mock(spec=Staff)
+        )
+        crawler = Crawler(app, queue_size=1, workers=1)
+        params = ({"fotmob_id": str(i)} for i in range(100))
+        results = crawler.crawl(params)
+        await results.__anext__()
+        await asyncio.sleep(0.01)
+        await results.aclose()
+        await app.close()
+        assert len(app.calls) < 10
+
+    @pytest.mark.anyio
+    async def test_error(self) -> None:
+        app = FakeApp()
+        with pytest.raises(ValueError, match="staff not found"):
+            async for _ in app.crawl_competition([{"fotmob_id": "47"}]):
+                pass
+        await app.close()
+
+    @pytest.mark.anyio
+    async def test_resume(self, tmp_path: Path) -> None:
+        checkpoint = Checkpoint(tmp_path / "crawl.db")
+        app = FakeApp()
+        crawler = Crawler(app, checkpoint=checkpoint)
+        results = []
+        with pytest.raises(ValueError):
+            async for result in crawler.crawl([{"fotmob_id": "47"}]):
+                results.append(result)
+        assert checkpoint.pending_jobs
+
+        app.get_staff = mock.AsyncMock(  # type: ignore
+            return_value=mock.Mock(spec=Staff)
+        )
+        async for result in crawler.crawl([{"fotmob_id": "47"}]):
+            results.append(result)
+        await app.close()
+        assert len(results) == 1 + 3 + 6 + 3
+        assert not checkpoint.pending_jobs
+        checkpoint.close()
+
+    @pytest.mark.anyio
+    async def test_resume_pending_jobs(self, tmp_path: Path) -> None:
+        checkpoint = Checkpoint(tmp_path / "crawl.db")
+        app = FakeApp()
+        crawler = Crawler(app, checkpoint=checkpoint)
+        results = []
+        with pytest.raises(ValueError):
+            async for result in crawler.crawl([{"fotmob_id": "47"}]):
+                results.append(result)
+        pending = checkpoint.pending_jobs
+        assert pending
+
+        # 不传入 params，从 checkpoint 中未完成的任务继续
+        app.calls.clear()
+        app.get_staff = mock.AsyncMock(  # type: ignore
+            return_value=mock.Mock(spec=Staff)
+        )
+        async for result in crawler.crawl():
+            results.append(result)
+        await app.close()
+        assert len(results) == 1 + 3 + 6 + 3
+        assert "competition 47" not in app.calls
+        assert not checkpoint.pending_jobs
+        checkpoint.close()
+
+    @pytest.mark.anyio
+    async def test_resume_without_checkpoint(self) -> None:
+        app = FakeApp()
+        with pytest.raises(ValueError):
+            async for _ in app.crawl_competition():
+                pass
+        await app.close()
@@ -0,0 +1,70 @@
+import httpx
+import pytest
+import respx
+
+from fusion_stat.hooks import Hooks, ParseEvent, RequestEvent
+from fusion_stat.scraper import Engine
+from tests.test_scraper import JSON_URL, TEXT_URL, SpiderJSON, SpiderText
+
+
+class Recorder(Hooks):
+    def __init__(self) -> None:
+        self.calls: list[str] = []
+        self.events: list[RequestEvent | ParseEvent] = []
+
+    def on_request_start(self, event: RequestEvent) -> None:
+        self.calls.append("request_start")
+
+    def on_response(self, event: RequestEvent) -> None:
+        self.calls.append("response")
+        self.events.append(event)
+
+    def on_parse_start(self, event: ParseEvent) -> None:
+        self.calls.append("parse_start")
+
+    def on_parse_end(self, event: ParseEvent) -> None:
+        self.calls.append("parse_end")
+        self.events.append(event)
+
+    def on_error(
+        self,
+        event: RequestEvent | ParseEvent,
+        exception: BaseException,
+    ) -> None:
+        self.calls.append(f"error {type(exception).__name__}")
+
+
+@pytest.mark.anyio
+async def test_hooks(client: httpx.AsyncClient) -> None:
+    recorder = Recorder()
+    engine = Engine(client, hooks=[recorder])
+    respx.get(TEXT_URL).mock(return_value=httpx.Response(200, text="text"))
+    with respx.mock:
+        (text,) = await engine.process(SpiderText())
+    assert text == "text"
+    assert recorder.calls == ["request_start", "response", "parse_start", "parse_end"]
+
+    request_event, parse_event = recorder.events
+    assert isinstance(request_event, RequestEvent)
+    assert request_event.source == "example.com"
+    assert request_event.bytes_decoded == 4
+    assert request_event.finished is not None
+    assert request_event.queued is not None
+    assert request_event.started <= request_event.queued <= request_event.finished
+    assert isinstance(parse_event, ParseEvent)
+    assert parse_event.item == "text"
+    assert parse_event.finished is not None
+    assert parse_event.bytes == 4
+
+
+@pytest.mark.anyio
+async def test_error_hooks(client: httpx.AsyncClient) -> None:
+    recorder = Recorder()
+    engine = Engine(client)
+    engine.hooks.append(recorder)
+    assert engine.downloader.hooks == [recorder]
+    respx.get(JSON_URL).mock(return_value=httpx.Response(200, text="not json"))
+    with respx.mock:
+        with pytest.raises(ValueError):
+            await engine.process(SpiderJSON())
+    assert recorder.calls[-1] == "error JSONDecodeError"
@@ -0,0 +1,133 @@
+import asyncio
+import math
+import random
+import time
+
+import httpx
+import pytest
+
+from fusion_stat import bench, loadtest
+from fusion_stat.loadtest import Conditions, SimulatedTransport
+
+
+@pytest.fixture(scope="module")
+def routes() -> loadtest.FixtureRoutes:
+    return loadtest.FixtureRoutes()
+
+
+def test_get_shape() -> None:
+    assert (
+        loadtest.get_shape(httpx.URL("https://fbref.com/en/squads/0000000a/Arsenal"))
+        == "fbref.com/en/squads/*/Arsenal"
+    )
+    assert (
+        loadtest.get_shape(httpx.URL("https://www.fotmob.com/api/teams?id=1"))
+        == "www.fotmob.com/api/teams"
+    )
+
+
+def test_fixture_routes(routes: loadtest.FixtureRoutes) -> None:
+    fixture = routes.get(httpx.URL("https://www.fotmob.com/api/teams?id=9825"))
+    assert fixture is not None
+    content_type, content = fixture
+    assert content_type == "application/json"
+    assert content == (bench.DATA / "fotmob/teams?id=9825.json").read_bytes()
+
+    other = routes.get(httpx.URL("https://www.fotmob.com/api/teams?id=1"))
+    assert other == fixture
+    fixture = routes.get(
+        httpx.URL("https://www.transfermarkt.com/arsenal-fc/startseite/verein/12")
+    )
+    assert fixture is not None and fixture[0].startswith("text/html")
+    assert routes.get(httpx.URL("https://www.fotmob.com/api/foo")) is None
+
+
+def test_conditions() -> None:
+    rng = random.Random(0)
+    conditions = Conditions(latency=0.1, jitter=0.1)
+    for _ in range(10):
+        assert 0.1 <= conditions.get_latency(rng) <= 0.2
+    assert Conditions().get_latency(rng) == 0
+
+
+def test_link() -> None:
+    link = loadtest.Link(1000)
+    assert link.reserve(100, 1) == 1.1
+    # 链路被占用时，后一个响应排在前一个之后
+    assert link.reserve(100, 1) == pytest.approx(1.2)
+    assert link.reserve(100, 2) == 2.1
+
+
+@pytest.mark.anyio
+async def test_simulated_transport(routes: loadtest.FixtureRoutes) -> None:
+    transport = SimulatedTransport(
+        routes=routes,
+        conditions={
+            "fbref": Conditions(error_rate=1, error_status=429),
+            "transfermarkt": Conditions(latency=0.1),
+        },
+        seed=0,
+    )
+    async with httpx.AsyncClient(transport=transport) as client:
+        response = await client.get("https://www.fotmob.com/api/teams?id=1")
+        assert response.status_code == 200
+        assert response.json()["details"]["name"] == "Arsenal"
+
+        response = await client.get("https://fbref.com/en/comps/")
+        assert response.status_code == 429
+
+        start = time.perf_counter()
+        response = await client.get("https://www.transfermarkt.com/foo")
+        assert response.status_code == 404
+        assert time.perf_counter() - start >= 0.1
+    assert transport.requests == {"fotmob": 1, "fbref": 1, "transfermarkt": 1}
+
+
+@pytest.mark.anyio
+async def test_shared_bandwidth(routes: loadtest.FixtureRoutes) -> None:
+    url = "https://www.fotmob.com/api/teams?id=9825"
+    fixture = routes.get(httpx.URL(url))
+    assert fixture is not None
+    bandwidth = len(fixture[1]) / 0.1
+    transport = SimulatedTransport(
+        routes=routes, conditions={"fotmob": Conditions(bandwidth=bandwidth)}
+    )
+    async with httpx.AsyncClient(transport=transport) as client:
+        start = time.perf_counter()
+        await asyncio.gather(client.get(url), client.get(url))
+        assert time.perf_counter() - start >= 0.2
+
+
+def test_get_percentile() -> None:
+    values = [float(value) for value in range(1, 101)]
+    assert loadtest.get_percentile(values, 50) == 50
+    assert loadtest.get_percentile(values, 99) == 99
+    assert loadtest.get_percentile([3.0], 95) == 3
+    assert math.isnan(loadtest.get_percentile([], 50))
+
+
+def test_parse_origin() -> None:
+    source, conditions = loadtest.parse_origin(
+        "fbref:latency=0.5,bandwidth=1e6,error_status=500"
+    )
+    assert source == "fbref"
+    assert conditions == Conditions(latency=0.5, bandwidth=1e6, error_status=500)
+
+
+@pytest.mark.anyio
+async def test_run_scenario(routes: loadtest.FixtureRoutes) -> None:
+    transport = SimulatedTransport(routes=routes, default=Conditions(latency=0.01))
+    result = await loadtest.run_scenario(
+        "get_teams",
+        transport,
+        calls=2,
+        concurrency=2,
+        options=loadtest.Options(batch=3),
+    )
+    assert result.calls == 2
+    assert result.items == 6
+    assert result.errors == 0
+    assert result.requests == {"fotmob": 6, "fbref": 6, "transfermarkt": 12}
+    assert 0.01 < result.p50 <= result.p99 <= result.wall
+    assert result.throughput > 0
+    assert result.to_dict()["p95"] == result.p95
@@ -0,0 +1,74 @@
+from pathlib import Path
+
+import httpx
+import pytest
+import respx
+
+from fusion_stat.metrics import MetricsHooks, Registry
+from fusion_stat.retry import RetryPolicy
+from fusion_stat.scraper import Engine
+from tests.test_scraper import TEXT_URL, SpiderText
+
+
+class TestRegistry:
+    def test_render(self) -> None:
+        registry = Registry()
+        counter = registry.counter("requests_total", "Requests.", ("source",))
+        counter.inc(source="fbref")
+        counter.inc(2, source='a"b')
+        gauge = registry.gauge("in_flight", "In flight.")
+        gauge.inc()
+        gauge.dec()
+        histogram = registry.histogram("seconds", "Latency.", buckets=(0.1, 1))
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5)
+
+        text = registry.render()
+        assert "# TYPE requests_total counter\n" in text
+        assert 'requests_total{source="fbref"} 1.0\n' in text
+        assert 'requests_total{source="a\\"b"} 2.0\n' in text
+        assert "in_flight 0.0\n" in text
+        assert 'seconds_bucket{le="0.1"} 1.0\n' in text
+        assert 'seconds_bucket{le="1.0"} 2.0\n' in text
+        assert 'seconds_bucket{le="+Inf"} 3.0\n' in text
+        assert "seconds_sum 5.55\n" in text
+        assert "seconds_count 3.0\n" in text
+
+    def test_register_twice(self) -> None:
+        registry = Registry()
+        registry.counter("a", "A.")
+        with pytest.raises(ValueError):
+            registry.gauge("a", "A.")
+
+    def test_write(self, tmp_path: Path) -> None:
+        registry = Registry()
+        registry.counter("a", "A.").inc()
+        path = tmp_path / "fusion_stat.prom"
+        registry.write(path)
+        assert path.read_text() == registry.render()
+
+
+@pytest.mark.anyio
+async def test_metrics_hooks(client: httpx.AsyncClient) -> None:
+    metrics = MetricsHooks()
+    engine = Engine(
+        client,
+        retries={"example.com": RetryPolicy(backoff_base=0, jitter=0)},
+        hooks=[metrics],
+    )
+    respx.get(TEXT_URL).mock(
+        side_effect=[httpx.Response(503), httpx.Response(200, text="text")]
+    )
+    with respx.mock:
+        await engine.process(SpiderText())
+
+    assert metrics.requests.get(source="example.com", status="503") == 1
+    assert metrics.requests.get(source="example.com", status="200") == 1
+    assert metrics.retries.get(source="example.com") == 1
+    assert metrics.in_flight.get(source="example.com") == 0
+    assert metrics.request_seconds.get_count(source="example.com") == 2
+    spider = "tests.test_scraper.SpiderText"
+    assert metrics.parse_seconds.get_count(spider=spider) == 1
+    assert metrics.spider_seconds.get_count(spider=spider) == 1
+    assert "fusion_stat_parse_seconds_bucket" in metrics.registry.render()
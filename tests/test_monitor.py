@@ -0,0 +1,78 @@
+import asyncio
+import sys
+import time
+import typing
+
+import httpx
+import pytest
+import respx
+
+from fusion_stat.hooks import Hooks, LoopLagEvent
+from fusion_stat.monitor import LoopMonitor, get_culprit
+from fusion_stat.scraper import Engine
+from tests.test_scraper import TEXT_URL, SpiderText
+
+
+class SlowSpider(SpiderText):
+    def parse(self, response: httpx.Response) -> typing.Any:
+        time.sleep(0.2)
+        return response.text
+
+
+class Recorder(Hooks):
+    def __init__(self) -> None:
+        self.events: list[LoopLagEvent] = []
+
+    def on_loop_lag(self, event: LoopLagEvent) -> None:
+        self.events.append(event)
+
+
+def test_get_culprit() -> None:
+    culprit = get_culprit(sys._getframe())
+    assert culprit is not None
+    assert culprit.endswith("test_get_culprit")
+    assert get_culprit(None) is None
+
+
+@pytest.mark.anyio
+async def test_loop_monitor() -> None:
+    recorder = Recorder()
+    monitor = LoopMonitor(interval=0.01, threshold=0.05)
+    engine = Engine(hooks=[recorder], loop_monitor=monitor)
+    respx.get(TEXT_URL).mock(return_value=httpx.Response(200, text="text"))
+    with respx.mock:
+        await engine.process(SlowSpider())
+    assert monitor.running
+    # 等待监控线程报告卡顿
+    await asyncio.sleep(0.05)
+    await engine.close()
+    assert not monitor.running
+
+    stalls = [event for event in recorder.events if event.culprit is not None]
+    assert stalls
+    assert stalls[0].lag >= 0.15
+    assert stalls[0].culprit is not None
+    assert stalls[0].culprit.endswith("SlowSpider.parse")
+    assert monitor.stalls == len(stalls)
+    assert monitor.max_lag >= 0.15
+
+
+@pytest.mark.anyio
+async def test_shared_loop_monitor() -> None:
+    recorders = [Recorder() for _ in range(3)]
+    monitor = LoopMonitor(interval=0.01, threshold=0.05, hooks=[recorders[0]])
+    engines = [
+        Engine(hooks=[recorder], loop_monitor=monitor) for recorder in recorders[1:]
+    ]
+    respx.get(TEXT_URL).mock(return_value=httpx.Response(200, text="text"))
+    with respx.mock:
+        await engines[0].process(SlowSpider())
+    await asyncio.sleep(0.05)
+    await engines[0].close()
+    # 另一个 engine 仍在使用
+    assert monitor.running
+    await engines[1].close()
+    assert not monitor.running
+
+    for recorder in recorders:
+        assert any(event.culprit is not None for event in recorder.events)
@@ -0,0 +1,48 @@
+from pathlib import Path
+
+import httpx
+import pytest
+import respx
+
+from fusion_stat import App
+from fusion_stat.profiling import get_profiler
+
+from .utils import fotmob_mock, transfermarkt_mock
+
+
+@pytest.mark.anyio
+async def test_profiling(client: httpx.AsyncClient, tmp_path: Path) -> None:
+    fotmob_mock("teams?id=9825.json")
+    transfermarkt_mock("arsenal-fc_startseite_verein_11.html")
+    transfermarkt_mock("ceapi_staff_team_11_.json")
+    app = App(client=client)
+    with respx.mock:
+        async with app.profiling(tmp_path) as profiler:
+            assert get_profiler() is profiler
+            team = await app.get_team(
+                fotmob_id="9825",
+                transfermarkt_id="11",
+                transfermarkt_path_name="arsenal-fc",
+            )
+            assert team.players
+    assert get_profiler() is None
+
+    cpu = (tmp_path / "cpu.txt").read_text()
+    assert "parse" in cpu
+    assert "_find_player" in cpu
+    (memory,) = tmp_path.glob("*-App.get_team-memory.txt")
+    assert memory.read_text().startswith("peak:")
+    assert len(list(tmp_path.glob("*.tracemalloc"))) == 2
+
+
+@pytest.mark.anyio
+async def test_profiling_without_memory(
+    client: httpx.AsyncClient, tmp_path: Path
+) -> None:
+    fotmob_mock("matchDetails?matchId=4193490.json")
+    app = App(client=client)
+    with respx.mock:
+        async with app.profiling(tmp_path, memory=False):
+            await app.get_match(fotmob_id="4193490")
+    assert (tmp_path / "cpu.prof").exists()
+    assert not list(tmp_path.glob("*.tracemalloc"))
@@ -0,0 +1,75 @@
+import asyncio
+
+import httpx
+import pytest
+import respx
+
+from fusion_stat.ratelimit import RateLimiter, TokenBucket, parse_retry_after
+from fusion_stat.retry import RetryPolicy
+from fusion_stat.scraper import Downloader
+
+
+def test_parse_retry_after() -> None:
+    assert parse_retry_after("120") == 120
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+    assert parse_retry_after("soon") is None
+
+
+class TestTokenBucket:
+    def test_reserve(self) -> None:
+        bucket = TokenBucket(rate=10, capacity=2)
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == pytest.approx(0.1, abs=0.01)
+        assert bucket.level < 0
+
+    def test_pause(self) -> None:
+        bucket = TokenBucket(rate=10, capacity=2)
+        bucket.pause(1)
+        assert bucket.level == 0
+        assert bucket.reserve() == pytest.approx(1.1, abs=0.01)
+
+    @pytest.mark.anyio
+    async def test_acquire(self) -> None:
+        bucket = TokenBucket(rate=100, capacity=1)
+        await bucket.acquire()
+        await bucket.acquire()
+        assert bucket.level < 1
+
+    @pytest.mark.anyio
+    async def test_acquire_cancelled(self) -> None:
+        bucket = TokenBucket(rate=1 / 6, capacity=1)
+        await bucket.acquire()
+        task = asyncio.ensure_future(bucket.acquire())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # 取消的请求归还了令牌，下一个请求不需要多等 6 秒
+        assert bucket.reserve() == pytest.approx(6, abs=0.1)
+
+
+class TestRateLimiter:
+    def test_levels(self) -> None:
+        limiter = RateLimiter({"fbref": (1, 2)})
+        assert limiter.levels == {"fbref": 2}
+        limiter.pause("fbref", 10)
+        limiter.pause("example.com", 10)
+        assert limiter.levels["fbref"] == 0
+
+    @pytest.mark.anyio
+    async def test_retry_after(self, client: httpx.AsyncClient) -> None:
+        limiter = RateLimiter({"example.com": (1, 5)})
+        downloader = Downloader(
+            client=client,
+            rate_limiter=limiter,
+            retries={"example.com": RetryPolicy(max_attempts=1)},
+        )
+        url = "https://example.com/json"
+        respx.get(url).mock(
+            return_value=httpx.Response(429, headers={"Retry-After": "30"})
+        )
+        with respx.mock:
+            with pytest.raises(httpx.HTTPStatusError):
+                await downloader._get(httpx.Request("GET", url))
+        assert limiter.levels["example.com"] == 0
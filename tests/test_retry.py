@@ -0,0 +1,59 @@
+import httpx
+import pytest
+import respx
+
+from fusion_stat.retry import RetryPolicy
+from fusion_stat.scraper import Downloader
+
+URL = "https://example.com/json"
+
+
+class TestRetryPolicy:
+    def test_get_delay(self) -> None:
+        retry = RetryPolicy(backoff_base=1, backoff_max=3, jitter=0)
+        assert retry.get_delay(1) == 1
+        assert retry.get_delay(2) == 2
+        assert retry.get_delay(3) == 3
+        retry = RetryPolicy(backoff_base=1, jitter=0.5)
+        assert 2 <= retry.get_delay(2) <= 3
+
+    def test_is_retryable(self) -> None:
+        retry = RetryPolicy(max_attempts=2)
+        assert retry.is_retryable(1, response=httpx.Response(503))
+        assert not retry.is_retryable(1, response=httpx.Response(404))
+        assert not retry.is_retryable(2, response=httpx.Response(503))
+        assert retry.is_retryable(1, exception=httpx.ConnectError("reset"))
+        assert not retry.is_retryable(1, exception=ValueError())
+
+
+class TestDownloader:
+    @pytest.fixture(scope="class")
+    def downloader(self, client: httpx.AsyncClient) -> Downloader:
+        retry = RetryPolicy(max_attempts=3, backoff_base=0, jitter=0)
+        return Downloader(client=client, retries={"example.com": retry})
+
+    @pytest.mark.anyio
+    async def test_retry_status(self, downloader: Downloader) -> None:
+        route = respx.get(URL).mock(
+            side_effect=[httpx.Response(502), httpx.Response(200, json={})]
+        )
+        with respx.mock:
+            response = await downloader._get(httpx.Request("GET", URL))
+            assert response.status_code == 200
+            assert route.call_count == 2
+
+    @pytest.mark.anyio
+    async def test_retry_exception(self, downloader: Downloader) -> None:
+        route = respx.get(URL).mock(side_effect=httpx.ConnectError("reset"))
+        with respx.mock:
+            with pytest.raises(httpx.ConnectError):
+                await downloader._get(httpx.Request("GET", URL))
+            assert route.call_count == 3
+
+    @pytest.mark.anyio
+    async def test_not_retryable(self, downloader: Downloader) -> None:
+        route = respx.get(URL).mock(return_value=httpx.Response(404))
+        with respx.mock:
+            with pytest.raises(httpx.HTTPStatusError):
+                await downloader._get(httpx.Request("GET", URL))
+            assert route.call_count == 1
@@ -0,0 +1,65 @@
+import asyncio
+from pathlib import Path
+
+import httpx
+import pytest
+import respx
+
+from fusion_stat.ratelimit import RateLimiter
+from fusion_stat.sampler import SlowCallSampler, load_samples
+from fusion_stat.scraper import Engine
+from fusion_stat.spiders import fotmob
+
+from .utils import fotmob_mock
+
+
+class SlowRateLimiter(RateLimiter):
+    async def acquire(self, source: str) -> None:
+        await asyncio.sleep(0.2)
+
+
+@pytest.mark.anyio
+async def test_sampler(client: httpx.AsyncClient, tmp_path: Path) -> None:
+    sampler = SlowCallSampler(tmp_path, latency=0, capacity=2)
+    engine = Engine(client, hooks=[sampler])
+    fotmob_mock("matchDetails?matchId=4193490.json")
+    with respx.mock:
+        (item,) = await engine.process(fotmob.match.Spider(id="4193490"))
+
+    sampler.close()
+    (sample,) = load_samples(tmp_path)
+    assert sample.url == "https://www.fotmob.com/api/matchDetails?matchId=4193490"
+    assert sample.timings["parse"] >= 0
+    assert sample.timings["request.attempt"] == 1
+    assert "request.transfer" in sample.timings
+    assert sample.timings["latency"] == pytest.approx(
+        sample.timings["request.transfer"] + sample.timings["parse"]
+    )
+    assert sample.timings["rate_limit"] == sample.timings["request.rate_limit"]
+    assert sample.replay() == item
+
+    for _ in range(2):
+        sampler.add(sample)
+    assert len(list(load_samples(tmp_path))) == 2
+
+
+@pytest.mark.anyio
+async def test_fast_calls(client: httpx.AsyncClient, tmp_path: Path) -> None:
+    sampler = SlowCallSampler(tmp_path)
+    engine = Engine(client, hooks=[sampler])
+    fotmob_mock("matchDetails?matchId=4193490.json")
+    with respx.mock:
+        await engine.process(fotmob.match.Spider(id="4193490"))
+    sampler.close()
+    assert not list(load_samples(tmp_path))
+
+
+@pytest.mark.anyio
+async def test_rate_limit_wait(client: httpx.AsyncClient, tmp_path: Path) -> None:
+    sampler = SlowCallSampler(tmp_path, latency=0.15)
+    engine = Engine(client, hooks=[sampler], rate_limiter=SlowRateLimiter({}))
+    fotmob_mock("matchDetails?matchId=4193490.json")
+    with respx.mock:
+        await engine.process(fotmob.match.Spider(id="4193490"))
+    sampler.close()
+    assert not list(load_samples(tmp_path))
@@ -1,10 +1,21 @@
+import asyncio
+import concurrent.futures
+import contextlib
 import typing
 
 import httpx
 import pytest
 import respx
 
-from fusion_stat.scraper import BaseSpider, Downloader, Engine
+from fusion_stat.scraper import (
+    BaseSpider,
+    Downloader,
+    Engine,
+    Priority,
+    Scheduler,
+    fingerprint,
+    get_source,
+)
 
 response_json = httpx.Response(200, json={"name": "json"})
 response_text = httpx.Response(200, text="text")
@@ -31,6 +42,91 @@ class SpiderText(BaseSpider):
         return response.text
 
 
+def test_get_source() -> None:
+    assert get_source(httpx.URL("https://www.fotmob.com/api/allLeagues")) == "fotmob"
+    assert get_source(httpx.URL("https://fbref.com/en/comps/")) == "fbref"
+    assert get_source(httpx.URL("https://example.com/json")) == "example.com"
+
+
+def test_fingerprint() -> None:
+    r1 = httpx.Request("GET", "https://example.com/json?b=2&a=1")
+    r2 = httpx.Request("GET", "https://EXAMPLE.com/json?a=1&b=2#top")
+    assert fingerprint(r1) == fingerprint(r2)
+    r3 = httpx.Request("GET", r2.url, headers={"X-Key": "1"})
+    assert fingerprint(r1) != fingerprint(r3)
+    r4 = httpx.Request("GET", r2.url, headers={"Accept": "*/*"})
+    assert fingerprint(r1) == fingerprint(r4)
+
+
+class TestScheduler:
+    def test_get_limit(self) -> None:
+        scheduler = Scheduler({"fbref": 1}, default=3)
+        assert scheduler.get_limit("fbref") == 1
+        assert scheduler.get_limit("fotmob") == 8
+        assert scheduler.get_limit("example.com") == 3
+
+    def test_max_connections(self) -> None:
+        scheduler = Scheduler({"fbref": 1}, default=3)
+        # fbref 1, fotmob 8, transfermarkt 2, 其余 5 个来源各 3, 再加一份 default
+        assert scheduler.max_connections == 1 + 8 + 2 + 5 * 3 + 3
+
+    @pytest.mark.anyio
+    async def test_slot(self) -> None:
+        scheduler = Scheduler({"example.com": 2})
+        running = 0
+        max_running = 0
+
+        async def task() -> None:
+            nonlocal running, max_running
+            async with scheduler.slot("example.com"):
+                running += 1
+                max_running = max(max_running, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        await asyncio.gather(*(task() for _ in range(6)))
+        assert max_running == 2
+
+    @pytest.mark.anyio
+    async def test_priority(self) -> None:
+        scheduler = Scheduler({"example.com": 1})
+        order = []
+
+        async def task(name: str, priority: Priority) -> None:
+            async with scheduler.slot("example.com", priority):
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        first = asyncio.ensure_future(task("first", Priority.LOW))
+        await asyncio.sleep(0)
+        tasks = [
+            task("low", Priority.LOW),
+            task("normal", Priority.NORMAL),
+            task("high", Priority.HIGH),
+        ]
+        await asyncio.gather(first, *tasks)
+        assert order == ["first", "high", "normal", "low"]
+
+    @pytest.mark.anyio
+    async def test_cancel_waiter(self) -> None:
+        scheduler = Scheduler({"example.com": 1})
+
+        async def task() -> None:
+            async with scheduler.slot("example.com"):
+                await asyncio.sleep(0.01)
+
+        first = asyncio.ensure_future(task())
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(task())
+        await asyncio.sleep(0)
+        assert scheduler.waiting("example.com") == 1
+        waiter.cancel()
+        await asyncio.gather(first, waiter, return_exceptions=True)
+        # 被取消的等待者不会占用名额
+        await asyncio.wait_for(task(), 1)
+        assert scheduler.waiting("example.com") == 0
+
+
 class TestDownloader:
     @pytest.fixture(scope="class")
     def downloader(self, client: httpx.AsyncClient) -> Downloader:
@@ -59,6 +155,85 @@ class TestDownloader:
             assert text == "text"
 
 
+    @pytest.mark.anyio
+    async def test_coalesce(self, downloader: Downloader) -> None:
+        route = respx.get(JSON_URL).mock(return_value=response_json)
+        with respx.mock:
+            r1, r2 = await asyncio.gather(
+                downloader._get(SpiderJSON().request),
+                downloader._get(SpiderJSON().request),
+            )
+            assert route.call_count == 1
+        assert r1 is r2
+        assert not downloader._flights
+
+    @pytest.mark.anyio
+    async def test_coalesce_cancel(self, downloader: Downloader) -> None:
+        async def slow(request: httpx.Request) -> httpx.Response:
+            await asyncio.sleep(1)
+            return response_json
+
+        respx.get(JSON_URL).mock(side_effect=slow)
+        with respx.mock:
+            task = asyncio.ensure_future(downloader._get(SpiderJSON().request))
+            await asyncio.sleep(0)
+            (flights,) = downloader._flights.values()
+            (flight,) = flights.values()
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            await asyncio.sleep(0)
+            assert flight.task.cancelled()
+
+    @pytest.mark.anyio
+    async def test_coalesce_priority(self, client: httpx.AsyncClient) -> None:
+        async def slow(request: httpx.Request) -> httpx.Response:
+            await asyncio.sleep(0.05)
+            return response_json
+
+        downloader = Downloader(client=client, concurrency={"example.com": 1})
+        request = SpiderJSON().request
+        route = respx.get(JSON_URL).mock(side_effect=slow)
+        with respx.mock:
+            # 名额被占用，低优先级的下载在队列中等待
+            async with downloader.scheduler.slot("example.com"):
+                low = asyncio.ensure_future(downloader._get(request, Priority.LOW))
+                await asyncio.sleep(0.01)
+                high = asyncio.ensure_future(downloader._get(request, Priority.HIGH))
+                normal = asyncio.ensure_future(downloader._get(request))
+                await asyncio.sleep(0.01)
+                assert downloader.scheduler.waiting("example.com") == 2
+                assert set(downloader._flights[fingerprint(request)]) == {
+                    Priority.LOW,
+                    Priority.HIGH,
+                }
+            done, _ = await asyncio.wait(
+                (low, high, normal), return_when=asyncio.FIRST_COMPLETED
+            )
+            assert low not in done and high in done
+            await low
+            assert normal.result() is high.result()
+            assert route.call_count == 2
+        assert not downloader._flights
+
+    @pytest.mark.anyio
+    async def test_coalesce_after_cancel(self, downloader: Downloader) -> None:
+        async def slow(request: httpx.Request) -> httpx.Response:
+            await asyncio.sleep(0.05)
+            return response_json
+
+        respx.get(JSON_URL).mock(side_effect=slow)
+        with respx.mock:
+            task = asyncio.ensure_future(downloader._get(SpiderJSON().request))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            # 第一个下载还没有结束取消时，新的请求不应加入它
+            response = await downloader._get(SpiderJSON().request)
+            assert response.json()["name"] == "json"
+
+
 class TestEngine:
     @pytest.fixture(scope="class")
     async def engine(self) -> typing.AsyncGenerator[Engine, typing.Any]:
@@ -74,3 +249,109 @@ class TestEngine:
         with respx.mock:
             (text,) = await engine.process(spider)
             assert text == "text"
+
+    @pytest.mark.anyio
+    async def test_process_return_exceptions(self, engine: Engine) -> None:
+        respx.get(TEXT_URL).mock(return_value=response_text)
+        respx.get(JSON_URL).mock(return_value=httpx.Response(404))
+        with respx.mock:
+            text, error = await engine.process(
+                SpiderText(), SpiderJSON(), return_exceptions=True
+            )
+            assert text == "text"
+            assert isinstance(error, httpx.HTTPStatusError)
+
+    @pytest.mark.anyio
+    async def test_process_timeout(self, engine: Engine) -> None:
+        async def slow(request: httpx.Request) -> httpx.Response:
+            await asyncio.sleep(1)
+            return response_json
+
+        respx.get(JSON_URL).mock(side_effect=slow)
+        respx.get(TEXT_URL).mock(return_value=response_text)
+        with respx.mock:
+            text, error = await engine.process(
+                SpiderText(), SpiderJSON(), return_exceptions=True, timeout=0.05
+            )
+            assert text == "text"
+            assert isinstance(error, asyncio.TimeoutError)
+            with pytest.raises(asyncio.TimeoutError):
+                await engine.process(SpiderJSON(), timeout=0.05)
+
+    @pytest.mark.anyio
+    async def test_source_timeout(self, client: httpx.AsyncClient) -> None:
+        async def slow(request: httpx.Request) -> httpx.Response:
+            await asyncio.sleep(1)
+            return response_json
+
+        engine = Engine(client, timeouts={"example.com": 0.05})
+        respx.get(JSON_URL).mock(side_effect=slow)
+        with respx.mock:
+            with pytest.raises(asyncio.TimeoutError):
+                await engine.process(SpiderJSON())
+
+    @pytest.mark.anyio
+    async def test_stream(self, engine: Engine) -> None:
+        async def slow(request: httpx.Request) -> httpx.Response:
+            await asyncio.sleep(0.05)
+            return response_json
+
+        respx.get(JSON_URL).mock(side_effect=slow)
+        respx.get(TEXT_URL).mock(return_value=response_text)
+        spider_json = SpiderJSON()
+        spider_text = SpiderText()
+        with respx.mock:
+            results = [
+                result async for result in engine.stream(spider_json, spider_text)
+            ]
+        assert results == [(spider_text, "text"), (spider_json, "json")]
+
+    @pytest.mark.anyio
+    async def test_stream_close(self, engine: Engine) -> None:
+        cancelled = False
+
+        async def slow(request: httpx.Request) -> httpx.Response:
+            nonlocal cancelled
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled = True
+                raise
+            return response_json
+
+        respx.get(JSON_URL).mock(side_effect=slow)
+        respx.get(TEXT_URL).mock(return_value=response_text)
+        with respx.mock:
+            stream = engine.stream(SpiderJSON(), SpiderText())
+            async with contextlib.aclosing(stream):
+                async for _ in stream:
+                    break
+            # 关闭后下载已经停止，而不是仍在后台运行
+            assert cancelled
+
+    @pytest.mark.anyio
+    async def test_stream_return_exceptions(self, engine: Engine) -> None:
+        respx.get(JSON_URL).mock(return_value=httpx.Response(404))
+        with respx.mock:
+            async for _, item in engine.stream(SpiderJSON(), return_exceptions=True):
+                assert isinstance(item, httpx.HTTPStatusError)
+
+    @pytest.mark.anyio
+    @pytest.mark.parametrize(
+        "executor_cls",
+        [concurrent.futures.ThreadPoolExecutor, concurrent.futures.ProcessPoolExecutor],
+    )
+    async def test_process_executor(
+        self,
+        client: httpx.AsyncClient,
+        executor_cls: type[
+            concurrent.futures.ThreadPoolExecutor
+            | concurrent.futures.ProcessPoolExecutor
+        ],
+    ) -> None:
+        respx.get(JSON_URL).mock(return_value=response_json)
+        with executor_cls(max_workers=1) as executor:
+            engine = Engine(client, executor=executor)
+            with respx.mock:
+                (name,) = await engine.process(SpiderJSON())
+        assert name == "json"
@@ -0,0 +1,104 @@
+import json
+import typing
+from pathlib import Path
+
+import httpx
+import pytest
+import respx
+
+from fusion_stat import App
+from fusion_stat.tracing import (
+    BaseExporter,
+    JSONLinesExporter,
+    Span,
+    Tracer,
+    set_exporter,
+    traced,
+    tracer,
+)
+
+from .utils import fotmob_mock
+
+
+class ListExporter(BaseExporter):
+    def __init__(self) -> None:
+        self.spans: list[Span] = []
+
+    def export(self, span: Span) -> None:
+        self.spans.append(span)
+
+
+@pytest.fixture
+def exporter() -> typing.Generator[ListExporter, typing.Any, None]:
+    exporter = ListExporter()
+    set_exporter(exporter)
+    yield exporter
+    set_exporter(None)
+
+
+def test_disabled() -> None:
+    with Tracer().span("a") as span:
+        assert span is None
+
+
+def test_nested(exporter: ListExporter) -> None:
+    @traced()
+    def inner() -> int:
+        return 1
+
+    with tracer.span("outer", key="value"):
+        assert inner() == 1
+    with pytest.raises(ValueError):
+        with tracer.span("failed"):
+            raise ValueError
+
+    child, parent, failed = exporter.spans
+    assert child.name.endswith("inner")
+    assert child.parent_id == parent.span_id
+    assert child.trace_id == parent.trace_id
+    assert parent.parent_id is None
+    assert parent.attributes == {"key": "value"}
+    assert parent.duration is not None
+    assert failed.error == "ValueError"
+
+
+def test_json_lines_exporter(tmp_path: Path) -> None:
+    exporter = JSONLinesExporter(tmp_path / "trace.jsonl")
+    with Tracer(exporter).span("a"):
+        pass
+    exporter.close()
+    (line,) = exporter.path.read_text().splitlines()
+    assert json.loads(line)["name"] == "a"
+
+
+@pytest.mark.anyio
+async def test_app_spans(client: httpx.AsyncClient, exporter: ListExporter) -> None:
+    fotmob_mock("matchDetails?matchId=4193490.json")
+    app = App(client=client)
+    with respx.mock:
+        await app.get_match(fotmob_id="4193490")
+
+    spans = {span.span_id: span for span in exporter.spans}
+
+    def get_path(span: Span) -> list[str]:
+        names = [span.name]
+        while span.parent_id is not None:
+            span = spans[span.parent_id]
+            names.append(span.name)
+        return names[::-1]
+
+    download, parse = (
+        span for span in exporter.spans if span.name.startswith(("Down", "fusion"))
+    )
+    assert get_path(download) == [
+        "App.get_match",
+        "Engine.process",
+        "Engine.crawl",
+        "Downloader._get",
+    ]
+    assert get_path(parse) == [
+        "App.get_match",
+        "Engine.process",
+        "Engine.crawl",
+        "fusion_stat.spiders.fotmob.match.Spider.parse",
+    ]
@@ -0,0 +1,160 @@
+import os
+import sqlite3
+import typing
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+from fusion_stat import App, Staff
+from fusion_stat.spiders import transfermarkt
+from fusion_stat.workqueue import (
+    ShardedCrawler,
+    WorkerDied,
+    WorkQueue,
+    get_shard,
+    work,
+)
+
+
+class StaffApp(App):
+    # 模块级的类才能被子进程 pickle
+    async def get_staff(self, **params: typing.Any) -> Staff:
+        if params["transfermarkt_id"] == "0":
+            raise ValueError("staff not found")
+        if params["transfermarkt_id"] == "crash":
+            # 第一次处理时进程崩溃，marker 文件不存在则一直崩溃
+            marker = Path(params["transfermarkt_path_name"])
+            if not marker.exists():
+                marker.touch()
+                os._exit(1)
+            if marker.name == "always":
+                os._exit(1)
+        item = transfermarkt.staff.Item(
+            id=params["transfermarkt_id"],
+            name=params["transfermarkt_path_name"],
+        )
+        return Staff(transfermarkt=item)
+
+
+def get_params(count: int) -> list[dict[str, str]]:
+    return [
+        {"transfermarkt_id": str(i), "transfermarkt_path_name": f"staff-{i}"}
+        for i in range(count)
+    ]
+
+
+def test_get_shard() -> None:
+    params = {"fotmob_id": "9825", "transfermarkt_id": "11"}
+    assert get_shard(params, 4) == get_shard({"fotmob_id": "9825"}, 4)
+    assert 0 <= get_shard(params, 4) < 4
+
+
+class TestWorkQueue:
+    @pytest.fixture
+    def queue(self, tmp_path: Path) -> typing.Iterator[WorkQueue]:
+        queue = WorkQueue(tmp_path / "queue.db", shards=2)
+        yield queue
+        queue.close()
+
+    def test_shards(self, queue: WorkQueue) -> None:
+        # 已有队列的分片数不会被覆盖
+        other = WorkQueue(queue.path, shards=8)
+        assert other.shards == 2
+        other.close()
+
+    def test_put(self, queue: WorkQueue) -> None:
+        queue.put(("team", {"fotmob_id": "1"}), ("team", {"fotmob_id": "1"}))
+        assert queue.counts == {"pending": 1}
+
+    def test_claim(self, queue: WorkQueue) -> None:
+        params = {"fotmob_id": "1"}
+        queue.put(("team", params))
+        shard = get_shard(params, 2)
+        assert queue.claim(1 - shard) is None
+        claimed = queue.claim(shard)
+        assert claimed is not None
+        id_, job = claimed
+        assert job == ("team", params)
+        assert queue.claim(shard) is None
+        assert queue.unfinished == 1
+
+        queue.complete(id_, Staff(transfermarkt.staff.Item(id="1", name="a")))
+        assert queue.unfinished == 0
+        (result,) = queue.get_results()
+        assert isinstance(result, Staff)
+
+    def test_lease(self, queue: WorkQueue) -> None:
+        queue.lease = -1
+        params = {"fotmob_id": "1"}
+        queue.put(("team", params))
+        shard = get_shard(params, 2)
+        assert queue.claim(shard) is not None
+        # 租约过期后任务可以被重新领取
+        assert queue.claim(shard) is not None
+
+    def test_fail(self, queue: WorkQueue) -> None:
+        params = {"fotmob_id": "1"}
+        queue.put(("team", params))
+        claimed = queue.claim(get_shard(params, 2))
+        assert claimed is not None
+        queue.fail(claimed[0], "ValueError()")
+        assert queue.get_errors() == [(("team", params), "ValueError()")]
+
+
+@pytest.mark.anyio
+async def test_work(tmp_path: Path) -> None:
+    path = tmp_path / "queue.db"
+    queue = WorkQueue(path)
+    queue.put(*(("staff", params) for params in get_params(5)))
+    await work(path, 0, app_factory=StaffApp, poll_interval=0.01)
+    assert queue.counts == {"done": 4, "failed": 1}
+    queue.close()
+
+
+@pytest.mark.anyio
+async def test_work_queue_error(tmp_path: Path) -> None:
+    path = tmp_path / "queue.db"
+    queue = WorkQueue(path)
+    queue.put(*(("staff", params) for params in get_params(5)[1:]))
+    error = sqlite3.OperationalError("database is locked")
+    with mock.patch.object(WorkQueue, "complete", side_effect=error):
+        with pytest.raises(sqlite3.OperationalError):
+            await work(path, 0, app_factory=StaffApp, poll_interval=0.01)
+    assert queue.counts["running"] > 0
+    queue.close()
+
+
+def test_sharded_crawler(tmp_path: Path) -> None:
+    crawler = ShardedCrawler(tmp_path / "queue.db", workers=2, app_factory=StaffApp)
+    queue = crawler.run(get_params(10), kind="staff", expand=False)
+    names = sorted(
+        result._transfermarkt.name
+        for result in queue.get_results()
+        if isinstance(result, Staff)
+    )
+    assert len(names) == 9
+    assert "staff-0" not in names
+    assert len(queue.get_errors()) == 1
+    queue.close()
+
+
+def test_sharded_crawler_restart(tmp_path: Path) -> None:
+    crawler = ShardedCrawler(tmp_path / "queue.db", workers=2, app_factory=StaffApp)
+    params = get_params(6)[1:]
+    params.append(
+        {"transfermarkt_id": "crash", "transfermarkt_path_name": str(tmp_path / "a")}
+    )
+    queue = crawler.run(params, kind="staff", expand=False)
+    assert queue.counts == {"done": 6}
+    queue.close()
+
+
+def test_sharded_crawler_worker_died(tmp_path: Path) -> None:
+    marker = tmp_path / "always"
+    crawler = ShardedCrawler(
+        tmp_path / "queue.db", workers=2, app_factory=StaffApp, max_restarts=1
+    )
+    params = [{"transfermarkt_id": "crash", "transfermarkt_path_name": str(marker)}]
+    with pytest.raises(WorkerDied):
+        crawler.run([*get_params(6)[1:], *params], kind="staff", expand=False)